@@ -3,6 +3,42 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Perfis do engine do SQLAlchemy, escolhidos por DB_PERFIL:
+# web (requisições curtas), report (relatórios e exportações, consultas
+# longas) e batch (importações e comandos flask, uma conexão sem limite de
+# tempo). pool_pre_ping e pool_recycle evitam usar conexões que o PostgreSQL
+# do Render já derrubou por inatividade.
+PERFIS_ENGINE = {
+    'web': {'pool_size': 5, 'max_overflow': 5, 'pool_timeout': 10, 'statement_timeout_ms': 30000},
+    'report': {'pool_size': 2, 'max_overflow': 2, 'pool_timeout': 30, 'statement_timeout_ms': 300000},
+    'batch': {'pool_size': 1, 'max_overflow': 0, 'pool_timeout': 60, 'statement_timeout_ms': 0},
+}
+
+def opcoes_engine(uri, perfil):
+    """SQLALCHEMY_ENGINE_OPTIONS do perfil; DB_POOL_SIZE, DB_MAX_OVERFLOW e
+    DB_STATEMENT_TIMEOUT_MS no ambiente sobrepõem os valores do perfil"""
+    if perfil not in PERFIS_ENGINE:
+        raise ValueError(f'DB_PERFIL inválido: {perfil} (use {", ".join(PERFIS_ENGINE)})')
+    
+    # SQLite (desenvolvimento) fica com o pool padrão
+    if not uri.startswith('postgres'):
+        return {}
+    
+    valores = PERFIS_ENGINE[perfil]
+    statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS') or valores['statement_timeout_ms'])
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE') or valores['pool_size']),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or valores['max_overflow']),
+        'pool_timeout': valores['pool_timeout'],
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE') or 280),
+        'pool_pre_ping': True,
+        'connect_args': {
+            'connect_timeout': 10,
+            'application_name': f'lantercar-{perfil}',
+            'options': f'-c statement_timeout={statement_timeout}'
+        }
+    }
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'lantercar-secret-key-2024'
     
@@ -23,9 +59,55 @@ class Config:
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Perfil do engine (web, report ou batch; ver PERFIS_ENGINE). Os comandos
+    # flask longos devem rodar com DB_PERFIL=batch.
+    DB_PERFIL = os.environ.get('DB_PERFIL') or 'web'
+    SQLALCHEMY_ENGINE_OPTIONS = opcoes_engine(SQLALCHEMY_DATABASE_URI, DB_PERFIL)
+    
+    # Réplica de leitura para relatórios, dashboard e exportações (vazio =
+    # tudo no principal), com o pool do perfil report. Depois de gravar, o
+    # usuário lê do principal por REPLICA_ADERENCIA segundos; se a réplica
+    # cair, as leituras voltam ao principal por REPLICA_RETENTATIVA segundos.
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    SQLALCHEMY_BINDS = {
+        'replica': dict(opcoes_engine(DATABASE_REPLICA_URL, 'report'), url=DATABASE_REPLICA_URL)
+    } if DATABASE_REPLICA_URL else {}
+    REPLICA_ADERENCIA = int(os.environ.get('REPLICA_ADERENCIA') or 10)
+    REPLICA_RETENTATIVA = int(os.environ.get('REPLICA_RETENTATIVA') or 30)
+    # Atraso máximo (segundos) da réplica para alimentar caches compartilhados (dashboard)
+    REPLICA_ATRASO_MAX = int(os.environ.get('REPLICA_ATRASO_MAX') or 5)
+    
+    # Token para consultar /metricas/pool sem login (monitoramento interno)
+    METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN')
+    
     # Flask-Login
     LOGIN_VIEW = 'auth.login'
     
+    # Cache das estatísticas do dashboard (segundos; 0 desativa)
+    DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL') or 30)
+    
+    # Numeração de documentos: quantos números cada processo reserva por vez.
+    # 1 (padrão) não deixa buracos na numeração.
+    SEQUENCIA_BLOCO = int(os.environ.get('SEQUENCIA_BLOCO') or 1)
+    
+    # Autocomplete de clientes/materiais: recarga do índice em memória e
+    # tempo de cache no navegador (segundos)
+    AUTOCOMPLETE_RECARREGAR = int(os.environ.get('AUTOCOMPLETE_RECARREGAR') or 300)
+    AUTOCOMPLETE_MAX_AGE = int(os.environ.get('AUTOCOMPLETE_MAX_AGE') or 60)
+    
+    # Cache de PDFs de documentos em disco (vazio = pasta temporária do sistema)
+    PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR')
+    PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES') or 200 * 1024 * 1024)
+    
+    # Geração de PDFs em segundo plano: processos do pool, pasta dos resultados
+    # (compartilhada entre os workers do servidor) e retenção em segundos
+    PDF_WORKERS = int(os.environ.get('PDF_WORKERS') or 2)
+    PDF_TAREFAS_DIR = os.environ.get('PDF_TAREFAS_DIR')
+    PDF_TAREFAS_RETENCAO = int(os.environ.get('PDF_TAREFAS_RETENCAO') or 3600)
+    
+    # Estoque mínimo dos materiais que ainda não têm um definido
+    ESTOQUE_MINIMO_PADRAO = float(os.environ.get('ESTOQUE_MINIMO_PADRAO') or 5)
+    
     # Upload settings
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
 
@@ -1,5 +1,86 @@
+from flask import current_app, g, has_request_context, session as sessao_http
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_login import LoginManager
+from sqlalchemy import Select, event, exc
+from sqlalchemy.sql.dml import UpdateBase
+import time
 
-db = SQLAlchemy()
-login_manager = LoginManager()
\ No newline at end of file
+# Réplica fora do ar: até quando (time.monotonic) as leituras voltam ao principal
+_replica = {'indisponivel_ate': 0.0}
+
+def _marcar_replica_indisponivel():
+    _replica['indisponivel_ate'] = time.monotonic() + current_app.config.get('REPLICA_RETENTATIVA', 30)
+
+def _replica_falhou(contexto):
+    # Conexão recusada ou perdida com a réplica: usar o principal por REPLICA_RETENTATIVA segundos
+    if contexto.is_disconnect or contexto.connection is None:
+        _marcar_replica_indisponivel()
+
+class SessaoRoteada(Session):
+    """Sessão que manda os SELECTs das requisições somente leitura (relatórios,
+    dashboard e exportações, ver src.utils.replica) para o bind 'replica'.
+
+    Ficam no banco principal: comandos de gravação e SELECT ... FOR UPDATE, a
+    sessão depois de gravar qualquer coisa e, por REPLICA_ADERENCIA segundos
+    após um commit com gravação, as requisições do mesmo usuário, para que ele
+    leia o que acabou de gravar mesmo com a réplica atrasada. Sem réplica
+    configurada (ou com ela fora do ar) tudo vai para o principal.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if isinstance(clause, UpdateBase) or (mapper is not None and clause is None) or \
+                    (isinstance(clause, Select) and clause._for_update_arg is not None):
+                # Comando de gravação ou flush
+                self.info['gravou'] = True
+            elif isinstance(clause, Select) and self._ler_da_replica():
+                engine = self._engine_replica()
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def engine_leitura(self):
+        """Engine da réplica se um SELECT desta sessão iria para ela agora, senão None (principal)"""
+        return self._engine_replica() if self._ler_da_replica() else None
+
+    def _engine_replica(self):
+        """Engine da réplica, conferindo a conexão na primeira leitura da sessão.
+
+        Se a réplica não conecta, a leitura (e o resto da sessão) vai para o
+        principal em vez de falhar; None indica usar o principal.
+        """
+        if 'replica' not in self.info:
+            engine = self._db.engines['replica']
+            if not event.contains(engine, 'handle_error', _replica_falhou):
+                event.listen(engine, 'handle_error', _replica_falhou)
+            try:
+                with engine.connect():
+                    pass
+            except exc.DBAPIError:
+                _marcar_replica_indisponivel()
+                engine = None
+            except exc.TimeoutError:
+                # Pool da réplica esgotado: só esta sessão usa o principal
+                engine = None
+            self.info['replica'] = engine
+        return self.info['replica']
+
+    def _ler_da_replica(self):
+        if not (has_request_context() and g.get('somente_leitura')):
+            return False
+        if self.info.get('gravou') or 'replica' not in self._db.engines:
+            return False
+        if time.monotonic() < _replica['indisponivel_ate']:
+            return False
+        ultima_gravacao = sessao_http.get('ultima_gravacao', 0)
+        return time.time() - ultima_gravacao > current_app.config.get('REPLICA_ADERENCIA', 10)
+
+@event.listens_for(SessaoRoteada, 'after_commit')
+def _registrar_gravacao(sessao):
+    # Aderência ao principal nas próximas requisições do usuário que gravou
+    if sessao.info.get('gravou') and has_request_context():
+        sessao_http['ultima_gravacao'] = time.time()
+
+db = SQLAlchemy(session_options={'class_': SessaoRoteada})
+login_manager = LoginManager()
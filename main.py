@@ -6,6 +6,10 @@ def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
     
+    # Pool de conexões com medição de espera (métricas em /metricas/pool)
+    from routes.metricas import configurar_pool
+    configurar_pool(app)
+    
     # Inicializar extensões
     db.init_app(app)
     login_manager.init_app(app)
@@ -19,24 +23,17 @@ def create_app():
     # Registrar blueprints
     from routes.auth import auth_bp
     from routes.clientes import clientes_bp
+    from routes.metricas import metricas_bp
     # ... outros blueprints
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(clientes_bp)
+    app.register_blueprint(metricas_bp)
     # ... outros blueprints
     
-    # Criar tabelas e usuário inicial
-    with app.app_context():
-        db.create_all()
-        from models import Usuario
-        if not Usuario.query.filter_by(email='rodrigo@lantercar.com').first():
-            admin = Usuario(
-                nome='Rodrigo',
-                email='rodrigo@lantercar.com'
-            )
-            admin.set_password('1234')
-            db.session.add(admin)
-            db.session.commit()
+    # Criar tabelas, índices de busca, autocomplete e usuário inicial
+    from routes.inicializacao import inicializar_banco
+    inicializar_banco(app)
     
     return app
 
@@ -16,6 +16,10 @@ def create_app():
     app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
     app.config.from_object(Config)
     
+    # Pool de conexões com medição de espera (métricas em /metricas/pool)
+    from routes.metricas import configurar_pool
+    configurar_pool(app)
+    
     # Inicializar extensões
     db.init_app(app)
     CORS(app)
@@ -48,6 +52,7 @@ def create_app():
     from routes.ordens import ordens_bp
     from routes.notas_fiscais import notas_fiscais_bp
     from routes.relatorios import relatorios_bp
+    from routes.metricas import metricas_bp
     
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(dashboard_bp, url_prefix='/dashboard')
@@ -57,6 +62,7 @@ def create_app():
     app.register_blueprint(ordens_bp, url_prefix='/ordens')
     app.register_blueprint(notas_fiscais_bp, url_prefix='/notas-fiscais')
     app.register_blueprint(relatorios_bp, url_prefix='/relatorios')
+    app.register_blueprint(metricas_bp)
     
     # Adicionar filtros personalizados para templates
     @app.template_filter('format_cpf_cnpj')
@@ -73,20 +79,9 @@ def create_app():
         else:
             return cpf_cnpj
     
-    # Criar tabelas e usuário master
-    with app.app_context():
-        db.create_all()
-        
-        # Criar usuário master se não existir
-        if not Usuario.query.filter_by(email='rodrigo@lantercar.com').first():
-            usuario_master = Usuario(
-                nome='Rodrigo',
-                email='rodrigo@lantercar.com'
-            )
-            usuario_master.set_password('1234')
-            db.session.add(usuario_master)
-            db.session.commit()
-            print("Usuário master criado: rodrigo@lantercar.com / 1234")
+    # Criar tabelas, índices de busca, autocomplete e usuário master
+    from routes.inicializacao import inicializar_banco
+    inicializar_banco(app)
     
     return app
 
@@ -0,0 +1,25 @@
+from extensions import db
+
+class AlertaEstoque(db.Model):
+    """Estoque mínimo do material e a marca de estoque baixo.
+
+    `baixo` (quantidade_estoque <= estoque_minimo) é recalculado por
+    src.utils.estoque a cada movimentação, então a lista de estoque baixo e o
+    contador do dashboard leem só as linhas marcadas, pelo índice parcial.
+    """
+    __tablename__ = 'alerta_estoque'
+    __table_args__ = (
+        db.Index('ix_alerta_estoque_baixo', 'material_id',
+                 postgresql_where=db.text('baixo'),
+                 sqlite_where=db.text('baixo')),
+    )
+
+    material_id = db.Column(db.Integer, db.ForeignKey('material.id'), primary_key=True)
+    estoque_minimo = db.Column(db.Float, nullable=False, default=0)
+    baixo = db.Column(db.Boolean, nullable=False, default=False)
+    # Quando o saldo ficou abaixo do mínimo (None se não está baixo)
+    baixo_desde = db.Column(db.DateTime)
+
+    material = db.relationship('Material', backref=db.backref(
+        'alerta_estoque', uselist=False, cascade='all, delete-orphan'
+    ))
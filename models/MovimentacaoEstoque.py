@@ -0,0 +1,26 @@
+from extensions import db
+from datetime import datetime
+
+class MovimentacaoEstoque(db.Model):
+    """Lançamento no razão de estoque de um material.
+
+    Material.quantidade_estoque é o saldo atual e é atualizado na mesma
+    transação do lançamento, por src.utils.estoque.
+    """
+    __tablename__ = 'movimentacao_estoque'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    material_id = db.Column(db.Integer, db.ForeignKey('material.id'), nullable=False, index=True)
+    # entrada, saida, ajuste
+    tipo = db.Column(db.String(20), nullable=False)
+    # Variação do saldo: positiva para entradas, negativa para saídas
+    quantidade = db.Column(db.Float, nullable=False)
+    # Saldo do material após o lançamento (nos lançamentos em lote, após o lote)
+    saldo = db.Column(db.Float)
+    orcamento_item_id = db.Column(db.Integer, db.ForeignKey('orcamento_item.id'), index=True)
+    ordem_servico_id = db.Column(db.Integer, db.ForeignKey('ordem_servico.id'), index=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'))
+    observacao = db.Column(db.String(200))
+    data = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+    
+    material = db.relationship('Material')
@@ -0,0 +1,25 @@
+from extensions import db
+from datetime import datetime
+
+class ReservaEstoque(db.Model):
+    """Quantidade de um item de orçamento aceito reservada no estoque.
+
+    A reserva fica 'ativa' até a ordem de serviço ser concluída ('consumida')
+    ou cancelada ('liberada'). Disponível = quantidade_estoque - reservas ativas.
+    """
+    __tablename__ = 'reserva_estoque'
+    __table_args__ = (
+        # Só as reservas ativas entram no cálculo do disponível
+        db.Index('ix_reserva_estoque_ativa_material', 'material_id',
+                 postgresql_where=db.text("status = 'ativa'"),
+                 sqlite_where=db.text("status = 'ativa'")),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    orcamento_id = db.Column(db.Integer, db.ForeignKey('orcamento.id'), nullable=False, index=True)
+    orcamento_item_id = db.Column(db.Integer, db.ForeignKey('orcamento_item.id'), nullable=False, unique=True)
+    material_id = db.Column(db.Integer, db.ForeignKey('material.id'), nullable=False)
+    quantidade = db.Column(db.Float, nullable=False)
+    # ativa, consumida, liberada
+    status = db.Column(db.String(20), nullable=False, default='ativa')
+    data = db.Column(db.DateTime, nullable=False, default=datetime.now)
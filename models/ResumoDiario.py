@@ -0,0 +1,19 @@
+from extensions import db
+
+class ResumoDiario(db.Model):
+    """Totais diários por cliente, mantidos incrementalmente por src.utils.resumos"""
+    __tablename__ = 'resumo_diario'
+    __table_args__ = (
+        db.UniqueConstraint('data', 'cliente_id', name='uq_resumo_diario_data_cliente'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.Date, nullable=False, index=True)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False, index=True)
+    ordens_concluidas = db.Column(db.Integer, nullable=False, default=0)
+    faturamento = db.Column(db.Float, nullable=False, default=0)
+    ordens_canceladas = db.Column(db.Integer, nullable=False, default=0)
+    notas_fiscais_emitidas = db.Column(db.Integer, nullable=False, default=0)
+    valor_notas_fiscais_emitidas = db.Column(db.Float, nullable=False, default=0)
+    notas_fiscais_canceladas = db.Column(db.Integer, nullable=False, default=0)
+    valor_notas_fiscais_canceladas = db.Column(db.Float, nullable=False, default=0)
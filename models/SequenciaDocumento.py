@@ -0,0 +1,13 @@
+from extensions import db
+
+class SequenciaDocumento(db.Model):
+    """Último número emitido por prefixo de documento (ORC, OS, CT, NF) e ano"""
+    __tablename__ = 'sequencia_documento'
+    __table_args__ = (
+        db.UniqueConstraint('prefixo', 'ano', name='uq_sequencia_documento_prefixo_ano'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    prefixo = db.Column(db.String(10), nullable=False)
+    ano = db.Column(db.Integer, nullable=False)
+    ultimo_numero = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,201 @@
+from flask import current_app, request, jsonify
+from sqlalchemy import func, select
+from src.models import db, Cliente, Material, ReservaEstoque
+from src.utils.busca import remover_acentos
+from bisect import bisect_left, insort
+import threading
+import time
+
+class IndiceAutocomplete:
+    """Índice de prefixos em memória para as APIs de busca dos formulários.
+
+    Guarda uma lista ordenada de (token normalizado, id) e responde buscas por
+    prefixo com bisect, sem ir ao banco. Cada processo tem o seu índice: as
+    alterações feitas por este processo entram na hora, as dos demais workers
+    quando o índice é recarregado (AUTOCOMPLETE_RECARREGAR segundos).
+    """
+
+    def __init__(self, nome, carregar, serializar, tokens):
+        self.nome = nome
+        self._carregar = carregar
+        self._serializar = serializar
+        self._tokens_registro = tokens
+        self._lock = threading.RLock()
+        self._recarga_lock = threading.Lock()
+        self._entradas = []
+        self._registros = {}
+        self._tokens = {}
+        self._carregado_em = None
+
+    def carregar(self):
+        """(Re)carregar todo o índice a partir do banco"""
+        entradas = []
+        registros = {}
+        tokens = {}
+        for linha in self._carregar():
+            registro = self._serializar(linha)
+            registros[registro['id']] = registro
+            tokens[registro['id']] = self._tokens_registro(registro)
+            entradas.extend((token, registro['id']) for token in tokens[registro['id']])
+        entradas.sort()
+
+        with self._lock:
+            self._entradas = entradas
+            self._registros = registros
+            self._tokens = tokens
+            self._carregado_em = time.monotonic()
+
+    def _vencido(self):
+        recarregar = current_app.config.get('AUTOCOMPLETE_RECARREGAR', 300)
+        return self._carregado_em is None or (recarregar and time.monotonic() - self._carregado_em > recarregar)
+
+    def _garantir_carregado(self):
+        if not self._vencido():
+            return
+        # Só uma thread recarrega; as demais seguem com o índice atual
+        # (ou esperam, se ele ainda não foi carregado)
+        if not self._recarga_lock.acquire(blocking=self._carregado_em is None):
+            return
+        try:
+            if self._vencido():
+                self.carregar()
+        finally:
+            self._recarga_lock.release()
+
+    def buscar(self, termo, limite=10):
+        """Registros com algum token começando pelo termo normalizado"""
+        self._garantir_carregado()
+        termo = normalizar_termo(termo)
+
+        resultado = []
+        vistos = set()
+        with self._lock:
+            i = bisect_left(self._entradas, (termo,))
+            while i < len(self._entradas) and len(resultado) < limite:
+                token, registro_id = self._entradas[i]
+                if not token.startswith(termo):
+                    break
+                if registro_id not in vistos:
+                    vistos.add(registro_id)
+                    resultado.append(self._registros[registro_id])
+                i += 1
+
+        return resultado
+
+    def atualizar(self, objeto):
+        """Incluir ou atualizar um registro (após cadastrar/editar)"""
+        if self._carregado_em is None:
+            return
+
+        registro = self._serializar(objeto)
+        with self._lock:
+            self._remover_tokens(registro['id'])
+            self._registros[registro['id']] = registro
+            self._tokens[registro['id']] = self._tokens_registro(registro)
+            for token in self._tokens[registro['id']]:
+                insort(self._entradas, (token, registro['id']))
+
+    def atualizar_ids(self, ids):
+        """Recarregar do banco os registros dos ids (quando o objeto não tem todos os campos)"""
+        if self._carregado_em is None or not ids:
+            return
+
+        for linha in self._carregar(list(ids)):
+            self.atualizar(linha)
+
+    def remover(self, registro_id):
+        """Retirar um registro do índice (após excluir)"""
+        if self._carregado_em is None:
+            return
+
+        with self._lock:
+            self._remover_tokens(registro_id)
+            self._registros.pop(registro_id, None)
+
+    def _remover_tokens(self, registro_id):
+        for token in self._tokens.pop(registro_id, []):
+            i = bisect_left(self._entradas, (token, registro_id))
+            if i < len(self._entradas) and self._entradas[i] == (token, registro_id):
+                del self._entradas[i]
+
+def normalizar_termo(texto):
+    """Normalizar texto como os tokens do índice: sem acentos, minúsculo, espaços simples"""
+    return ' '.join(remover_acentos(texto or '').split())
+
+def _tokens_texto(texto):
+    """Texto completo e cada palavra, para buscar pelo início de qualquer palavra"""
+    texto = normalizar_termo(texto)
+    if not texto:
+        return []
+    return list(dict.fromkeys([texto] + texto.split()))
+
+def serializar_cliente(cliente):
+    return {
+        'id': cliente.id,
+        'nome': cliente.nome,
+        'cpf_cnpj': cliente.cpf_cnpj,
+        'telefone': cliente.telefone,
+        'email': cliente.email
+    }
+
+def tokens_cliente(cliente):
+    return _tokens_texto(cliente['nome']) + _tokens_texto(cliente['cpf_cnpj'])
+
+def serializar_material(material):
+    return {
+        'id': material.id,
+        'nome': material.nome,
+        'codigo': material.codigo,
+        'preco_unitario': float(material.preco_unitario),
+        'unidade_medida': material.unidade_medida,
+        'estoque': material.quantidade_estoque,
+        'reservado': material.reservado,
+        'disponivel': material.quantidade_estoque - material.reservado
+    }
+
+def tokens_material(material):
+    return _tokens_texto(material['nome']) + _tokens_texto(material['codigo'])
+
+def consultar_clientes(ids=None):
+    query = db.session.query(Cliente.id, Cliente.nome, Cliente.cpf_cnpj, Cliente.telefone, Cliente.email)
+    if ids is not None:
+        query = query.filter(Cliente.id.in_(ids))
+    return query
+
+def consultar_materiais(ids=None):
+    """Materiais com o total reservado por orçamentos aceitos (reservas ativas)"""
+    reservado = select(
+        ReservaEstoque.material_id,
+        func.sum(ReservaEstoque.quantidade).label('reservado')
+    ).where(ReservaEstoque.status == 'ativa').group_by(ReservaEstoque.material_id).subquery()
+
+    query = db.session.query(
+        Material.id, Material.nome, Material.codigo, Material.preco_unitario,
+        Material.unidade_medida, Material.quantidade_estoque,
+        func.coalesce(reservado.c.reservado, 0).label('reservado')
+    ).outerjoin(reservado, reservado.c.material_id == Material.id)
+    if ids is not None:
+        query = query.filter(Material.id.in_(ids))
+    return query
+
+indice_clientes = IndiceAutocomplete('clientes', consultar_clientes, serializar_cliente, tokens_cliente)
+
+# Atualizar com atualizar_ids: o objeto Material não traz o total reservado
+indice_materiais = IndiceAutocomplete('materiais', consultar_materiais, serializar_material, tokens_material)
+
+def carregar_indices_autocomplete():
+    """Carregar os índices na inicialização da aplicação"""
+    indice_clientes.carregar()
+    indice_materiais.carregar()
+
+def resposta_autocomplete(indice, termo, limite=10):
+    """Resposta JSON da busca com ETag e Cache-Control.
+
+    O ETag é o hash do resultado, então vale entre workers e reinícios: se o
+    navegador já tem este mesmo resultado (If-None-Match), responde 304 sem corpo.
+    """
+    response = jsonify(indice.buscar(termo, limite))
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config.get('AUTOCOMPLETE_MAX_AGE', 60)
+    return response.make_conditional(request)
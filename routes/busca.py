@@ -0,0 +1,95 @@
+from sqlalchemy import event, func, case, or_, text
+from sqlalchemy.engine import Engine
+from src.models import db
+import sqlite3
+import unicodedata
+
+# Índices de trigramas (PostgreSQL) por tabela e coluna pesquisada
+COLUNAS_INDEXADAS = {
+    'cliente': ['nome', 'cpf_cnpj', 'email', 'telefone'],
+    'material': ['nome', 'codigo', 'descricao'],
+    'orcamento': ['numero_orcamento', 'descricao_servico'],
+    'ordem_servico': ['numero_ordem'],
+    'nota_fiscal': ['numero_nf'],
+}
+
+def remover_acentos(texto):
+    """Remover acentos e passar para minúsculas, como f_unaccent(lower(...)) no banco"""
+    if texto is None:
+        return None
+    texto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+@event.listens_for(Engine, 'connect')
+def _registrar_funcoes_sqlite(dbapi_connection, connection_record):
+    # No SQLite (desenvolvimento e testes) f_unaccent é implementada em Python
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('f_unaccent', 1, remover_acentos, deterministic=True)
+
+def _postgresql():
+    return db.session.get_bind().dialect.name == 'postgresql'
+
+def normalizada(coluna):
+    """Expressão normalizada da coluna, a mesma usada nos índices de trigramas"""
+    return func.f_unaccent(func.lower(coluna))
+
+def _escapar_like(termo):
+    return termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def filtro_busca(termo, *colunas):
+    """Filtro que encontra o termo em qualquer das colunas, sem diferenciar acentos e caixa"""
+    padrao = f'%{_escapar_like(remover_acentos(termo.strip()))}%'
+    return or_(*[normalizada(coluna).like(padrao, escape='\\') for coluna in colunas])
+
+def ordem_relevancia(termo, *colunas):
+    """Critérios de ordenação por relevância: igual, começa com, contém.
+
+    No PostgreSQL a similaridade de trigramas desempata os resultados.
+    """
+    termo = remover_acentos(termo.strip())
+    prefixo = f'{_escapar_like(termo)}%'
+
+    criterios = [case(
+        (or_(*[normalizada(coluna) == termo for coluna in colunas]), 0),
+        (or_(*[normalizada(coluna).like(prefixo, escape='\\') for coluna in colunas]), 1),
+        else_=2
+    )]
+
+    if _postgresql():
+        criterios.append(func.greatest(*[func.similarity(normalizada(coluna), termo) for coluna in colunas]).desc())
+
+    return criterios
+
+def buscar(query, termo, *colunas):
+    """Filtrar a query pelo termo e ordenar por relevância.
+
+    A ordenação original da query, se houver, deve ser aplicada depois, como
+    critério de desempate.
+    """
+    return query.filter(filtro_busca(termo, *colunas)).order_by(*ordem_relevancia(termo, *colunas))
+
+def criar_indices_busca():
+    """Criar extensões, f_unaccent e índices de trigramas no PostgreSQL.
+
+    É idempotente; no SQLite não faz nada.
+    """
+    if not _postgresql():
+        return
+
+    db.session.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    db.session.execute(text('CREATE EXTENSION IF NOT EXISTS unaccent'))
+    # unaccent() não é IMMUTABLE e não pode ser usada em índices diretamente
+    db.session.execute(text("""
+        CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS
+        $$ SELECT public.unaccent('public.unaccent', $1) $$
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """))
+
+    for tabela, colunas in COLUNAS_INDEXADAS.items():
+        for coluna in colunas:
+            db.session.execute(text(
+                f'CREATE INDEX IF NOT EXISTS ix_{tabela}_{coluna}_trgm ON {tabela} '
+                f'USING gin (f_unaccent(lower({coluna})) gin_trgm_ops)'
+            ))
+
+    db.session.commit()
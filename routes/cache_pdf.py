@@ -0,0 +1,125 @@
+from flask import current_app, request, make_response
+import hashlib
+import json
+import os
+import tempfile
+
+class CacheDiscoPDF:
+    """Cache de PDFs em disco, com descarte dos menos usados por tamanho total.
+
+    Qualquer objeto com os métodos get/set/remover_documento pode substituir
+    este backend em app.extensions['cache_pdf'].
+    """
+
+    def __init__(self, diretorio, tamanho_maximo):
+        self.diretorio = diretorio
+        self.tamanho_maximo = tamanho_maximo
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, f'{chave}.pdf')
+
+    def get(self, chave):
+        """Conteúdo do PDF ou None; a leitura atualiza o horário de uso (LRU)"""
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, 'rb') as arquivo:
+                conteudo = arquivo.read()
+            os.utime(caminho)
+            return conteudo
+        except FileNotFoundError:
+            return None
+
+    def set(self, chave, conteudo):
+        """Gravar o PDF (escrita atômica) e descartar os mais antigos se passar do limite"""
+        fd, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as arquivo:
+            arquivo.write(conteudo)
+        os.replace(temporario, self._caminho(chave))
+        self._descartar_excedente()
+
+    def remover_documento(self, tipo, documento_id):
+        """Remover todas as versões em cache de um documento"""
+        prefixo = f'{tipo}-{documento_id}-'
+        for nome in os.listdir(self.diretorio):
+            if nome.startswith(prefixo):
+                try:
+                    os.remove(os.path.join(self.diretorio, nome))
+                except FileNotFoundError:
+                    pass
+
+    def _descartar_excedente(self):
+        arquivos = []
+        total = 0
+        for entrada in os.scandir(self.diretorio):
+            if entrada.name.endswith('.pdf'):
+                try:
+                    info = entrada.stat()
+                except FileNotFoundError:
+                    continue
+                arquivos.append((info.st_mtime, info.st_size, entrada.path))
+                total += info.st_size
+
+        if total <= self.tamanho_maximo:
+            return
+
+        for _, tamanho, caminho in sorted(arquivos):
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+            if total <= self.tamanho_maximo:
+                break
+
+def obter_cache_pdf():
+    """Backend de cache da aplicação, criado a partir da configuração no primeiro uso"""
+    cache = current_app.extensions.get('cache_pdf')
+    if cache is None:
+        cache = CacheDiscoPDF(
+            current_app.config.get('PDF_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'lantercar_pdf_cache'),
+            current_app.config.get('PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+        )
+        current_app.extensions['cache_pdf'] = cache
+    return cache
+
+def hash_conteudo(campos):
+    """Hash dos campos que alimentam o gerador do PDF"""
+    serializado = json.dumps(campos, default=str, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()[:32]
+
+def chave_cache_pdf(tipo, documento_id, campos):
+    """Chave do PDF no cache e ETag: (tipo-id-hash, hash)"""
+    etag = hash_conteudo(campos)
+    return f'{tipo}-{documento_id}-{etag}', etag
+
+def resposta_pdf_cache(tipo, documento_id, campos, gerar, nome_arquivo):
+    """Responder com o PDF do documento, gerando-o só quando não estiver em cache.
+
+    A chave é o tipo, o id e o hash de `campos`; qualquer alteração nos dados
+    do documento gera uma chave nova. O hash também é o ETag da resposta, então
+    o navegador revalida com If-None-Match e recebe 304 se nada mudou.
+    """
+    chave, etag = chave_cache_pdf(tipo, documento_id, campos)
+
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        cache = obter_cache_pdf()
+        pdf_content = cache.get(chave)
+        if pdf_content is None:
+            pdf_content = gerar()
+            cache.set(chave, pdf_content)
+
+        response = make_response(pdf_content)
+        response.headers['Content-Type'] = 'application/pdf'
+        response.headers['Content-Disposition'] = f'attachment; filename={nome_arquivo}'
+
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def invalidar_pdf(tipo, documento_id):
+    """Descartar os PDFs em cache do documento (após editar ou cancelar)"""
+    obter_cache_pdf().remover_documento(tipo, documento_id)
@@ -1,7 +1,12 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required
 from src.models import db, Cliente
+from src.utils.estatisticas import invalidar_estatisticas_dashboard
+from src.utils.busca import buscar
+from src.utils.autocomplete import indice_clientes, resposta_autocomplete
+from src.utils.importacao import ler_planilha, importar_clientes, ErroImportacao
 from datetime import datetime
+import click
 
 clientes_bp = Blueprint('clientes', __name__)
 
@@ -14,12 +19,7 @@ def listar():
     query = Cliente.query
     
     if search:
-        query = query.filter(
-            Cliente.nome.contains(search) | 
-            Cliente.cpf_cnpj.contains(search) |
-            Cliente.email.contains(search) |
-            Cliente.telefone.contains(search)
-        )
+        query = buscar(query, search, Cliente.nome, Cliente.cpf_cnpj, Cliente.email, Cliente.telefone)
     
     clientes = query.order_by(Cliente.nome).paginate(
         page=page, per_page=20, error_out=False
@@ -64,6 +64,8 @@ def cadastrar():
             )
             db.session.add(cliente)
             db.session.commit()
+            invalidar_estatisticas_dashboard()
+            indice_clientes.atualizar(cliente)
             flash('Cliente cadastrado com sucesso!', 'success')
             return redirect(url_for('clientes.listar'))
         except Exception as e:
@@ -111,6 +113,7 @@ def editar(id):
             cliente.cep = cep
             
             db.session.commit()
+            indice_clientes.atualizar(cliente)
             flash('Cliente atualizado com sucesso!', 'success')
             return redirect(url_for('clientes.listar'))
         except Exception as e:
@@ -142,6 +145,8 @@ def excluir(id):
     try:
         db.session.delete(cliente)
         db.session.commit()
+        invalidar_estatisticas_dashboard()
+        indice_clientes.remover(id)
         flash('Cliente excluído com sucesso!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -158,22 +163,8 @@ def api_buscar():
     if len(search) < 2:
         return jsonify([])
     
-    clientes = Cliente.query.filter(
-        Cliente.nome.contains(search) | 
-        Cliente.cpf_cnpj.contains(search)
-    ).limit(10).all()
-    
-    result = []
-    for cliente in clientes:
-        result.append({
-            'id': cliente.id,
-            'nome': cliente.nome,
-            'cpf_cnpj': cliente.cpf_cnpj,
-            'telefone': cliente.telefone,
-            'email': cliente.email
-        })
-    
-    return jsonify(result)
+    # Índice em memória; o navegador reaproveita a resposta pelo ETag
+    return resposta_autocomplete(indice_clientes, search)
 
 def format_cpf_cnpj(cpf_cnpj):
     """Formatar CPF/CNPJ para exibição"""
@@ -194,26 +185,53 @@ def format_cpf_cnpj(cpf_cnpj):
 def format_cpf_cnpj_filter(cpf_cnpj):
     return format_cpf_cnpj(cpf_cnpj)
 
-
-@clientes_bp.route('/api/buscar')
+@clientes_bp.route('/importar', methods=['POST'])
 @login_required
-def api_buscar():
-    query = request.args.get('q', '')
-    if len(query) < 2:
-        return jsonify([])
+def importar():
+    """Importar clientes de uma planilha CSV ou XLSX; com 'simular', só gera o relatório"""
+    arquivo = request.files.get('arquivo')
+    simular = bool(request.form.get('simular'))
+    
+    if not arquivo or not arquivo.filename:
+        flash('Selecione um arquivo CSV ou XLSX.', 'error')
+        return redirect(url_for('clientes.listar'))
     
-    clientes = Cliente.query.filter(
-        Cliente.nome.contains(query) |
-        Cliente.cpf_cnpj.contains(query)
-    ).limit(10).all()
+    try:
+        resultado = importar_clientes(ler_planilha(arquivo.stream, arquivo.filename), simular=simular)
+    except ErroImportacao as e:
+        flash(str(e), 'error')
+        return redirect(url_for('clientes.listar'))
+    
+    if not simular:
+        invalidar_estatisticas_dashboard()
+        indice_clientes.carregar()
     
-    resultado = []
-    for cliente in clientes:
-        resultado.append({
-            'id': cliente.id,
-            'nome': cliente.nome,
-            'cpf_cnpj': cliente.cpf_cnpj
-        })
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(dict(resultado, simulacao=simular))
     
-    return jsonify(resultado)
+    flash(('Simulação: ' if simular else 'Importação concluída: ') +
+          f'{resultado["inseridos"]} cliente(s) novo(s), {len(resultado["existentes"])} já cadastrado(s).', 'success')
+    if resultado['erros']:
+        erros = '; '.join(f'linha {linha}: {mensagem}' for linha, mensagem in resultado['erros'][:10])
+        mais = len(resultado['erros']) - 10
+        flash(f'{len(resultado["erros"])} linha(s) com erro — {erros}' + (f' (e mais {mais})' if mais > 0 else ''), 'error')
+    
+    return redirect(url_for('clientes.listar'))
 
+@clientes_bp.cli.command('importar')
+@click.argument('caminho', type=click.Path(exists=True, dir_okay=False))
+@click.option('--simular', is_flag=True, help='Só validar e mostrar o relatório, sem gravar.')
+@click.option('--lote', default=2000, show_default=True, help='Linhas por consulta/INSERT.')
+def importar_cli(caminho, simular, lote):
+    """Importar clientes de uma planilha CSV ou XLSX: DB_PERFIL=batch flask clientes importar ARQUIVO"""
+    with open(caminho, 'rb') as arquivo:
+        try:
+            resultado = importar_clientes(ler_planilha(arquivo, caminho), tamanho_lote=lote, simular=simular)
+        except ErroImportacao as e:
+            raise click.ClickException(str(e))
+    
+    for linha, mensagem in sorted(resultado['erros'] + resultado['existentes']):
+        click.echo(f'Linha {linha}: {mensagem}', err=True)
+    click.echo(('[simulação] ' if simular else '') +
+               f'{resultado["inseridos"]} inserido(s), {len(resultado["existentes"])} já cadastrado(s), '
+               f'{len(resultado["erros"])} erro(s).')
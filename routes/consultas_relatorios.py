@@ -0,0 +1,171 @@
+from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import contains_eager
+from src.models import db, OrdemServico, Orcamento, Cliente
+from datetime import datetime
+
+# Quantidade de ordens por página no relatório de serviços
+POR_PAGINA_SERVICOS = 50
+
+def obter_filtros_servicos(args):
+    """Ler os filtros do relatório de serviços da query string"""
+    return {
+        'data_inicio': args.get('data_inicio'),
+        'data_fim': args.get('data_fim'),
+        'cliente_id': args.get('cliente_id'),
+        'status': args.get('status')
+    }
+
+def aplicar_filtros_servicos(query, filtros):
+    """Aplicar os filtros do relatório a uma query que já junta OrdemServico e Orcamento.
+
+    Retorna a query filtrada e a lista de mensagens de erro dos filtros inválidos.
+    """
+    erros = []
+
+    if filtros.get('data_inicio'):
+        try:
+            data_inicio_obj = datetime.strptime(filtros['data_inicio'], '%Y-%m-%d')
+            query = query.filter(OrdemServico.data_inicio >= data_inicio_obj)
+        except ValueError:
+            erros.append('Data de início inválida.')
+
+    if filtros.get('data_fim'):
+        try:
+            data_fim_obj = datetime.strptime(filtros['data_fim'], '%Y-%m-%d')
+            # Adicionar 23:59:59 para incluir todo o dia
+            data_fim_obj = data_fim_obj.replace(hour=23, minute=59, second=59)
+            query = query.filter(OrdemServico.data_inicio <= data_fim_obj)
+        except ValueError:
+            erros.append('Data de fim inválida.')
+
+    if filtros.get('cliente_id'):
+        query = query.filter(Orcamento.cliente_id == filtros['cliente_id'])
+
+    if filtros.get('status'):
+        query = query.filter(OrdemServico.status == filtros['status'])
+
+    return query, erros
+
+def query_servicos(filtros, incluir_nota_fiscal=False):
+    """Montar a query do relatório de serviços.
+
+    Orçamento e cliente (e opcionalmente a nota fiscal) vêm no mesmo SELECT da
+    ordem, então percorrer o resultado não dispara consultas adicionais.
+    """
+    query = OrdemServico.query.join(OrdemServico.orcamento).join(Orcamento.cliente)
+    opcoes = [contains_eager(OrdemServico.orcamento).contains_eager(Orcamento.cliente)]
+
+    if incluir_nota_fiscal:
+        query = query.outerjoin(OrdemServico.nota_fiscal)
+        opcoes.append(contains_eager(OrdemServico.nota_fiscal))
+
+    query, erros = aplicar_filtros_servicos(query.options(*opcoes), filtros)
+
+    # O id desempata ordens com a mesma data para a paginação por keyset
+    return query.order_by(OrdemServico.data_inicio.desc(), OrdemServico.id.desc()), erros
+
+def codificar_cursor(ordem):
+    """Gerar o cursor de paginação a partir da última ordem da página"""
+    return f'{ordem.data_inicio.isoformat()},{ordem.id}'
+
+def decodificar_cursor(cursor):
+    """Ler (data_inicio, id) do cursor. Levanta ValueError se o cursor for inválido."""
+    data_inicio, ordem_id = cursor.rsplit(',', 1)
+    return datetime.fromisoformat(data_inicio), int(ordem_id)
+
+def pagina_servicos(query, cursor=None, por_pagina=POR_PAGINA_SERVICOS):
+    """Buscar uma página do relatório por keyset em (data_inicio, id).
+
+    A query deve vir de query_servicos. Em vez de OFFSET, a página continua a
+    partir da última ordem já enviada, então o custo não cresce com o número
+    de páginas. Retorna as ordens e o cursor da próxima página (None no fim).
+    """
+    if cursor:
+        data_inicio, ordem_id = decodificar_cursor(cursor)
+        query = query.filter(or_(
+            OrdemServico.data_inicio < data_inicio,
+            and_(OrdemServico.data_inicio == data_inicio, OrdemServico.id < ordem_id)
+        ))
+
+    # Buscar um registro a mais para saber se existe próxima página
+    ordens = query.limit(por_pagina + 1).all()
+
+    proximo_cursor = None
+    if len(ordens) > por_pagina:
+        ordens = ordens[:por_pagina]
+        proximo_cursor = codificar_cursor(ordens[-1])
+
+    return ordens, proximo_cursor
+
+def estatisticas_servicos(filtros):
+    """Calcular as estatísticas do relatório de serviços no banco.
+
+    Usa um único SELECT agrupado por status com os mesmos filtros do relatório,
+    sem carregar as ordens.
+    """
+    query = db.session.query(
+        OrdemServico.status,
+        func.count(OrdemServico.id),
+        func.coalesce(func.sum(Orcamento.valor_total), 0)
+    ).join(OrdemServico.orcamento).join(Orcamento.cliente)
+
+    query, _ = aplicar_filtros_servicos(query, filtros)
+
+    por_status = {}
+    for status, quantidade, valor in query.group_by(OrdemServico.status).all():
+        por_status[status] = (quantidade, valor)
+
+    return {
+        'total_servicos': sum(quantidade for quantidade, _ in por_status.values()),
+        'valor_total': sum(valor for _, valor in por_status.values()),
+        'servicos_concluidos': por_status.get('concluido', (0, 0))[0],
+        'servicos_em_andamento': por_status.get('em_andamento', (0, 0))[0],
+        'servicos_cancelados': por_status.get('cancelado', (0, 0))[0]
+    }
+
+def linhas_relatorio_servicos(filtros, lote=1000):
+    """Linhas do PDF do relatório: (numero_ordem, cliente, data_inicio, status, valor_total).
+
+    Só colunas, sem objetos do ORM, para poderem ser enviadas a outro processo
+    (nesse caso, por tarefas_pdf.LinhasEmArquivo). Lidas do banco `lote` linhas por vez.
+    """
+    query = db.session.query(
+        OrdemServico.numero_ordem,
+        Cliente.nome,
+        OrdemServico.data_inicio,
+        OrdemServico.status,
+        Orcamento.valor_total
+    ).join(OrdemServico.orcamento).join(Orcamento.cliente)
+
+    query, _ = aplicar_filtros_servicos(query, filtros)
+    query = query.order_by(OrdemServico.data_inicio.desc(), OrdemServico.id.desc())
+    return (tuple(linha) for linha in query.yield_per(lote))
+
+def descricao_filtros_servicos(filtros):
+    """Descrição legível dos filtros aplicados, para o cabeçalho do PDF"""
+    filtros_info = []
+
+    if filtros.get('data_inicio'):
+        try:
+            filtros_info.append(f"Data Início: {datetime.strptime(filtros['data_inicio'], '%Y-%m-%d').strftime('%d/%m/%Y')}")
+        except ValueError:
+            pass
+
+    if filtros.get('data_fim'):
+        try:
+            filtros_info.append(f"Data Fim: {datetime.strptime(filtros['data_fim'], '%Y-%m-%d').strftime('%d/%m/%Y')}")
+        except ValueError:
+            pass
+
+    if filtros.get('status'):
+        filtros_info.append(f"Status: {filtros['status'].replace('_', ' ').title()}")
+
+    if filtros.get('cliente_id'):
+        cliente = Cliente.query.get(filtros['cliente_id'])
+        if cliente:
+            filtros_info.append(f"Cliente: {cliente.nome}")
+
+    if not filtros_info:
+        filtros_info.append("Nenhum filtro aplicado")
+
+    return filtros_info
@@ -1,25 +1,28 @@
 from flask import Blueprint, render_template
 from flask_login import login_required, current_user
-from src.models import Cliente, Material, Orcamento, OrdemServico
+from sqlalchemy.orm import joinedload
+from src.models import Orcamento
+from src.utils.estatisticas import obter_estatisticas_dashboard
+from src.utils.replica import somente_leitura
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
 @dashboard_bp.route('/')
 @login_required
+@somente_leitura
 def index():
-    # Estatísticas para o dashboard
-    total_clientes = Cliente.query.count()
-    total_materiais = Material.query.count()
-    orcamentos_pendentes = Orcamento.query.filter_by(status='pendente').count()
-    ordens_em_andamento = OrdemServico.query.filter_by(status='em_andamento').count()
+    # Estatísticas para o dashboard (compartilhadas com relatorios.dashboard)
+    estatisticas = obter_estatisticas_dashboard()
     
-    # Últimos orçamentos
-    ultimos_orcamentos = Orcamento.query.order_by(Orcamento.data_orcamento.desc()).limit(5).all()
+    # Últimos orçamentos (cliente no mesmo SELECT)
+    ultimos_orcamentos = Orcamento.query.options(joinedload(Orcamento.cliente)).order_by(
+        Orcamento.data_orcamento.desc()
+    ).limit(5).all()
     
     return render_template('dashboard/index.html',
-                         total_clientes=total_clientes,
-                         total_materiais=total_materiais,
-                         orcamentos_pendentes=orcamentos_pendentes,
-                         ordens_em_andamento=ordens_em_andamento,
+                         total_clientes=estatisticas['total_clientes'],
+                         total_materiais=estatisticas['total_materiais'],
+                         orcamentos_pendentes=estatisticas['orcamentos_pendentes'],
+                         ordens_em_andamento=estatisticas['ordens_em_andamento'],
                          ultimos_orcamentos=ultimos_orcamentos)
 
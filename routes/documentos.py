@@ -0,0 +1,50 @@
+from flask import abort
+from sqlalchemy.orm import joinedload, selectinload
+from src.models import Orcamento, OrcamentoItem, OrdemServico, NotaFiscal
+
+# Carregamento dos documentos com tudo o que as telas de visualização e os
+# PDFs usam: os relacionamentos para um (cliente, usuário, ordem, orçamento)
+# vêm no mesmo SELECT por JOIN e os itens com seus materiais em um segundo
+# SELECT ... IN, então cada documento (ou lote de documentos) custa duas
+# consultas, qualquer que seja o número de itens.
+
+def _grafo_orcamento(caminho=None):
+    """Opções para carregar cliente, usuário e itens (com material) do orçamento.
+
+    `caminho` é o joinedload que chega ao orçamento a partir de outro documento.
+    """
+    opcoes = [
+        joinedload(Orcamento.cliente),
+        joinedload(Orcamento.usuario),
+        selectinload(Orcamento.itens).joinedload(OrcamentoItem.material)
+    ]
+    return [caminho.options(*opcoes)] if caminho is not None else opcoes
+
+def _na_ordem(documentos, ids):
+    por_id = {documento.id: documento for documento in documentos}
+    return [por_id[id] for id in ids if id in por_id]
+
+def carregar_orcamentos(ids):
+    """Orçamentos com o grafo completo, na ordem dos ids"""
+    return _na_ordem(Orcamento.query.options(*_grafo_orcamento()).filter(Orcamento.id.in_(ids)).all(), ids)
+
+def carregar_ordens(ids):
+    """Ordens de serviço com orçamento (grafo completo), contrato e nota fiscal, na ordem dos ids"""
+    return _na_ordem(OrdemServico.query.options(
+        joinedload(OrdemServico.contrato),
+        joinedload(OrdemServico.nota_fiscal),
+        *_grafo_orcamento(joinedload(OrdemServico.orcamento))
+    ).filter(OrdemServico.id.in_(ids)).all(), ids)
+
+def carregar_notas_fiscais(ids):
+    """Notas fiscais com ordem de serviço e orçamento (grafo completo), na ordem dos ids"""
+    return _na_ordem(NotaFiscal.query.options(
+        *_grafo_orcamento(joinedload(NotaFiscal.ordem_servico).joinedload(OrdemServico.orcamento))
+    ).filter(NotaFiscal.id.in_(ids)).all(), ids)
+
+def carregar_ou_404(carregar, id):
+    """Um documento com carregar_* ou 404, como get_or_404"""
+    documentos = carregar([id])
+    if not documentos:
+        abort(404)
+    return documentos[0]
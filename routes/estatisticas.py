@@ -0,0 +1,95 @@
+from flask import current_app
+from sqlalchemy import select, func, true
+from src.models import db, Cliente, Material, AlertaEstoque, Orcamento, OrdemServico, NotaFiscal, ResumoDiario
+from src.utils.replica import engine_leitura_em_dia
+from datetime import date, timedelta
+import threading
+import time
+
+# Cache das estatísticas por processo: (momento do cálculo, estatísticas)
+_cache = None
+_cache_lock = threading.Lock()
+
+def obter_estatisticas_dashboard():
+    """Retornar as estatísticas dos dashboards, usando o cache enquanto válido.
+
+    O tempo de vida vem de DASHBOARD_CACHE_TTL (segundos; 0 desativa o cache).
+    """
+    global _cache
+
+    ttl = current_app.config.get('DASHBOARD_CACHE_TTL', 30)
+    cache = _cache
+    if ttl > 0 and cache and time.monotonic() - cache[0] < ttl:
+        return cache[1]
+
+    with _cache_lock:
+        # Outra thread pode ter recalculado enquanto esperávamos
+        cache = _cache
+        if ttl > 0 and cache and time.monotonic() - cache[0] < ttl:
+            return cache[1]
+
+        estatisticas = calcular_estatisticas_dashboard()
+        _cache = (time.monotonic(), estatisticas)
+
+    return estatisticas
+
+def invalidar_estatisticas_dashboard():
+    """Descartar o cache após alterações em clientes, materiais, orçamentos, ordens ou notas.
+
+    O cache é por processo: os demais workers enxergam a alteração quando o TTL expira.
+    """
+    global _cache
+    _cache = None
+
+def calcular_estatisticas_dashboard():
+    """Calcular todas as estatísticas dos dashboards em um único SELECT"""
+    # Período padrão do faturamento: últimos 30 dias
+    data_fim = date.today()
+    data_inicio = data_fim - timedelta(days=30)
+
+    clientes = select(
+        func.count(Cliente.id).label('total_clientes')
+    ).subquery()
+
+    materiais = select(
+        func.count(Material.id).label('total_materiais')
+    ).subquery()
+
+    # Só as linhas marcadas como baixo, pelo índice parcial de alerta_estoque
+    estoque_baixo = select(
+        func.count().label('materiais_estoque_baixo')
+    ).select_from(AlertaEstoque).where(AlertaEstoque.baixo).subquery()
+
+    orcamentos = select(
+        func.count(Orcamento.id).label('total_orcamentos'),
+        func.count(Orcamento.id).filter(Orcamento.status == 'pendente').label('orcamentos_pendentes')
+    ).subquery()
+
+    ordens = select(
+        func.count(OrdemServico.id).label('total_ordens'),
+        func.count(OrdemServico.id).filter(OrdemServico.status == 'em_andamento').label('ordens_em_andamento'),
+        func.count(OrdemServico.id).filter(OrdemServico.status == 'concluido').label('ordens_concluidas'),
+        func.count(OrdemServico.id).filter(OrdemServico.status == 'cancelado').label('ordens_canceladas')
+    ).subquery()
+
+    notas_fiscais = select(
+        func.count(NotaFiscal.id).label('total_notas_fiscais')
+    ).subquery()
+
+    # Faturamento lido da tabela de resumo diário (src.utils.resumos)
+    faturamento = select(
+        func.coalesce(func.sum(ResumoDiario.faturamento), 0).label('faturamento_mes')
+    ).where(
+        ResumoDiario.data >= data_inicio,
+        ResumoDiario.data <= data_fim
+    ).subquery()
+
+    # Cada subquery retorna uma única linha, então o join não multiplica linhas
+    subqueries = [clientes, materiais, estoque_baixo, orcamentos, ordens, notas_fiscais, faturamento]
+    stmt = select(*[coluna for subquery in subqueries for coluna in subquery.c]).select_from(clientes)
+    for subquery in subqueries[1:]:
+        stmt = stmt.join(subquery, true())
+
+    # O cache é de todos os usuários: a réplica só é usada se estiver em dia,
+    # senão uma réplica atrasada deixaria o dashboard velho por DASHBOARD_CACHE_TTL
+    return dict(db.session.execute(stmt, bind_arguments={'bind': engine_leitura_em_dia()}).mappings().one())
@@ -0,0 +1,321 @@
+from flask import current_app
+from sqlalchemy import update, select, insert, func, literal, case
+from sqlalchemy.orm.attributes import set_committed_value
+from src.models import db, Material, MovimentacaoEstoque, OrcamentoItem, ReservaEstoque, AlertaEstoque
+from src.utils.autocomplete import indice_materiais
+from src.utils.upsert import insert_upsert
+from datetime import datetime
+
+class EstoqueInsuficiente(ValueError):
+    """Saída maior que o saldo; `materiais` são os nomes dos materiais sem saldo"""
+
+    def __init__(self, materiais):
+        self.materiais = materiais
+        super().__init__('Estoque insuficiente: ' + ', '.join(materiais))
+
+class EstoqueAlterado(ValueError):
+    """O saldo mudou desde que o usuário o consultou (ajuste concorrente)"""
+
+def _atualizar_em_memoria(saldos):
+    # UPDATEs diretos não passam pelo ORM: atualizar os materiais já carregados na sessão
+    for material_id, saldo in saldos.items():
+        material = db.session.identity_map.get(db.session.identity_key(Material, material_id))
+        if material is not None:
+            set_committed_value(material, 'quantidade_estoque', saldo)
+
+def _reservado(material_id, exceto_orcamento_id=None):
+    """Subconsulta com a soma das reservas ativas do material (`material_id` pode ser
+    uma coluna, para correlacionar), sem as do orçamento `exceto_orcamento_id`"""
+    reservas = ReservaEstoque.__table__
+    stmt = select(func.coalesce(func.sum(reservas.c.quantidade), 0)).where(
+        reservas.c.material_id == material_id,
+        reservas.c.status == 'ativa'
+    )
+    if exceto_orcamento_id is not None:
+        stmt = stmt.where(reservas.c.orcamento_id != exceto_orcamento_id)
+    return stmt.scalar_subquery()
+
+def _nome_material(material_id):
+    nome = db.session.query(Material.nome).filter(Material.id == material_id).scalar()
+    return nome or f'Material {material_id}'
+
+def movimentar_estoque(material_id, quantidade, tipo, permitir_negativo=False, **referencias):
+    """Somar `quantidade` (negativa nas saídas) ao saldo do material e registrar o lançamento.
+
+    O saldo é alterado com UPDATE ... SET quantidade_estoque = quantidade_estoque + n,
+    então lançamentos concorrentes nunca se sobrescrevem. Uma saída maior que o
+    disponível (saldo - reservas ativas dos orçamentos aceitos) levanta
+    EstoqueInsuficiente; as saídas das ordens consomem as próprias reservas em
+    baixar_itens_ordem. Retorna o novo saldo; o commit fica com quem chamou.
+    """
+    tabela = Material.__table__
+    stmt = (
+        update(tabela)
+        .where(tabela.c.id == material_id)
+        .values(quantidade_estoque=tabela.c.quantidade_estoque + quantidade)
+        .returning(tabela.c.quantidade_estoque)
+    )
+    if quantidade < 0 and not permitir_negativo:
+        # Travar o material antes de somar as reservas, como em reservar_itens_orcamento,
+        # para enxergar as reservas gravadas por quem segurava a trava
+        db.session.execute(select(tabela.c.id).where(tabela.c.id == material_id).with_for_update())
+        stmt = stmt.where(tabela.c.quantidade_estoque + quantidade - _reservado(material_id) >= 0)
+
+    saldo = db.session.execute(stmt).scalar()
+    if saldo is None:
+        raise EstoqueInsuficiente([_nome_material(material_id)])
+
+    db.session.add(MovimentacaoEstoque(
+        material_id=material_id,
+        tipo=tipo,
+        quantidade=quantidade,
+        saldo=saldo,
+        **referencias
+    ))
+    _atualizar_em_memoria({material_id: saldo})
+    atualizar_estoque_baixo([material_id])
+    return saldo
+
+def ajustar_saldo(material_id, nova_quantidade, quantidade_anterior=None, usuario_id=None):
+    """Ajustar o saldo para `nova_quantidade` (contagem de inventário).
+
+    `quantidade_anterior` é o saldo que o usuário tinha na tela: o ajuste só é
+    aplicado se o saldo ainda for esse, senão levanta EstoqueAlterado. Sem
+    ela, vale o saldo atual. Uma redução abaixo das reservas ativas levanta
+    EstoqueInsuficiente. A diferença é registrada como lançamento de ajuste.
+    Retorna o novo saldo.
+    """
+    tabela = Material.__table__
+
+    # Travar o material: nem o saldo nem as reservas mudam até o commit
+    saldo_atual = db.session.execute(
+        select(tabela.c.quantidade_estoque).where(tabela.c.id == material_id).with_for_update()
+    ).scalar()
+    if quantidade_anterior is None:
+        quantidade_anterior = saldo_atual
+
+    if nova_quantidade == quantidade_anterior:
+        return nova_quantidade
+
+    # Só grava se ninguém alterou o saldo desde que o usuário o consultou
+    if saldo_atual != quantidade_anterior:
+        raise EstoqueAlterado('O estoque foi alterado por outra movimentação.')
+
+    if nova_quantidade < quantidade_anterior and \
+            nova_quantidade < db.session.execute(select(_reservado(material_id))).scalar():
+        raise EstoqueInsuficiente([_nome_material(material_id)])
+
+    saldo = db.session.execute(
+        update(tabela)
+        .where(tabela.c.id == material_id)
+        .values(quantidade_estoque=nova_quantidade)
+        .returning(tabela.c.quantidade_estoque)
+    ).scalar()
+
+    db.session.add(MovimentacaoEstoque(
+        material_id=material_id,
+        tipo='ajuste',
+        quantidade=nova_quantidade - quantidade_anterior,
+        saldo=saldo,
+        usuario_id=usuario_id
+    ))
+    _atualizar_em_memoria({material_id: saldo})
+    atualizar_estoque_baixo([material_id])
+    return saldo
+
+def baixar_itens_ordem(ordem, usuario_id=None):
+    """Dar saída de todos os materiais do orçamento da ordem de serviço.
+
+    Um único UPDATE desconta de cada material a soma das quantidades dos
+    itens (subconsulta correlacionada) e um único INSERT ... SELECT registra
+    um lançamento por item, qualquer que seja o número de itens. A saída usa
+    as reservas do próprio orçamento, nunca as reservas ativas dos outros: se
+    algum material não tiver saldo além delas, levanta EstoqueInsuficiente e
+    quem chamou deve fazer rollback. Retorna {material_id: novo saldo}.
+    """
+    itens = OrcamentoItem.__table__
+    materiais = Material.__table__
+    movimentacoes = MovimentacaoEstoque.__table__
+
+    material_ids = select(itens.c.material_id).where(itens.c.orcamento_id == ordem.orcamento_id)
+    quantidade_material = select(func.sum(itens.c.quantidade)).where(
+        itens.c.orcamento_id == ordem.orcamento_id,
+        itens.c.material_id == materiais.c.id
+    ).scalar_subquery()
+
+    # Travar os materiais (em ordem de id, como em reservar_itens_orcamento)
+    # antes de somar as reservas dos outros orçamentos
+    db.session.execute(
+        select(materiais.c.id).where(materiais.c.id.in_(material_ids)).order_by(materiais.c.id).with_for_update()
+    )
+    saldos = dict(db.session.execute(
+        update(materiais)
+        .where(
+            materiais.c.id.in_(material_ids),
+            materiais.c.quantidade_estoque - quantidade_material
+            - _reservado(materiais.c.id, exceto_orcamento_id=ordem.orcamento_id) >= 0
+        )
+        .values(quantidade_estoque=materiais.c.quantidade_estoque - quantidade_material)
+        .returning(materiais.c.id, materiais.c.quantidade_estoque)
+    ).all())
+
+    # Materiais da ordem que o UPDATE não alcançou por falta de saldo
+    sem_saldo = db.session.execute(
+        select(materiais.c.nome).distinct()
+        .select_from(itens.join(materiais, itens.c.material_id == materiais.c.id))
+        .where(itens.c.orcamento_id == ordem.orcamento_id, materiais.c.id.not_in(list(saldos)))
+    ).scalars().all()
+    if sem_saldo:
+        raise EstoqueInsuficiente(sem_saldo)
+
+    db.session.execute(insert(movimentacoes).from_select(
+        ['material_id', 'tipo', 'quantidade', 'saldo', 'orcamento_item_id', 'ordem_servico_id', 'usuario_id', 'data'],
+        select(
+            itens.c.material_id,
+            literal('saida'),
+            -itens.c.quantidade,
+            materiais.c.quantidade_estoque,
+            itens.c.id,
+            literal(ordem.id),
+            literal(usuario_id),
+            literal(datetime.now())
+        )
+        .select_from(itens.join(materiais, itens.c.material_id == materiais.c.id))
+        .where(itens.c.orcamento_id == ordem.orcamento_id)
+    ))
+
+    _atualizar_em_memoria(saldos)
+    atualizar_estoque_baixo(list(saldos))
+    return saldos
+
+def atualizar_estoque_baixo(material_ids=None):
+    """Recalcular a marca de estoque baixo dos materiais (de todos, sem `material_ids`).
+
+    Materiais ainda sem linha em alerta_estoque ganham uma com o mínimo padrão
+    (ESTOQUE_MINIMO_PADRAO); sem `material_ids`, serve para preencher a tabela
+    pela primeira vez. O UPDATE só grava as linhas cuja marca mudou.
+    """
+    materiais = Material.__table__
+    alertas = AlertaEstoque.__table__
+
+    novos = select(materiais.c.id, literal(current_app.config.get('ESTOQUE_MINIMO_PADRAO', 5))).where(
+        ~select(alertas.c.material_id).where(alertas.c.material_id == materiais.c.id).exists()
+    )
+    if material_ids is not None:
+        if not material_ids:
+            return
+        novos = novos.where(materiais.c.id.in_(material_ids))
+    db.session.execute(
+        insert_upsert(alertas)
+        .from_select(['material_id', 'estoque_minimo'], novos)
+        .on_conflict_do_nothing(index_elements=['material_id'])
+    )
+
+    saldo = select(materiais.c.quantidade_estoque).where(
+        materiais.c.id == alertas.c.material_id
+    ).scalar_subquery()
+    baixo = saldo <= alertas.c.estoque_minimo
+
+    stmt = (
+        update(alertas)
+        .where(alertas.c.baixo != baixo)
+        .values(baixo=baixo, baixo_desde=case((baixo, literal(datetime.now())), else_=None))
+    )
+    if material_ids is not None:
+        stmt = stmt.where(alertas.c.material_id.in_(material_ids))
+    db.session.execute(stmt)
+
+def definir_estoque_minimo(material_id, estoque_minimo):
+    """Gravar o estoque mínimo do material e recalcular a marca de estoque baixo"""
+    alertas = AlertaEstoque.__table__
+    stmt = insert_upsert(alertas).values(material_id=material_id, estoque_minimo=estoque_minimo)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['material_id'],
+        set_={'estoque_minimo': stmt.excluded.estoque_minimo}
+    ))
+    atualizar_estoque_baixo([material_id])
+
+def reservar_itens_orcamento(orcamento):
+    """Conferir a disponibilidade de todos os itens do orçamento e reservá-los.
+
+    São três comandos, qualquer que seja o número de itens: trava as linhas
+    dos materiais do orçamento (em ordem de id, para evitar deadlock), calcula
+    necessário x disponível (saldo - reservas ativas) de todos eles em um
+    SELECT agrupado e grava as reservas com INSERT ... SELECT. O cálculo vem
+    depois da trava para enxergar as reservas de quem a segurava antes.
+    Levanta EstoqueInsuficiente se faltar algum material. Retorna os ids dos
+    materiais reservados; o commit fica com quem chamou.
+    """
+    itens = OrcamentoItem.__table__
+    materiais = Material.__table__
+    reservas = ReservaEstoque.__table__
+
+    materiais_orcamento = select(itens.c.material_id).where(itens.c.orcamento_id == orcamento.id)
+
+    material_ids = db.session.execute(
+        select(materiais.c.id)
+        .where(materiais.c.id.in_(materiais_orcamento))
+        .order_by(materiais.c.id)
+        .with_for_update()
+    ).scalars().all()
+    if not material_ids:
+        return []
+
+    necessario = select(
+        itens.c.material_id,
+        func.sum(itens.c.quantidade).label('quantidade')
+    ).where(itens.c.orcamento_id == orcamento.id).group_by(itens.c.material_id).subquery()
+
+    reservado = select(
+        reservas.c.material_id,
+        func.sum(reservas.c.quantidade).label('quantidade')
+    ).where(
+        reservas.c.status == 'ativa',
+        reservas.c.material_id.in_(material_ids)
+    ).group_by(reservas.c.material_id).subquery()
+
+    sem_saldo = db.session.execute(
+        select(materiais.c.nome)
+        .select_from(
+            materiais.join(necessario, necessario.c.material_id == materiais.c.id)
+            .outerjoin(reservado, reservado.c.material_id == materiais.c.id)
+        )
+        .where(materiais.c.quantidade_estoque - func.coalesce(reservado.c.quantidade, 0) < necessario.c.quantidade)
+    ).scalars().all()
+    if sem_saldo:
+        raise EstoqueInsuficiente(sem_saldo)
+
+    db.session.execute(insert(reservas).from_select(
+        ['orcamento_id', 'orcamento_item_id', 'material_id', 'quantidade', 'status', 'data'],
+        select(
+            itens.c.orcamento_id,
+            itens.c.id,
+            itens.c.material_id,
+            itens.c.quantidade,
+            literal('ativa'),
+            literal(datetime.now())
+        ).where(itens.c.orcamento_id == orcamento.id)
+    ))
+
+    return material_ids
+
+def _encerrar_reservas(orcamento_id, status):
+    reservas = ReservaEstoque.__table__
+    return db.session.execute(
+        update(reservas)
+        .where(reservas.c.orcamento_id == orcamento_id, reservas.c.status == 'ativa')
+        .values(status=status)
+        .returning(reservas.c.material_id)
+    ).scalars().all()
+
+def liberar_reservas(orcamento_id):
+    """Devolver ao disponível as reservas do orçamento (ordem cancelada). Retorna os ids dos materiais."""
+    return set(_encerrar_reservas(orcamento_id, 'liberada'))
+
+def consumir_reservas(orcamento_id):
+    """Marcar as reservas do orçamento como consumidas (saída feita na conclusão da ordem)"""
+    return set(_encerrar_reservas(orcamento_id, 'consumida'))
+
+def atualizar_indice_materiais(material_ids):
+    """Atualizar o autocomplete com os saldos novos (após o commit), em uma consulta"""
+    indice_materiais.atualizar_ids(material_ids)
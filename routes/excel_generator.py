@@ -0,0 +1,118 @@
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.utils import get_column_letter
+from itertools import islice
+import tempfile
+
+# Largura máxima de coluna (mesmo limite usado antes no relatório)
+LARGURA_MAXIMA_COLUNA = 50
+
+# Quantidade de linhas usadas para estimar a largura das colunas.
+# No modo write-only as larguras precisam ser definidas antes da primeira linha.
+LINHAS_AMOSTRA_LARGURA = 1000
+
+# Tamanho dos blocos enviados na resposta
+TAMANHO_BLOCO_STREAM = 64 * 1024
+
+HEADER_FONT = Font(bold=True, color="FFFFFF")
+HEADER_FILL = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center")
+
+def gerar_excel_streaming(titulo, headers, linhas):
+    """Gerar planilha em modo write-only a partir de um iterador de linhas.
+
+    As linhas são gravadas uma a uma em arquivo temporário, então o consumo de
+    memória não depende da quantidade de registros. Retorna o arquivo
+    posicionado no início.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=titulo)
+
+    linhas = iter(linhas)
+
+    # Ajustar largura das colunas com base no cabeçalho e nas primeiras linhas
+    amostra = list(islice(linhas, LINHAS_AMOSTRA_LARGURA))
+    larguras = [len(str(header)) for header in headers]
+    for linha in amostra:
+        atualizar_larguras(larguras, linha)
+
+    for col, largura in enumerate(larguras, 1):
+        ws.column_dimensions[get_column_letter(col)].width = min(largura + 2, LARGURA_MAXIMA_COLUNA)
+
+    # Cabeçalho
+    cabecalho = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = HEADER_FONT
+        cell.fill = HEADER_FILL
+        cell.alignment = HEADER_ALIGNMENT
+        cabecalho.append(cell)
+    ws.append(cabecalho)
+
+    # Dados
+    for linha in amostra:
+        ws.append(linha)
+    del amostra
+
+    for linha in linhas:
+        ws.append(linha)
+
+    arquivo = tempfile.TemporaryFile()
+    wb.save(arquivo)
+    arquivo.seek(0)
+
+    return arquivo
+
+def atualizar_larguras(larguras, linha):
+    """Atualizar a largura máxima de cada coluna com os valores da linha"""
+    for i, valor in enumerate(linha):
+        if valor is None:
+            continue
+        tamanho = len(str(valor))
+        if i >= len(larguras):
+            larguras.append(tamanho)
+        elif tamanho > larguras[i]:
+            larguras[i] = tamanho
+
+def stream_arquivo(arquivo, tamanho_bloco=TAMANHO_BLOCO_STREAM):
+    """Ler o arquivo em blocos para uma resposta em streaming, fechando-o ao final"""
+    try:
+        while True:
+            bloco = arquivo.read(tamanho_bloco)
+            if not bloco:
+                break
+            yield bloco
+    finally:
+        arquivo.close()
+
+def tamanho_arquivo(arquivo):
+    """Retornar o tamanho do arquivo sem alterar a posição atual"""
+    posicao = arquivo.tell()
+    arquivo.seek(0, 2)
+    tamanho = arquivo.tell()
+    arquivo.seek(posicao)
+    return tamanho
+
+def gerar_excel_relatorio_servicos(ordens):
+    """Gerar Excel do relatório de serviços"""
+    headers = [
+        "Ordem de Serviço", "Cliente", "Orçamento", "Data Início",
+        "Data Conclusão", "Status", "Descrição", "Valor Total"
+    ]
+
+    linhas = (
+        [
+            ordem.numero_ordem,
+            ordem.orcamento.cliente.nome,
+            ordem.orcamento.numero_orcamento,
+            ordem.data_inicio.strftime('%d/%m/%Y'),
+            ordem.data_conclusao.strftime('%d/%m/%Y') if ordem.data_conclusao else 'Em andamento',
+            ordem.status.replace('_', ' ').title(),
+            ordem.orcamento.descricao_servico,
+            f"R$ {ordem.orcamento.valor_total:.2f}"
+        ]
+        for ordem in ordens
+    )
+
+    return gerar_excel_streaming("Relatório de Serviços", headers, linhas)
@@ -0,0 +1,125 @@
+from flask import current_app
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from src.models import db
+from src.utils.cache_pdf import obter_cache_pdf, chave_cache_pdf
+from src.utils.tarefas_pdf import submeter_pdf, registrar_progresso
+from datetime import datetime
+import zipfile
+
+class _BufferZip:
+    """Destino do ZipFile que acumula os bytes escritos até serem enviados.
+
+    Sem seek(), o zipfile grava os tamanhos depois de cada arquivo (data
+    descriptor) e o ZIP pode ser enviado em partes, sem arquivo temporário.
+    """
+
+    def __init__(self):
+        self._partes = []
+        self._posicao = 0
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        dados = b''.join(self._partes)
+        self._partes = []
+        return dados
+
+def filtrar_periodo(query, coluna, data_inicio=None, data_fim=None):
+    """Filtrar a query pelo período (datas YYYY-MM-DD, dia final inteiro).
+
+    Retorna a query filtrada e a lista de mensagens de erro das datas inválidas.
+    """
+    erros = []
+
+    if data_inicio:
+        try:
+            query = query.filter(coluna >= datetime.strptime(data_inicio, '%Y-%m-%d'))
+        except ValueError:
+            erros.append('Data de início inválida.')
+
+    if data_fim:
+        try:
+            data_fim_obj = datetime.strptime(data_fim, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
+            query = query.filter(coluna <= data_fim_obj)
+        except ValueError:
+            erros.append('Data de fim inválida.')
+
+    return query, erros
+
+def exportar_pdfs_zip(ids, carregar, tipo, gerar, campos, dados, nome_arquivo, exportacao_id=None, usuario_id=None):
+    """Gerar os PDFs dos documentos e produzir o ZIP em partes, para uma resposta em streaming.
+
+    Os documentos são carregados em lotes (`carregar(ids)` deve trazer todos os
+    relacionamentos usados por `gerar`). PDFs que já estão no cache de PDFs são
+    usados direto; os demais são gerados no pool de processos, a partir da
+    cópia sem ORM feita por `dados` (dados_pdf_*), e entram no ZIP na ordem em
+    que ficam prontos. Só um lote fica em memória por vez. Com
+    `exportacao_id`, o progresso é gravado para progresso_exportacao.
+    """
+    buffer = _BufferZip()
+    cache = obter_cache_pdf()
+    tamanho_lote = current_app.config.get('PDF_WORKERS', 2) * 4
+    total = len(ids)
+    concluidos = 0
+    erros = []
+
+    def progresso():
+        if exportacao_id:
+            registrar_progresso(exportacao_id, usuario_id, concluidos, total)
+
+    progresso()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as arquivo_zip:
+        for inicio in range(0, total, tamanho_lote):
+            pendentes = {}
+            for documento in carregar(ids[inicio:inicio + tamanho_lote]):
+                chave, _ = chave_cache_pdf(tipo, documento.id, campos(documento))
+                conteudo = cache.get(chave)
+                if conteudo is None:
+                    pendentes[submeter_pdf(gerar, dados(documento))] = (documento, chave)
+                else:
+                    arquivo_zip.writestr(nome_arquivo(documento), conteudo)
+                    concluidos += 1
+                    progresso()
+                    yield buffer.esvaziar()
+
+            for tentativa in range(2):
+                repetir = []
+                for futuro in as_completed(pendentes):
+                    documento, chave = pendentes[futuro]
+                    try:
+                        conteudo = futuro.result()
+                    except BrokenProcessPool as e:
+                        # Um processo morreu e derrubou o pool com todas as tarefas
+                        # do lote: gerar de novo, uma vez, num pool recriado
+                        if tentativa == 0:
+                            repetir.append((documento, chave))
+                            continue
+                        erros.append(f'{nome_arquivo(documento)}: {e}')
+                    except Exception as e:
+                        erros.append(f'{nome_arquivo(documento)}: {e}')
+                    else:
+                        cache.set(chave, conteudo)
+                        arquivo_zip.writestr(nome_arquivo(documento), conteudo)
+                    concluidos += 1
+                    progresso()
+                    yield buffer.esvaziar()
+
+                pendentes = {submeter_pdf(gerar, dados(documento)): (documento, chave) for documento, chave in repetir}
+
+            # Liberar os documentos do lote antes de carregar o próximo
+            db.session.expunge_all()
+
+        if erros:
+            arquivo_zip.writestr('ERROS.txt', '\n'.join(erros))
+
+    yield buffer.esvaziar()
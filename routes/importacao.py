@@ -0,0 +1,313 @@
+from sqlalchemy import select
+from src.models import db, Material, AlertaEstoque, Cliente
+from src.utils.upsert import insert_upsert
+from src.utils.estoque import atualizar_estoque_baixo
+from src.utils.busca import remover_acentos
+from itertools import islice
+import csv
+import io
+import re
+
+UNIDADES_MEDIDA = {'UN', 'KG', 'L', 'M', 'M2', 'M3', 'PC', 'CX', 'PCT'}
+
+class ErroImportacao(ValueError):
+    """Arquivo de importação ilegível (formato não suportado, sem cabeçalho...)"""
+
+def _nome_coluna(valor):
+    # "Preço Unitário" -> "preco_unitario", "CPF/CNPJ" -> "cpf_cnpj"
+    return re.sub(r'[^a-z0-9]+', '_', remover_acentos(str(valor or ''))).strip('_')
+
+def ler_planilha(arquivo, nome_arquivo):
+    """Ler um CSV ou XLSX linha a linha, sem carregar o arquivo inteiro.
+
+    Gera (número da linha no arquivo, dict coluna -> valor), com os nomes das
+    colunas do cabeçalho normalizados (sem acentos, minúsculos, '_' no lugar
+    de espaços e pontuação). O CSV pode ser separado por vírgula ou ponto e vírgula.
+    """
+    extensao = nome_arquivo.rsplit('.', 1)[-1].lower() if '.' in nome_arquivo else ''
+
+    if extensao == 'xlsx':
+        from openpyxl import load_workbook
+        try:
+            planilha = load_workbook(arquivo, read_only=True, data_only=True)
+        except Exception:
+            raise ErroImportacao('Não foi possível ler a planilha XLSX.')
+        try:
+            linhas = planilha.active.iter_rows(values_only=True)
+            cabecalho = [_nome_coluna(valor) for valor in next(linhas, ())]
+            if not any(cabecalho):
+                raise ErroImportacao('A planilha não tem cabeçalho.')
+            for numero, valores in enumerate(linhas, start=2):
+                if any(valor not in (None, '') for valor in valores):
+                    yield numero, dict(zip(cabecalho, valores))
+        finally:
+            planilha.close()
+
+    elif extensao == 'csv':
+        texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+        primeira = texto.readline()
+        if not primeira.strip():
+            raise ErroImportacao('O arquivo CSV não tem cabeçalho.')
+        delimitador = ';' if primeira.count(';') > primeira.count(',') else ','
+        cabecalho = [_nome_coluna(valor) for valor in next(csv.reader([primeira], delimiter=delimitador))]
+        for numero, valores in enumerate(csv.reader(texto, delimiter=delimitador), start=2):
+            if any(valor.strip() for valor in valores):
+                yield numero, dict(zip(cabecalho, valores))
+
+    else:
+        raise ErroImportacao('Formato não suportado: envie um arquivo .csv ou .xlsx.')
+
+def em_lotes(iteravel, tamanho):
+    """Agrupar os itens em listas de até `tamanho` itens"""
+    iterador = iter(iteravel)
+    while lote := list(islice(iterador, tamanho)):
+        yield lote
+
+def texto_planilha(valor):
+    """Valor da célula como texto sem espaços nas pontas (números inteiros sem ".0")"""
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+def numero_planilha(valor):
+    """Converter número da planilha, aceitando o formato brasileiro (1.234,56 e R$)"""
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    texto = texto_planilha(valor).replace('R$', '').replace(' ', '')
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    return float(texto)
+
+def validar_material(linha):
+    """Validar uma linha da planilha de materiais.
+
+    Retorna (valores, None) com os campos prontos para o INSERT, ou
+    (None, mensagem de erro).
+    """
+    codigo = texto_planilha(linha.get('codigo'))
+    nome = texto_planilha(linha.get('nome'))
+    if not codigo or not nome:
+        return None, 'Código e nome são obrigatórios.'
+    if len(codigo) > 50 or len(nome) > 100:
+        return None, 'Código (até 50 caracteres) ou nome (até 100) muito longo.'
+
+    try:
+        preco_unitario = numero_planilha(linha.get('preco_unitario'))
+    except ValueError:
+        return None, 'Preço unitário inválido.'
+    if preco_unitario < 0:
+        return None, 'Preço unitário negativo.'
+
+    unidade_medida = texto_planilha(linha.get('unidade_medida')).upper() or 'UN'
+    if unidade_medida not in UNIDADES_MEDIDA:
+        return None, f'Unidade de medida inválida: {unidade_medida}.'
+
+    valores = {
+        'codigo': codigo,
+        'nome': nome,
+        'descricao': texto_planilha(linha.get('descricao')) or None,
+        'preco_unitario': round(preco_unitario, 2),
+        'unidade_medida': unidade_medida
+    }
+
+    if texto_planilha(linha.get('estoque_minimo')):
+        try:
+            valores['estoque_minimo'] = numero_planilha(linha.get('estoque_minimo'))
+        except ValueError:
+            return None, 'Estoque mínimo inválido.'
+
+    return valores, None
+
+def _gravar_lote_materiais(lote):
+    """Upsert de um lote de materiais válidos pelo código; retorna quantos eram novos"""
+    tabela = Material.__table__
+    codigos = [valores['codigo'] for valores in lote]
+    existentes = set(db.session.execute(
+        select(tabela.c.codigo).where(tabela.c.codigo.in_(codigos))
+    ).scalars())
+
+    # Executado como executemany: o INSERT é compilado uma vez e o driver
+    # agrupa as linhas em VALUES múltiplos. Estoque não vem da planilha: o
+    # saldo só muda pelo razão de estoque.
+    stmt = insert_upsert(tabela)
+    ids = dict(db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['codigo'],
+            set_={campo: stmt.excluded[campo] for campo in ('nome', 'descricao', 'preco_unitario', 'unidade_medida')}
+        ).returning(tabela.c.codigo, tabela.c.id),
+        [
+            {campo: valor for campo, valor in valores.items() if campo != 'estoque_minimo'} | {'quantidade_estoque': 0}
+            for valores in lote
+        ]
+    ).all())
+
+    minimos = [
+        {'material_id': ids[valores['codigo']], 'estoque_minimo': valores['estoque_minimo']}
+        for valores in lote if 'estoque_minimo' in valores
+    ]
+    if minimos:
+        alertas = AlertaEstoque.__table__
+        stmt = insert_upsert(alertas)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['material_id'],
+            set_={'estoque_minimo': stmt.excluded.estoque_minimo}
+        ), minimos)
+    atualizar_estoque_baixo(list(ids.values()))
+
+    return len(set(codigos) - existentes)
+
+def importar_materiais(linhas, tamanho_lote=2000):
+    """Importar materiais de `linhas` ((número, dict) de ler_planilha), com upsert pelo código.
+
+    Cada lote é gravado com um único INSERT ... ON CONFLICT (codigo) DO UPDATE
+    e um commit: materiais novos entram com estoque zero, os existentes têm
+    nome, descrição, preço e unidade atualizados. Linhas inválidas não
+    interrompem a importação e vão para 'erros' como (linha, mensagem). Se o
+    mesmo código aparece mais de uma vez no lote, vale a última linha.
+    Retorna {'inseridos', 'atualizados', 'erros'}.
+    """
+    resultado = {'inseridos': 0, 'atualizados': 0, 'erros': []}
+
+    for lote in em_lotes(linhas, tamanho_lote):
+        validos = {}
+        for numero, linha in lote:
+            valores, erro = validar_material(linha)
+            if erro:
+                resultado['erros'].append((numero, erro))
+                continue
+            anterior = validos.pop(valores['codigo'], None)
+            if anterior:
+                resultado['erros'].append((anterior[0], f'Código {valores["codigo"]} repetido na linha {numero}; vale a última.'))
+            validos[valores['codigo']] = (numero, valores)
+
+        if not validos:
+            continue
+
+        try:
+            inseridos = _gravar_lote_materiais([valores for _, valores in validos.values()])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            resultado['erros'].extend((numero, f'Erro ao gravar o lote: {e}') for numero, _ in validos.values())
+            continue
+
+        resultado['inseridos'] += inseridos
+        resultado['atualizados'] += len(validos) - inseridos
+
+    return resultado
+
+def normalizar_cpf_cnpj(valor):
+    """Só os dígitos do CPF/CNPJ. Células numéricas da planilha perdem os
+    zeros à esquerda, que são recolocados (11 dígitos para CPF, 14 para CNPJ)."""
+    if isinstance(valor, (int, float)):
+        digitos = texto_planilha(valor)
+        return digitos.zfill(11 if len(digitos) <= 11 else 14)
+    return ''.join(filter(str.isdigit, texto_planilha(valor)))
+
+def _digito_verificador(digitos, pesos):
+    resto = sum(int(d) * p for d, p in zip(digitos, pesos)) % 11
+    return '0' if resto < 2 else str(11 - resto)
+
+def cpf_cnpj_valido(numero):
+    """Conferir os dígitos verificadores de um CPF (11 dígitos) ou CNPJ (14 dígitos)"""
+    if len(numero) == 11:
+        pesos = range(10, 1, -1)
+        pesos_segundo = range(11, 1, -1)
+    elif len(numero) == 14:
+        pesos = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
+        pesos_segundo = [6] + pesos
+    else:
+        return False
+
+    if numero == numero[0] * len(numero):
+        return False
+
+    base = numero[:-2]
+    primeiro = _digito_verificador(base, pesos)
+    return numero[-2:] == primeiro + _digito_verificador(base + primeiro, pesos_segundo)
+
+_LIMITES_CLIENTE = {'nome': 100, 'telefone': 20, 'email': 120, 'endereco': 200, 'cidade': 100, 'cep': 10}
+
+def validar_cliente(linha):
+    """Validar uma linha da planilha de clientes: (valores, None) ou (None, mensagem)"""
+    nome = texto_planilha(linha.get('nome'))
+    cpf_cnpj = normalizar_cpf_cnpj(linha.get('cpf_cnpj') or linha.get('cpf') or linha.get('cnpj'))
+    if not nome or not cpf_cnpj:
+        return None, 'Nome e CPF/CNPJ são obrigatórios.'
+    if not cpf_cnpj_valido(cpf_cnpj):
+        return None, f'CPF/CNPJ inválido: {cpf_cnpj}.'
+
+    valores = {'cpf_cnpj': cpf_cnpj}
+    for campo, limite in _LIMITES_CLIENTE.items():
+        valor = texto_planilha(linha.get(campo))
+        if len(valor) > limite:
+            return None, f'Campo {campo} com mais de {limite} caracteres.'
+        valores[campo] = valor or None
+
+    estado = texto_planilha(linha.get('estado')).upper()
+    if len(estado) > 2:
+        return None, 'Estado deve ser a sigla (UF).'
+    valores['estado'] = estado or None
+
+    return valores, None
+
+def importar_clientes(linhas, tamanho_lote=2000, simular=False):
+    """Importar clientes de `linhas` ((número, dict) de ler_planilha).
+
+    CPF/CNPJ é normalizado e tem os dígitos verificadores conferidos. Clientes
+    repetidos no arquivo (vale a primeira linha) ou já cadastrados não são
+    importados: cada lote faz uma única consulta pelos CPF/CNPJ do lote e um
+    único INSERT com os novos, seguido de commit. Com `simular`, nada é
+    gravado e o resultado mostra o que seria importado. Retorna {'inseridos',
+    'existentes', 'erros'}; 'existentes' e 'erros' são listas de (linha, mensagem).
+    """
+    tabela = Cliente.__table__
+    resultado = {'inseridos': 0, 'existentes': [], 'erros': []}
+    vistos = {}
+
+    for lote in em_lotes(linhas, tamanho_lote):
+        novos = {}
+        for numero, linha in lote:
+            valores, erro = validar_cliente(linha)
+            if erro:
+                resultado['erros'].append((numero, erro))
+            elif valores['cpf_cnpj'] in vistos:
+                resultado['erros'].append((numero, f'CPF/CNPJ repetido no arquivo (linha {vistos[valores["cpf_cnpj"]]}).'))
+            else:
+                vistos[valores['cpf_cnpj']] = numero
+                novos[valores['cpf_cnpj']] = (numero, valores)
+
+        if not novos:
+            continue
+
+        for cpf_cnpj in db.session.execute(
+            select(tabela.c.cpf_cnpj).where(tabela.c.cpf_cnpj.in_(list(novos)))
+        ).scalars():
+            numero, _ = novos.pop(cpf_cnpj)
+            resultado['existentes'].append((numero, f'CPF/CNPJ {cpf_cnpj} já cadastrado.'))
+
+        if simular or not novos:
+            resultado['inseridos'] += len(novos)
+            continue
+
+        try:
+            # ON CONFLICT cobre um cadastro feito por outro usuário durante a importação
+            inseridos = db.session.execute(
+                insert_upsert(tabela)
+                .on_conflict_do_nothing(index_elements=['cpf_cnpj'])
+                .returning(tabela.c.cpf_cnpj),
+                [valores for _, valores in novos.values()]
+            ).scalars().all()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            resultado['erros'].extend((numero, f'Erro ao gravar o lote: {e}') for numero, _ in novos.values())
+            continue
+
+        resultado['inseridos'] += len(inseridos)
+        for cpf_cnpj in set(novos) - set(inseridos):
+            resultado['existentes'].append((novos[cpf_cnpj][0], f'CPF/CNPJ {cpf_cnpj} já cadastrado.'))
+
+    return resultado
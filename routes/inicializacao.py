@@ -0,0 +1,35 @@
+from src.models import db, Usuario
+from src.utils.busca import criar_indices_busca
+from src.utils.autocomplete import carregar_indices_autocomplete
+from src.utils.estoque import atualizar_estoque_baixo
+
+# Inicialização comum às fábricas da aplicação (main.py e maininciaç.py),
+# para que as duas subam o banco do mesmo jeito.
+
+def inicializar_banco(app):
+    """Criar tabelas e índices de busca, preencher os alertas de estoque, carregar o autocomplete e o usuário master"""
+    with app.app_context():
+        # Só no banco principal (o bind 'replica' é somente leitura)
+        db.create_all(bind_key=None)
+        
+        # Índices de busca (PostgreSQL)
+        criar_indices_busca()
+        
+        # Alertas de estoque baixo dos materiais que ainda não têm um (só grava
+        # as linhas que faltam ou cuja marca mudou; ver flask materiais atualizar-estoque-baixo)
+        atualizar_estoque_baixo()
+        db.session.commit()
+        
+        # Índices em memória do autocomplete
+        carregar_indices_autocomplete()
+        
+        # Criar usuário master se não existir
+        if not Usuario.query.filter_by(email='rodrigo@lantercar.com').first():
+            usuario_master = Usuario(
+                nome='Rodrigo',
+                email='rodrigo@lantercar.com'
+            )
+            usuario_master.set_password('1234')
+            db.session.add(usuario_master)
+            db.session.commit()
+            print("Usuário master criado: rodrigo@lantercar.com / 1234")
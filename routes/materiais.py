@@ -1,7 +1,16 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
-from flask_login import login_required
-from src.models import db, Material
+from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
+from src.models import db, Material, MovimentacaoEstoque, AlertaEstoque
+from src.utils.estatisticas import invalidar_estatisticas_dashboard
+from src.utils.busca import buscar
+from src.utils.autocomplete import indice_materiais, resposta_autocomplete
+from src.utils.importacao import ler_planilha, importar_materiais, ErroImportacao
+from src.utils.precos import reajustar_precos, aplicar_tabela_precos, atualizar_orcamentos_pendentes
+from src.utils.estoque import (movimentar_estoque, ajustar_saldo, definir_estoque_minimo,
+                               atualizar_estoque_baixo, EstoqueInsuficiente, EstoqueAlterado)
 from datetime import datetime
+import click
 
 materiais_bp = Blueprint('materiais', __name__)
 
@@ -10,21 +19,50 @@ materiais_bp = Blueprint('materiais', __name__)
 def listar():
     page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '', type=str)
+    estoque_baixo = request.args.get('estoque_baixo', type=int) or None
     
-    query = Material.query
+    query = Material.query.options(joinedload(Material.alerta_estoque))
+    
+    if estoque_baixo:
+        query = query.join(AlertaEstoque).filter(AlertaEstoque.baixo)
     
     if search:
-        query = query.filter(
-            Material.nome.contains(search) | 
-            Material.codigo.contains(search) |
-            Material.descricao.contains(search)
-        )
+        query = buscar(query, search, Material.nome, Material.codigo, Material.descricao)
     
     materiais = query.order_by(Material.nome).paginate(
         page=page, per_page=20, error_out=False
     )
     
-    return render_template('materiais/listar.html', materiais=materiais, search=search)
+    return render_template('materiais/listar.html', materiais=materiais, search=search,
+                           estoque_baixo=estoque_baixo)
+
+@materiais_bp.route('/estoque-baixo')
+@login_required
+def estoque_baixo():
+    """API da lista de materiais com estoque baixo, paginada"""
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 50, type=int), 200)
+    
+    alertas = AlertaEstoque.query.options(joinedload(AlertaEstoque.material)).filter(
+        AlertaEstoque.baixo
+    ).order_by(AlertaEstoque.baixo_desde, AlertaEstoque.material_id).paginate(
+        page=page, per_page=per_page, error_out=False
+    )
+    
+    return jsonify({
+        'materiais': [{
+            'id': alerta.material_id,
+            'nome': alerta.material.nome,
+            'codigo': alerta.material.codigo,
+            'quantidade_estoque': alerta.material.quantidade_estoque,
+            'estoque_minimo': alerta.estoque_minimo,
+            'unidade_medida': alerta.material.unidade_medida,
+            'baixo_desde': alerta.baixo_desde.isoformat() if alerta.baixo_desde else None
+        } for alerta in alertas.items],
+        'page': alertas.page,
+        'pages': alertas.pages,
+        'total': alertas.total
+    })
 
 @materiais_bp.route('/cadastrar', methods=['GET', 'POST'])
 @login_required
@@ -35,6 +73,7 @@ def cadastrar():
         codigo = request.form.get('codigo')
         preco_unitario = request.form.get('preco_unitario')
         quantidade_estoque = request.form.get('quantidade_estoque', 0)
+        estoque_minimo = request.form.get('estoque_minimo', type=float)
         unidade_medida = request.form.get('unidade_medida', 'UN')
         
         if not all([nome, codigo, preco_unitario]):
@@ -51,11 +90,25 @@ def cadastrar():
                 descricao=descricao,
                 codigo=codigo,
                 preco_unitario=float(preco_unitario),
-                quantidade_estoque=int(quantidade_estoque),
+                quantidade_estoque=0,
                 unidade_medida=unidade_medida
             )
             db.session.add(material)
+            db.session.flush()
+            
+            # Estoque inicial entra pelo razão de estoque
+            if int(quantidade_estoque) > 0:
+                movimentar_estoque(material.id, int(quantidade_estoque), 'entrada',
+                                   usuario_id=current_user.id, observacao='Estoque inicial')
+            
+            if estoque_minimo is not None:
+                definir_estoque_minimo(material.id, estoque_minimo)
+            else:
+                atualizar_estoque_baixo([material.id])
+            
             db.session.commit()
+            invalidar_estatisticas_dashboard()
+            indice_materiais.atualizar_ids([material.id])
             flash('Material cadastrado com sucesso!', 'success')
             return redirect(url_for('materiais.listar'))
         except Exception as e:
@@ -75,6 +128,8 @@ def editar(id):
         codigo = request.form.get('codigo')
         preco_unitario = request.form.get('preco_unitario')
         quantidade_estoque = request.form.get('quantidade_estoque')
+        quantidade_anterior = request.form.get('quantidade_anterior', type=float)
+        estoque_minimo = request.form.get('estoque_minimo', type=float)
         unidade_medida = request.form.get('unidade_medida')
         
         if not all([nome, codigo, preco_unitario]):
@@ -92,12 +147,24 @@ def editar(id):
             material.descricao = descricao
             material.codigo = codigo
             material.preco_unitario = float(preco_unitario)
-            material.quantidade_estoque = int(quantidade_estoque)
             material.unidade_medida = unidade_medida
             
+            # Alteração de saldo vira um lançamento de ajuste
+            ajustar_saldo(material.id, int(quantidade_estoque), quantidade_anterior, current_user.id)
+            if estoque_minimo is not None:
+                definir_estoque_minimo(material.id, estoque_minimo)
+            
             db.session.commit()
+            invalidar_estatisticas_dashboard()
+            indice_materiais.atualizar_ids([material.id])
             flash('Material atualizado com sucesso!', 'success')
             return redirect(url_for('materiais.listar'))
+        except EstoqueAlterado:
+            db.session.rollback()
+            flash('O estoque foi alterado por outro usuário. Confira o saldo atual e tente novamente.', 'error')
+        except EstoqueInsuficiente:
+            db.session.rollback()
+            flash('O estoque não pode ficar abaixo do saldo reservado para orçamentos aceitos.', 'error')
         except Exception as e:
             db.session.rollback()
             flash('Erro ao atualizar material.', 'error')
@@ -108,7 +175,10 @@ def editar(id):
 @login_required
 def visualizar(id):
     material = Material.query.get_or_404(id)
-    return render_template('materiais/visualizar.html', material=material)
+    movimentacoes = MovimentacaoEstoque.query.filter_by(material_id=id).order_by(
+        MovimentacaoEstoque.data.desc(), MovimentacaoEstoque.id.desc()
+    ).limit(20).all()
+    return render_template('materiais/visualizar.html', material=material, movimentacoes=movimentacoes)
 
 @materiais_bp.route('/excluir/<int:id>')
 @login_required
@@ -120,9 +190,16 @@ def excluir(id):
         flash('Não é possível excluir este material pois ele está sendo usado em orçamentos.', 'error')
         return redirect(url_for('materiais.listar'))
     
+    # O histórico de movimentações do estoque é mantido
+    if db.session.query(MovimentacaoEstoque.query.filter_by(material_id=id).exists()).scalar():
+        flash('Não é possível excluir este material pois ele tem movimentações de estoque registradas.', 'error')
+        return redirect(url_for('materiais.listar'))
+    
     try:
         db.session.delete(material)
         db.session.commit()
+        invalidar_estatisticas_dashboard()
+        indice_materiais.remover(id)
         flash('Material excluído com sucesso!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -139,23 +216,8 @@ def api_buscar():
     if len(search) < 2:
         return jsonify([])
     
-    materiais = Material.query.filter(
-        Material.nome.contains(search) | 
-        Material.codigo.contains(search)
-    ).limit(10).all()
-    
-    result = []
-    for material in materiais:
-        result.append({
-            'id': material.id,
-            'nome': material.nome,
-            'codigo': material.codigo,
-            'preco_unitario': float(material.preco_unitario),
-            'unidade_medida': material.unidade_medida,
-            'estoque': material.quantidade_estoque
-        })
-    
-    return jsonify(result)
+    # Índice em memória; o navegador reaproveita a resposta pelo ETag
+    return resposta_autocomplete(indice_materiais, search)
 
 @materiais_bp.route('/ajustar-estoque/<int:id>', methods=['POST'])
 @login_required
@@ -164,15 +226,184 @@ def ajustar_estoque(id):
     
     try:
         nova_quantidade = int(request.form.get('nova_quantidade'))
-        material.quantidade_estoque = nova_quantidade
+        ajustar_saldo(material.id, nova_quantidade,
+                      request.form.get('quantidade_anterior', type=float), current_user.id)
         db.session.commit()
+        invalidar_estatisticas_dashboard()
+        indice_materiais.atualizar_ids([material.id])
         flash('Estoque ajustado com sucesso!', 'success')
+    except EstoqueAlterado:
+        db.session.rollback()
+        flash('O estoque foi alterado por outro usuário. Confira o saldo atual e tente novamente.', 'error')
+    except EstoqueInsuficiente:
+        db.session.rollback()
+        flash('O estoque não pode ficar abaixo do saldo reservado para orçamentos aceitos.', 'error')
     except Exception as e:
         db.session.rollback()
         flash('Erro ao ajustar estoque.', 'error')
     
     return redirect(url_for('materiais.visualizar', id=id))
 
+@materiais_bp.route('/movimentar-estoque/<int:id>', methods=['POST'])
+@login_required
+def movimentar(id):
+    material = Material.query.get_or_404(id)
+    tipo = request.form.get('tipo')
+    quantidade = request.form.get('quantidade', type=int)
+    
+    if tipo not in ('entrada', 'saida') or not quantidade or quantidade <= 0:
+        flash('Informe o tipo e uma quantidade válida.', 'error')
+        return redirect(url_for('materiais.visualizar', id=id))
+    
+    try:
+        movimentar_estoque(material.id, quantidade if tipo == 'entrada' else -quantidade, tipo,
+                           usuario_id=current_user.id, observacao=request.form.get('observacao') or None)
+        db.session.commit()
+        invalidar_estatisticas_dashboard()
+        indice_materiais.atualizar_ids([material.id])
+        flash('Movimentação registrada com sucesso!', 'success')
+    except EstoqueInsuficiente:
+        db.session.rollback()
+        flash('Estoque disponível insuficiente para esta saída (o saldo reservado para orçamentos aceitos não pode ser usado).', 'error')
+    except Exception as e:
+        db.session.rollback()
+        flash('Erro ao registrar movimentação.', 'error')
+    
+    return redirect(url_for('materiais.visualizar', id=id))
 
-@materiais_bp.route('/api/buscar')
+@materiais_bp.route('/importar', methods=['POST'])
+@login_required
+def importar():
+    """Importar/atualizar materiais de uma planilha CSV ou XLSX (upsert pelo código)"""
+    arquivo = request.files.get('arquivo')
+    
+    if not arquivo or not arquivo.filename:
+        flash('Selecione um arquivo CSV ou XLSX.', 'error')
+        return redirect(url_for('materiais.listar'))
+    
+    try:
+        resultado = importar_materiais(ler_planilha(arquivo.stream, arquivo.filename))
+    except ErroImportacao as e:
+        flash(str(e), 'error')
+        return redirect(url_for('materiais.listar'))
+    
+    invalidar_estatisticas_dashboard()
+    indice_materiais.carregar()
+    
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(resultado)
+    
+    flash(f'Importação concluída: {resultado["inseridos"]} material(is) novo(s), '
+          f'{resultado["atualizados"]} atualizado(s).', 'success')
+    if resultado['erros']:
+        erros = '; '.join(f'linha {linha}: {mensagem}' for linha, mensagem in resultado['erros'][:10])
+        mais = len(resultado['erros']) - 10
+        flash(f'{len(resultado["erros"])} linha(s) com erro — {erros}' + (f' (e mais {mais})' if mais > 0 else ''), 'error')
+    
+    return redirect(url_for('materiais.listar'))
+
+@materiais_bp.cli.command('importar')
+@click.argument('caminho', type=click.Path(exists=True, dir_okay=False))
+@click.option('--lote', default=2000, show_default=True, help='Linhas por INSERT ... ON CONFLICT.')
+def importar_cli(caminho, lote):
+    """Importar materiais de uma planilha CSV ou XLSX: DB_PERFIL=batch flask materiais importar ARQUIVO"""
+    with open(caminho, 'rb') as arquivo:
+        try:
+            resultado = importar_materiais(ler_planilha(arquivo, caminho), tamanho_lote=lote)
+        except ErroImportacao as e:
+            raise click.ClickException(str(e))
+    
+    for linha, mensagem in resultado['erros']:
+        click.echo(f'Linha {linha}: {mensagem}', err=True)
+    click.echo(f'{resultado["inseridos"]} inserido(s), {resultado["atualizados"]} atualizado(s), '
+               f'{len(resultado["erros"])} erro(s).')
+
+@materiais_bp.cli.command('atualizar-estoque-baixo')
+def atualizar_estoque_baixo_cli():
+    """Preencher/recalcular o alerta de estoque baixo de todos os materiais.
+
+    Também roda na inicialização da aplicação; serve para recalcular depois
+    de alterar saldos direto no banco.
+    """
+    atualizar_estoque_baixo()
+    db.session.commit()
+    invalidar_estatisticas_dashboard()
+    click.echo(f'{AlertaEstoque.query.filter_by(baixo=True).count()} material(is) com estoque baixo.')
+
+def _reajustar(percentual=None, prefixo_codigo=None, linhas=None, atualizar_orcamentos=False):
+    """Reajuste por percentual ou por planilha; retorna (ids dos materiais, erros, ids dos orçamentos)"""
+    if linhas is not None:
+        resultado = aplicar_tabela_precos(linhas)
+        material_ids, erros = resultado['ids'], resultado['erros']
+    else:
+        material_ids, erros = reajustar_precos(percentual, prefixo_codigo), []
+    
+    orcamento_ids = atualizar_orcamentos_pendentes(material_ids) if atualizar_orcamentos else set()
+    db.session.commit()
+    return material_ids, erros, orcamento_ids
+
+@materiais_bp.route('/reajustar-precos', methods=['POST'])
 @login_required
+def reajustar():
+    """Reajustar preços em lote: percentual (com prefixo de código opcional) ou planilha codigo/preco_unitario"""
+    arquivo = request.files.get('arquivo')
+    atualizar_orcamentos = bool(request.form.get('atualizar_orcamentos'))
+    
+    try:
+        if arquivo and arquivo.filename:
+            material_ids, erros, orcamento_ids = _reajustar(
+                linhas=ler_planilha(arquivo.stream, arquivo.filename),
+                atualizar_orcamentos=atualizar_orcamentos
+            )
+        else:
+            percentual = request.form.get('percentual', type=float)
+            if percentual is None or percentual <= -100:
+                flash('Informe um percentual de reajuste válido ou uma planilha de preços.', 'error')
+                return redirect(url_for('materiais.listar'))
+            material_ids, erros, orcamento_ids = _reajustar(
+                percentual, request.form.get('prefixo_codigo', '').strip() or None,
+                atualizar_orcamentos=atualizar_orcamentos
+            )
+    except ErroImportacao as e:
+        flash(str(e), 'error')
+        return redirect(url_for('materiais.listar'))
+    except Exception as e:
+        db.session.rollback()
+        flash('Erro ao reajustar preços.', 'error')
+        return redirect(url_for('materiais.listar'))
+    
+    invalidar_estatisticas_dashboard()
+    indice_materiais.carregar()
+    
+    flash(f'Preço de {len(material_ids)} material(is) reajustado; '
+          f'{len(orcamento_ids)} orçamento(s) pendente(s) atualizado(s).', 'success')
+    if erros:
+        detalhes = '; '.join(f'linha {linha}: {mensagem}' for linha, mensagem in erros[:10])
+        flash(f'{len(erros)} linha(s) com erro — {detalhes}', 'error')
+    
+    return redirect(url_for('materiais.listar'))
+
+@materiais_bp.cli.command('reajustar-precos')
+@click.option('--percentual', type=float, help='Reajuste percentual (negativo para reduzir).')
+@click.option('--prefixo', help='Só os materiais com código começando com este prefixo.')
+@click.option('--arquivo', type=click.Path(exists=True, dir_okay=False), help='Planilha com codigo e preco_unitario.')
+@click.option('--orcamentos', is_flag=True, help='Levar os novos preços aos orçamentos pendentes.')
+def reajustar_cli(percentual, prefixo, arquivo, orcamentos):
+    """Reajustar preços de materiais em lote (rodar com DB_PERFIL=batch)"""
+    if (percentual is None) == (arquivo is None):
+        raise click.UsageError('Informe --percentual ou --arquivo.')
+    
+    try:
+        if arquivo:
+            with open(arquivo, 'rb') as planilha:
+                material_ids, erros, orcamento_ids = _reajustar(
+                    linhas=ler_planilha(planilha, arquivo), atualizar_orcamentos=orcamentos
+                )
+        else:
+            material_ids, erros, orcamento_ids = _reajustar(percentual, prefixo, atualizar_orcamentos=orcamentos)
+    except ErroImportacao as e:
+        raise click.ClickException(str(e))
+    
+    for linha, mensagem in erros:
+        click.echo(f'Linha {linha}: {mensagem}', err=True)
+    click.echo(f'{len(material_ids)} material(is) reajustado(s), {len(orcamento_ids)} orçamento(s) atualizado(s).')
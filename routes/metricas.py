@@ -0,0 +1,129 @@
+from flask import Blueprint, current_app, request, jsonify, abort
+from flask_login import current_user
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+from src.models import db
+import hmac
+import os
+import threading
+import time
+
+metricas_bp = Blueprint('metricas', __name__)
+
+class MetricasPool:
+    """Contadores dos pools de conexões deste processo, por nome do pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores = {}
+
+    def _do_pool(self, nome):
+        return self._contadores.setdefault(nome, {
+            'checkouts': 0,
+            'espera_total_ms': 0.0,
+            'espera_max_ms': 0.0,
+            'timeouts': 0,
+            'conexoes_abertas': 0,
+            'invalidacoes': 0,
+            'invalidacoes_leves': 0
+        })
+
+    def registrar_espera(self, nome, segundos, timeout=False):
+        with self._lock:
+            contadores = self._do_pool(nome)
+            milissegundos = segundos * 1000
+            contadores['espera_total_ms'] += milissegundos
+            contadores['espera_max_ms'] = max(contadores['espera_max_ms'], milissegundos)
+            if timeout:
+                contadores['timeouts'] += 1
+            else:
+                contadores['checkouts'] += 1
+
+    def incrementar(self, nome, contador):
+        with self._lock:
+            self._do_pool(nome)[contador] += 1
+
+    def resumo(self, nome, pool):
+        """Contadores acumulados mais o estado atual do pool (em uso, overflow)"""
+        with self._lock:
+            resumo = dict(self._do_pool(nome))
+        if resumo['checkouts']:
+            resumo['espera_media_ms'] = resumo['espera_total_ms'] / resumo['checkouts']
+        if isinstance(pool, QueuePool):
+            resumo.update({
+                'tamanho': pool.size(),
+                'em_uso': pool.checkedout(),
+                'livres': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0)
+            })
+        return resumo
+
+metricas_pool = MetricasPool()
+
+class QueuePoolMedido(QueuePool):
+    """QueuePool que mede quanto cada checkout esperou por uma conexão.
+
+    O nome do pool (pool_logging_name) é mantido quando o engine recria o
+    pool, então as métricas continuam no mesmo contador.
+    """
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexao = super()._do_get()
+        except exc.TimeoutError:
+            metricas_pool.registrar_espera(self.logging_name, time.perf_counter() - inicio, timeout=True)
+            raise
+        metricas_pool.registrar_espera(self.logging_name, time.perf_counter() - inicio)
+        return conexao
+
+def opcoes_pool_medido(opcoes, nome):
+    """Opções do engine com o QueuePoolMedido (só quando o perfil define um QueuePool)"""
+    if 'pool_size' not in opcoes:
+        return opcoes
+    return dict(opcoes, poolclass=QueuePoolMedido, pool_logging_name=nome)
+
+def configurar_pool(app):
+    """Usar o pool medido no engine principal e nos binds (réplica); chamar antes de db.init_app"""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes_pool_medido(
+        app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}), 'principal'
+    )
+    app.config['SQLALCHEMY_BINDS'] = {
+        chave: opcoes_pool_medido(opcoes, chave) if isinstance(opcoes, dict) else opcoes
+        for chave, opcoes in (app.config.get('SQLALCHEMY_BINDS') or {}).items()
+    }
+
+def instrumentar_engine(engine, nome):
+    """Contar conexões abertas e invalidadas (conexões perdidas) do pool do engine"""
+    event.listen(engine, 'connect', lambda *args: metricas_pool.incrementar(nome, 'conexoes_abertas'))
+    event.listen(engine, 'invalidate', lambda *args: metricas_pool.incrementar(nome, 'invalidacoes'))
+    event.listen(engine, 'soft_invalidate', lambda *args: metricas_pool.incrementar(nome, 'invalidacoes_leves'))
+
+def _nome_engine(chave):
+    return chave or 'principal'
+
+@metricas_bp.record_once
+def _instrumentar_engines(state):
+    with state.app.app_context():
+        for chave, engine in db.engines.items():
+            instrumentar_engine(engine, _nome_engine(chave))
+
+@metricas_bp.route('/metricas/pool')
+def pool():
+    """Métricas dos pools de conexões deste worker (uso interno/monitoramento)"""
+    token = current_app.config.get('METRICAS_TOKEN')
+    # O token é conferido antes para o monitoramento não precisar carregar usuário;
+    # em bytes, porque compare_digest recusa str com caracteres fora do ASCII
+    autorizado = token and hmac.compare_digest(request.headers.get('X-Metricas-Token', '').encode('utf-8'),
+                                               token.encode('utf-8'))
+    if not (autorizado or current_user.is_authenticated):
+        abort(404)
+
+    return jsonify({
+        'pid': os.getpid(),
+        'perfil': current_app.config.get('DB_PERFIL'),
+        'pools': {
+            _nome_engine(chave): metricas_pool.resumo(_nome_engine(chave), engine.pool)
+            for chave, engine in db.engines.items()
+        }
+    })
@@ -1,10 +1,28 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, make_response
-from flask_login import login_required
-from src.models import db, NotaFiscal, OrdemServico
+from flask import Blueprint, render_template, request, redirect, url_for, flash, Response, stream_with_context
+from flask_login import login_required, current_user
+from src.models import db, NotaFiscal, OrdemServico, Orcamento, Cliente
+from src.utils.estatisticas import invalidar_estatisticas_dashboard
+from src.utils.cache_pdf import invalidar_pdf
+from src.utils.resumos import registrar_nota_fiscal_cancelada
+from src.utils.busca import buscar
+from src.utils.documentos import carregar_notas_fiscais, carregar_ou_404
+from src.utils.replica import somente_leitura
 from datetime import datetime
 
 notas_fiscais_bp = Blueprint('notas_fiscais', __name__)
 
+def filtrar_notas_fiscais(search, status_filter):
+    """Query das notas fiscais com os filtros da listagem"""
+    query = NotaFiscal.query.join(NotaFiscal.ordem_servico).join(OrdemServico.orcamento).join(Orcamento.cliente)
+    
+    if search:
+        query = buscar(query, search, NotaFiscal.numero_nf, OrdemServico.numero_ordem, Cliente.nome)
+    
+    if status_filter:
+        query = query.filter(NotaFiscal.status == status_filter)
+    
+    return query
+
 @notas_fiscais_bp.route('/')
 @login_required
 def listar():
@@ -12,17 +30,7 @@ def listar():
     search = request.args.get('search', '', type=str)
     status_filter = request.args.get('status', '', type=str)
     
-    query = NotaFiscal.query.join(OrdemServico).join(OrdemServico.orcamento).join(OrdemServico.orcamento.cliente)
-    
-    if search:
-        query = query.filter(
-            NotaFiscal.numero_nf.contains(search) |
-            OrdemServico.numero_ordem.contains(search) |
-            OrdemServico.orcamento.cliente.nome.contains(search)
-        )
-    
-    if status_filter:
-        query = query.filter(NotaFiscal.status == status_filter)
+    query = filtrar_notas_fiscais(search, status_filter)
     
     notas_fiscais = query.order_by(NotaFiscal.data_emissao.desc()).paginate(
         page=page, per_page=20, error_out=False
@@ -36,27 +44,64 @@ def listar():
 @notas_fiscais_bp.route('/visualizar/<int:id>')
 @login_required
 def visualizar(id):
-    nota_fiscal = NotaFiscal.query.get_or_404(id)
+    nota_fiscal = carregar_ou_404(carregar_notas_fiscais, id)
     return render_template('notas_fiscais/visualizar.html', nota_fiscal=nota_fiscal)
 
 @notas_fiscais_bp.route('/pdf/<int:id>')
 @login_required
 def gerar_pdf(id):
-    nota_fiscal = NotaFiscal.query.get_or_404(id)
+    nota_fiscal = carregar_ou_404(carregar_notas_fiscais, id)
     
     try:
-        from src.utils.pdf_generator import gerar_pdf_nota_fiscal
-        pdf_content = gerar_pdf_nota_fiscal(nota_fiscal)
-        
-        response = make_response(pdf_content)
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'attachment; filename=nota_fiscal_{nota_fiscal.numero_nf}.pdf'
+        from src.utils.pdf_generator import gerar_pdf_nota_fiscal, campos_pdf_nota_fiscal
+        from src.utils.cache_pdf import resposta_pdf_cache
         
-        return response
+        return resposta_pdf_cache(
+            'nota_fiscal', nota_fiscal.id, campos_pdf_nota_fiscal(nota_fiscal),
+            lambda: gerar_pdf_nota_fiscal(nota_fiscal),
+            f'nota_fiscal_{nota_fiscal.numero_nf}.pdf'
+        )
     except Exception as e:
         flash('Erro ao gerar PDF da nota fiscal.', 'error')
         return redirect(url_for('notas_fiscais.visualizar', id=id))
 
+@notas_fiscais_bp.route('/exportar-pdfs')
+@login_required
+@somente_leitura
+def exportar_pdfs():
+    """ZIP com os PDFs das notas fiscais da listagem filtrada e do período"""
+    search = request.args.get('search', '', type=str)
+    status_filter = request.args.get('status', '', type=str)
+    
+    from src.utils.exportacao_pdf import filtrar_periodo, exportar_pdfs_zip
+    from src.utils.pdf_generator import gerar_pdf_nota_fiscal, campos_pdf_nota_fiscal, dados_pdf_nota_fiscal
+    
+    query, erros = filtrar_periodo(
+        filtrar_notas_fiscais(search, status_filter), NotaFiscal.data_emissao,
+        request.args.get('data_inicio'), request.args.get('data_fim')
+    )
+    if erros:
+        for erro in erros:
+            flash(erro, 'error')
+        return redirect(url_for('notas_fiscais.listar'))
+    
+    ids = [id for (id,) in query.with_entities(NotaFiscal.id).order_by(NotaFiscal.data_emissao)]
+    if not ids:
+        flash('Nenhuma nota fiscal encontrada para exportar.', 'error')
+        return redirect(url_for('notas_fiscais.listar'))
+    
+    conteudo = exportar_pdfs_zip(
+        ids, carregar_notas_fiscais, 'nota_fiscal',
+        gerar_pdf_nota_fiscal, campos_pdf_nota_fiscal, dados_pdf_nota_fiscal,
+        lambda nota_fiscal: f'nota_fiscal_{nota_fiscal.numero_nf}.pdf',
+        request.args.get('exportacao'), current_user.id
+    )
+    
+    response = Response(stream_with_context(conteudo), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename=notas_fiscais_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
+    response.headers['X-Total-Documentos'] = str(len(ids))
+    return response
+
 @notas_fiscais_bp.route('/cancelar/<int:id>')
 @login_required
 def cancelar(id):
@@ -68,7 +113,10 @@ def cancelar(id):
     
     try:
         nota_fiscal.status = 'cancelada'
+        registrar_nota_fiscal_cancelada(nota_fiscal)
         db.session.commit()
+        invalidar_estatisticas_dashboard()
+        invalidar_pdf('nota_fiscal', nota_fiscal.id)
         flash('Nota fiscal cancelada com sucesso.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -0,0 +1,177 @@
+from sqlalchemy import select, update, delete, insert, func, bindparam
+from src.models import db, Material, Orcamento, OrcamentoItem, ReservaEstoque
+from src.utils.importacao import em_lotes
+from collections import defaultdict
+import math
+
+_COLUNAS_ITEM = ('material_id', 'quantidade', 'preco_unitario', 'subtotal')
+
+def itens_do_formulario(form):
+    """Itens enviados pelo formulário do orçamento (material_id[], quantidade[],
+    preco_unitario[]), ignorando linhas incompletas.
+
+    Retorna (itens, erros): itens como dicts com 'linha' (posição no
+    formulário, a partir de 1) e subtotal já calculado; erros como dicts
+    {'linha', 'material_id', 'mensagem'}.
+    """
+    itens, erros = [], []
+    for linha, (material_id, quantidade, preco) in enumerate(zip(form.getlist('material_id[]'),
+                                                                  form.getlist('quantidade[]'),
+                                                                  form.getlist('preco_unitario[]')), start=1):
+        if not (material_id and quantidade and preco):
+            continue
+        try:
+            item = {
+                'linha': linha,
+                'material_id': int(material_id),
+                'quantidade': float(quantidade),
+                'preco_unitario': float(preco)
+            }
+        except ValueError:
+            erros.append({'linha': linha, 'material_id': material_id, 'mensagem': 'Material, quantidade ou preço inválido.'})
+            continue
+        # float() aceita 'nan' e 'inf', que passariam pelas comparações abaixo
+        if not (math.isfinite(item['quantidade']) and math.isfinite(item['preco_unitario'])):
+            erros.append({'linha': linha, 'material_id': material_id, 'mensagem': 'Material, quantidade ou preço inválido.'})
+            continue
+        if item['quantidade'] <= 0 or item['preco_unitario'] < 0:
+            erros.append({'linha': linha, 'material_id': item['material_id'],
+                          'mensagem': 'Quantidade deve ser positiva e o preço não pode ser negativo.'})
+            continue
+        item['subtotal'] = item['quantidade'] * item['preco_unitario']
+        itens.append(item)
+    return itens, erros
+
+def validar_itens(itens, precos_gravados=()):
+    """Conferir os itens contra o cadastro de materiais com uma única consulta.
+
+    Material inexistente e preço diferente do cadastro são erros ({'linha',
+    'material_id', 'mensagem'}), exceto para os itens cujo (material_id, preço)
+    está em `precos_gravados` (de precos_itens_gravados, na edição), que podem
+    manter o preço antigo. Quantidade maior que o disponível (saldo - reservas
+    ativas) é só aviso, já que o estoque só é reservado quando o orçamento é
+    aceito. Retorna (erros, avisos).
+    """
+    materiais = Material.__table__
+    reservas = ReservaEstoque.__table__
+
+    reservado = select(
+        reservas.c.material_id,
+        func.sum(reservas.c.quantidade).label('quantidade')
+    ).where(reservas.c.status == 'ativa').group_by(reservas.c.material_id).subquery()
+
+    cadastro = {material.id: material for material in db.session.execute(
+        select(
+            materiais.c.id, materiais.c.nome, materiais.c.preco_unitario,
+            (materiais.c.quantidade_estoque - func.coalesce(reservado.c.quantidade, 0)).label('disponivel')
+        )
+        .select_from(materiais.outerjoin(reservado, reservado.c.material_id == materiais.c.id))
+        .where(materiais.c.id.in_({item['material_id'] for item in itens}))
+    )} if itens else {}
+
+    erros, avisos = [], []
+    necessario = defaultdict(float)
+    for item in itens:
+        material = cadastro.get(item['material_id'])
+        if material is None:
+            erros.append({'linha': item['linha'], 'material_id': item['material_id'],
+                          'mensagem': 'Material não encontrado.'})
+            continue
+        if abs(item['preco_unitario'] - material.preco_unitario) >= 0.005 and \
+                (item['material_id'], round(item['preco_unitario'], 2)) not in precos_gravados:
+            erros.append({'linha': item['linha'], 'material_id': item['material_id'],
+                          'mensagem': f'{material.nome}: o preço atual é R$ {material.preco_unitario:.2f}.'})
+        necessario[item['material_id']] += item['quantidade']
+
+    for material_id, quantidade in necessario.items():
+        material = cadastro[material_id]
+        if quantidade > material.disponivel:
+            avisos.append(f'{material.nome} (disponível: {material.disponivel:g})')
+
+    return erros, avisos
+
+def precos_itens_gravados(orcamento_id):
+    """(material_id, preço) dos itens já gravados do orçamento, para validar_itens na edição"""
+    tabela = OrcamentoItem.__table__
+    return {
+        (material_id, round(preco, 2)) for material_id, preco in db.session.execute(
+            select(tabela.c.material_id, tabela.c.preco_unitario).where(tabela.c.orcamento_id == orcamento_id)
+        )
+    }
+
+def inserir_itens(orcamento_id, itens):
+    """Gravar os itens de um orçamento novo com um único INSERT em executemany"""
+    if itens:
+        db.session.execute(insert(OrcamentoItem.__table__), [
+            dict({coluna: item[coluna] for coluna in _COLUNAS_ITEM}, orcamento_id=orcamento_id)
+            for item in itens
+        ])
+
+def recalcular_valor_total(orcamento_ids):
+    """Recalcular em SQL o valor_total (itens + mão de obra) dos orçamentos"""
+    itens = OrcamentoItem.__table__
+    orcamentos = Orcamento.__table__
+
+    total_itens = select(func.coalesce(func.sum(itens.c.subtotal), 0)).where(
+        itens.c.orcamento_id == orcamentos.c.id
+    ).scalar_subquery()
+    for lote in em_lotes(sorted(orcamento_ids), 5000):
+        db.session.execute(
+            update(orcamentos)
+            .where(orcamentos.c.id.in_(lote))
+            .values(valor_total=total_itens + func.coalesce(orcamentos.c.valor_mao_obra, 0))
+        )
+
+def sincronizar_itens(orcamento, novos):
+    """Deixar os itens do orçamento iguais a `novos` (dicts de itens_do_formulario).
+
+    Os itens atuais são pareados com os enviados pelo material, na ordem em
+    que aparecem: os pares alterados viram um UPDATE em executemany, os
+    enviados sem par um INSERT em executemany e os atuais sem par um único
+    DELETE. Itens sem alteração mantêm o id e não geram comando. Depois o
+    valor_total é recalculado em SQL. O commit fica com quem chamou.
+    """
+    tabela = OrcamentoItem.__table__
+    # Gravar antes as alterações pendentes do orçamento (o expire no fim as descartaria)
+    db.session.flush()
+
+    atuais = defaultdict(list)
+    for item in db.session.execute(
+        select(tabela.c.id, tabela.c.material_id, tabela.c.quantidade, tabela.c.preco_unitario)
+        .where(tabela.c.orcamento_id == orcamento.id)
+        .order_by(tabela.c.id)
+    ):
+        atuais[item.material_id].append(item)
+
+    alterar, incluir = [], []
+    for novo in novos:
+        existentes = atuais.get(novo['material_id'])
+        if not existentes:
+            incluir.append(dict({coluna: novo[coluna] for coluna in _COLUNAS_ITEM}, orcamento_id=orcamento.id))
+            continue
+        atual = existentes.pop(0)
+        if (atual.quantidade, atual.preco_unitario) != (novo['quantidade'], novo['preco_unitario']):
+            alterar.append({
+                'item_id': atual.id,
+                'quantidade': novo['quantidade'],
+                'preco_unitario': novo['preco_unitario'],
+                'subtotal': novo['subtotal']
+            })
+    excluir = [item.id for existentes in atuais.values() for item in existentes]
+
+    if alterar:
+        db.session.execute(
+            update(tabela)
+            .where(tabela.c.id == bindparam('item_id'))
+            .values(quantidade=bindparam('quantidade'), preco_unitario=bindparam('preco_unitario'),
+                    subtotal=bindparam('subtotal')),
+            alterar
+        )
+    if incluir:
+        db.session.execute(insert(tabela), incluir)
+    if excluir:
+        db.session.execute(delete(tabela).where(tabela.c.id.in_(excluir)))
+
+    recalcular_valor_total([orcamento.id])
+    # Os itens carregados na sessão não refletem os comandos acima
+    db.session.expire(orcamento)
@@ -1,6 +1,14 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, make_response
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 from src.models import db, Orcamento, OrcamentoItem, Cliente, Material
+from src.utils.estatisticas import invalidar_estatisticas_dashboard
+from src.utils.cache_pdf import invalidar_pdf
+from src.utils.estoque import reservar_itens_orcamento, atualizar_indice_materiais, EstoqueInsuficiente
+from src.utils.sequencias import proximo_numero
+from src.utils.orcamento_itens import (itens_do_formulario, validar_itens, precos_itens_gravados, inserir_itens,
+                                      sincronizar_itens)
+from src.utils.busca import buscar
+from src.utils.documentos import carregar_orcamentos, carregar_ou_404
 from datetime import datetime, timedelta
 import uuid
 
@@ -8,18 +16,16 @@ orcamentos_bp = Blueprint('orcamentos', __name__)
 
 def gerar_numero_orcamento():
     """Gerar número único para orçamento"""
-    ano = datetime.now().year
-    ultimo_orcamento = Orcamento.query.filter(
-        Orcamento.numero_orcamento.like(f'ORC{ano}%')
-    ).order_by(Orcamento.id.desc()).first()
-    
-    if ultimo_orcamento:
-        ultimo_numero = int(ultimo_orcamento.numero_orcamento[-4:])
-        novo_numero = ultimo_numero + 1
-    else:
-        novo_numero = 1
+    return proximo_numero('ORC', Orcamento.numero_orcamento)
+
+def resposta_erros_itens(erros, template, **contexto):
+    """Devolver os erros dos itens, linha a linha: JSON (422) ou o formulário com flash"""
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'erros': erros}), 422
     
-    return f'ORC{ano}{novo_numero:04d}'
+    for erro in erros:
+        flash(f'Item {erro["linha"]}: {erro["mensagem"]}', 'error')
+    return render_template(template, erros_itens=erros, **contexto)
 
 @orcamentos_bp.route('/')
 @login_required
@@ -31,11 +37,8 @@ def listar():
     query = Orcamento.query
     
     if search:
-        query = query.join(Cliente).filter(
-            Orcamento.numero_orcamento.contains(search) |
-            Cliente.nome.contains(search) |
-            Orcamento.descricao_servico.contains(search)
-        )
+        query = buscar(query.join(Orcamento.cliente), search,
+                       Orcamento.numero_orcamento, Cliente.nome, Orcamento.descricao_servico)
     
     if status_filter:
         query = query.filter(Orcamento.status == status_filter)
@@ -63,6 +66,14 @@ def cadastrar():
             flash('Por favor, preencha todos os campos obrigatórios.', 'error')
             return render_template('orcamentos/cadastrar.html')
         
+        # Conferir todos os itens no cadastro de materiais de uma vez
+        itens, erros = itens_do_formulario(request.form)
+        avisos = []
+        if not erros:
+            erros, avisos = validar_itens(itens)
+        if erros:
+            return resposta_erros_itens(erros, 'orcamentos/cadastrar.html')
+        
         try:
             # Criar orçamento
             orcamento = Orcamento(
@@ -72,33 +83,21 @@ def cadastrar():
                 descricao_servico=descricao_servico,
                 valor_mao_obra=float(valor_mao_obra),
                 validade=datetime.now().date() + timedelta(days=int(validade_dias)),
-                observacoes=observacoes
+                observacoes=observacoes,
+                valor_total=sum(item['subtotal'] for item in itens) + float(valor_mao_obra)
             )
             
             db.session.add(orcamento)
             db.session.flush()  # Para obter o ID
             
-            # Adicionar itens do orçamento
-            materiais_ids = request.form.getlist('material_id[]')
-            quantidades = request.form.getlist('quantidade[]')
-            precos = request.form.getlist('preco_unitario[]')
-            
-            for i, material_id in enumerate(materiais_ids):
-                if material_id and quantidades[i] and precos[i]:
-                    item = OrcamentoItem(
-                        orcamento_id=orcamento.id,
-                        material_id=int(material_id),
-                        quantidade=float(quantidades[i]),
-                        preco_unitario=float(precos[i])
-                    )
-                    item.calcular_subtotal()
-                    db.session.add(item)
-            
-            # Calcular total
-            orcamento.calcular_total()
+            inserir_itens(orcamento.id, itens)
             
             db.session.commit()
-            flash('Orçamento cadastrado com sucesso!', 'success')
+            invalidar_estatisticas_dashboard()
+            mensagem = 'Orçamento cadastrado com sucesso!'
+            if avisos:
+                mensagem += ' Estoque disponível insuficiente para: ' + ', '.join(avisos) + '.'
+            flash(mensagem, 'success')
             return redirect(url_for('orcamentos.visualizar', id=orcamento.id))
             
         except Exception as e:
@@ -116,7 +115,7 @@ def cadastrar():
 @orcamentos_bp.route('/visualizar/<int:id>')
 @login_required
 def visualizar(id):
-    orcamento = Orcamento.query.get_or_404(id)
+    orcamento = carregar_ou_404(carregar_orcamentos, id)
     return render_template('orcamentos/visualizar.html', orcamento=orcamento)
 
 @orcamentos_bp.route('/editar/<int:id>', methods=['GET', 'POST'])
@@ -129,6 +128,14 @@ def editar(id):
         return redirect(url_for('orcamentos.visualizar', id=id))
     
     if request.method == 'POST':
+        # Itens já gravados podem manter o preço antigo; os novos (ou com preço
+        # alterado) precisam do preço atual do cadastro
+        itens, erros = itens_do_formulario(request.form)
+        if not erros:
+            erros, _ = validar_itens(itens, precos_gravados=precos_itens_gravados(orcamento.id))
+        if erros:
+            return resposta_erros_itens(erros, 'orcamentos/editar.html', orcamento=orcamento)
+        
         try:
             orcamento.descricao_servico = request.form.get('descricao_servico')
             orcamento.valor_mao_obra = float(request.form.get('valor_mao_obra', 0))
@@ -137,30 +144,12 @@ def editar(id):
             validade_dias = int(request.form.get('validade_dias', 30))
             orcamento.validade = datetime.now().date() + timedelta(days=validade_dias)
             
-            # Remover itens existentes
-            for item in orcamento.itens:
-                db.session.delete(item)
-            
-            # Adicionar novos itens
-            materiais_ids = request.form.getlist('material_id[]')
-            quantidades = request.form.getlist('quantidade[]')
-            precos = request.form.getlist('preco_unitario[]')
-            
-            for i, material_id in enumerate(materiais_ids):
-                if material_id and quantidades[i] and precos[i]:
-                    item = OrcamentoItem(
-                        orcamento_id=orcamento.id,
-                        material_id=int(material_id),
-                        quantidade=float(quantidades[i]),
-                        preco_unitario=float(precos[i])
-                    )
-                    item.calcular_subtotal()
-                    db.session.add(item)
-            
-            # Recalcular total
-            orcamento.calcular_total()
+            # Aplicar só as diferenças nos itens e recalcular o total no banco
+            sincronizar_itens(orcamento, itens)
             
             db.session.commit()
+            invalidar_estatisticas_dashboard()
+            invalidar_pdf('orcamento', orcamento.id)
             flash('Orçamento atualizado com sucesso!', 'success')
             return redirect(url_for('orcamentos.visualizar', id=id))
             
@@ -180,14 +169,24 @@ def aceitar(id):
         return redirect(url_for('orcamentos.visualizar', id=id))
     
     try:
+        # Conferir e reservar o estoque de todos os itens
+        material_ids = reservar_itens_orcamento(orcamento)
+        
         orcamento.status = 'aceito'
-        db.session.commit()
         
-        # Criar ordem de serviço automaticamente
+        # Criar ordem de serviço automaticamente, na mesma transação: se falhar,
+        # o rollback desfaz também as reservas e o aceite
         from src.routes.ordens import criar_ordem_automatica
-        criar_ordem_automatica(orcamento.id)
+        criar_ordem_automatica(orcamento)
+        
+        db.session.commit()
+        invalidar_estatisticas_dashboard()
+        atualizar_indice_materiais(material_ids)
         
         flash('Orçamento aceito com sucesso! Ordem de serviço criada automaticamente.', 'success')
+    except EstoqueInsuficiente as e:
+        db.session.rollback()
+        flash(f'Não é possível aceitar: estoque insuficiente de {", ".join(e.materiais)}.', 'error')
     except Exception as e:
         db.session.rollback()
         flash('Erro ao aceitar orçamento.', 'error')
@@ -206,6 +205,7 @@ def rejeitar(id):
     try:
         orcamento.status = 'rejeitado'
         db.session.commit()
+        invalidar_estatisticas_dashboard()
         flash('Orçamento rejeitado.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -216,17 +216,17 @@ def rejeitar(id):
 @orcamentos_bp.route('/pdf/<int:id>')
 @login_required
 def gerar_pdf(id):
-    orcamento = Orcamento.query.get_or_404(id)
+    orcamento = carregar_ou_404(carregar_orcamentos, id)
     
     try:
-        from src.utils.pdf_generator import gerar_pdf_orcamento
-        pdf_content = gerar_pdf_orcamento(orcamento)
+        from src.utils.pdf_generator import gerar_pdf_orcamento, campos_pdf_orcamento
+        from src.utils.cache_pdf import resposta_pdf_cache
         
-        response = make_response(pdf_content)
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'attachment; filename=orcamento_{orcamento.numero_orcamento}.pdf'
-        
-        return response
+        return resposta_pdf_cache(
+            'orcamento', orcamento.id, campos_pdf_orcamento(orcamento),
+            lambda: gerar_pdf_orcamento(orcamento),
+            f'orcamento_{orcamento.numero_orcamento}.pdf'
+        )
     except Exception as e:
         flash('Erro ao gerar PDF do orçamento.', 'error')
         return redirect(url_for('orcamentos.visualizar', id=id))
@@ -247,6 +247,8 @@ def excluir(id):
         
         db.session.delete(orcamento)
         db.session.commit()
+        invalidar_estatisticas_dashboard()
+        invalidar_pdf('orcamento', id)
         flash('Orçamento excluído com sucesso!', 'success')
     except Exception as e:
         db.session.rollback()
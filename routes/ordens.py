@@ -1,6 +1,15 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, make_response
+from flask import Blueprint, render_template, request, redirect, url_for, flash, Response, stream_with_context
 from flask_login import login_required, current_user
-from src.models import db, OrdemServico, Contrato, NotaFiscal, Orcamento
+from src.models import db, OrdemServico, Contrato, NotaFiscal, Orcamento, Cliente
+from src.utils.estatisticas import invalidar_estatisticas_dashboard
+from src.utils.cache_pdf import invalidar_pdf
+from src.utils.sequencias import proximo_numero
+from src.utils.busca import buscar
+from src.utils.documentos import carregar_ordens, carregar_ou_404
+from src.utils.replica import somente_leitura
+from src.utils.resumos import registrar_ordem_concluida, registrar_ordem_cancelada, registrar_nota_fiscal_emitida
+from src.utils.estoque import (baixar_itens_ordem, consumir_reservas, liberar_reservas,
+                               atualizar_indice_materiais, EstoqueInsuficiente)
 from datetime import datetime
 import uuid
 
@@ -8,52 +17,29 @@ ordens_bp = Blueprint('ordens', __name__)
 
 def gerar_numero_ordem():
     """Gerar número único para ordem de serviço"""
-    ano = datetime.now().year
-    ultima_ordem = OrdemServico.query.filter(
-        OrdemServico.numero_ordem.like(f'OS{ano}%')
-    ).order_by(OrdemServico.id.desc()).first()
-    
-    if ultima_ordem:
-        ultimo_numero = int(ultima_ordem.numero_ordem[-4:])
-        novo_numero = ultimo_numero + 1
-    else:
-        novo_numero = 1
-    
-    return f'OS{ano}{novo_numero:04d}'
+    return proximo_numero('OS', OrdemServico.numero_ordem)
 
 def gerar_numero_contrato():
     """Gerar número único para contrato"""
-    ano = datetime.now().year
-    ultimo_contrato = Contrato.query.filter(
-        Contrato.numero_contrato.like(f'CT{ano}%')
-    ).order_by(Contrato.id.desc()).first()
-    
-    if ultimo_contrato:
-        ultimo_numero = int(ultimo_contrato.numero_contrato[-4:])
-        novo_numero = ultimo_numero + 1
-    else:
-        novo_numero = 1
-    
-    return f'CT{ano}{novo_numero:04d}'
+    return proximo_numero('CT', Contrato.numero_contrato)
 
-def criar_ordem_automatica(orcamento_id):
-    """Criar ordem de serviço e contrato automaticamente após aceite do orçamento"""
-    try:
-        orcamento = Orcamento.query.get(orcamento_id)
-        if not orcamento or orcamento.status != 'aceito':
-            return False
-        
-        # Criar ordem de serviço
-        ordem = OrdemServico(
-            orcamento_id=orcamento.id,
-            numero_ordem=gerar_numero_ordem(),
-            observacoes=f'Ordem criada automaticamente a partir do orçamento {orcamento.numero_orcamento}'
-        )
-        db.session.add(ordem)
-        db.session.flush()  # Para obter o ID
-        
-        # Criar contrato
-        termos_padrao = """
+def criar_ordem_automatica(orcamento):
+    """Criar ordem de serviço e contrato automaticamente no aceite do orçamento.
+
+    Só adiciona à sessão: o commit (ou rollback, se algo falhar) é feito por
+    quem chamou, junto com as reservas de estoque e o status do orçamento.
+    """
+    # Criar ordem de serviço
+    ordem = OrdemServico(
+        orcamento_id=orcamento.id,
+        numero_ordem=gerar_numero_ordem(),
+        observacoes=f'Ordem criada automaticamente a partir do orçamento {orcamento.numero_orcamento}'
+    )
+    db.session.add(ordem)
+    db.session.flush()  # Para obter o ID
+    
+    # Criar contrato
+    termos_padrao = """
 TERMOS E CONDIÇÕES DO CONTRATO DE PRESTAÇÃO DE SERVIÇOS
 
 1. OBJETO: O presente contrato tem por objeto a prestação de serviços de oficina mecânica conforme especificado no orçamento aprovado.
@@ -67,21 +53,27 @@ TERMOS E CONDIÇÕES DO CONTRATO DE PRESTAÇÃO DE SERVIÇOS
 5. RESPONSABILIDADES: A LANTERCAR se responsabiliza pela execução dos serviços com qualidade e dentro do prazo acordado.
 
 6. FORO: Fica eleito o foro da comarca onde se encontra a sede da LANTERCAR para dirimir quaisquer questões oriundas do presente contrato.
-        """
-        
-        contrato = Contrato(
-            ordem_servico_id=ordem.id,
-            numero_contrato=gerar_numero_contrato(),
-            termos_condicoes=termos_padrao
-        )
-        db.session.add(contrato)
-        
-        db.session.commit()
-        return True
-        
-    except Exception as e:
-        db.session.rollback()
-        return False
+    """
+    
+    contrato = Contrato(
+        ordem_servico_id=ordem.id,
+        numero_contrato=gerar_numero_contrato(),
+        termos_condicoes=termos_padrao
+    )
+    db.session.add(contrato)
+    return ordem
+
+def filtrar_ordens(search, status_filter):
+    """Query das ordens de serviço com os filtros da listagem"""
+    query = OrdemServico.query.join(OrdemServico.orcamento).join(Orcamento.cliente)
+    
+    if search:
+        query = buscar(query, search, OrdemServico.numero_ordem, Orcamento.numero_orcamento, Cliente.nome)
+    
+    if status_filter:
+        query = query.filter(OrdemServico.status == status_filter)
+    
+    return query
 
 @ordens_bp.route('/')
 @login_required
@@ -90,17 +82,7 @@ def listar():
     search = request.args.get('search', '', type=str)
     status_filter = request.args.get('status', '', type=str)
     
-    query = OrdemServico.query.join(Orcamento).join(Orcamento.cliente)
-    
-    if search:
-        query = query.filter(
-            OrdemServico.numero_ordem.contains(search) |
-            Orcamento.numero_orcamento.contains(search) |
-            Orcamento.cliente.nome.contains(search)
-        )
-    
-    if status_filter:
-        query = query.filter(OrdemServico.status == status_filter)
+    query = filtrar_ordens(search, status_filter)
     
     ordens = query.order_by(OrdemServico.data_inicio.desc()).paginate(
         page=page, per_page=20, error_out=False
@@ -114,7 +96,7 @@ def listar():
 @ordens_bp.route('/visualizar/<int:id>')
 @login_required
 def visualizar(id):
-    ordem = OrdemServico.query.get_or_404(id)
+    ordem = carregar_ou_404(carregar_ordens, id)
     return render_template('ordens/visualizar.html', ordem=ordem)
 
 @ordens_bp.route('/iniciar/<int:id>')
@@ -129,6 +111,7 @@ def iniciar(id):
     try:
         ordem.data_inicio = datetime.now()
         db.session.commit()
+        invalidar_pdf('ordem', ordem.id)
         flash('Ordem de serviço iniciada!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -154,7 +137,15 @@ def concluir(id):
             if observacoes_conclusao:
                 ordem.observacoes = (ordem.observacoes or '') + f'\n\nConclusão: {observacoes_conclusao}'
             
+            # Saída de todos os materiais do orçamento, que deixam de estar reservados
+            saldos = baixar_itens_ordem(ordem, current_user.id)
+            consumir_reservas(ordem.orcamento_id)
+            
+            registrar_ordem_concluida(ordem)
             db.session.commit()
+            invalidar_estatisticas_dashboard()
+            invalidar_pdf('ordem', ordem.id)
+            atualizar_indice_materiais(saldos)
             
             # Gerar nota fiscal automaticamente
             gerar_nota_fiscal_automatica(ordem.id)
@@ -162,6 +153,9 @@ def concluir(id):
             flash('Ordem de serviço concluída! Nota fiscal gerada automaticamente.', 'success')
             return redirect(url_for('ordens.visualizar', id=id))
             
+        except EstoqueInsuficiente as e:
+            db.session.rollback()
+            flash(f'Não é possível concluir: estoque insuficiente de {", ".join(e.materiais)}.', 'error')
         except Exception as e:
             db.session.rollback()
             flash('Erro ao concluir ordem de serviço.', 'error')
@@ -177,6 +171,11 @@ def cancelar(id):
         flash('Não é possível cancelar uma ordem de serviço concluída.', 'error')
         return redirect(url_for('ordens.visualizar', id=id))
     
+    # Cancelar de novo registraria outro cancelamento no resumo diário
+    if ordem.status == 'cancelado':
+        flash('Esta ordem de serviço já está cancelada.', 'error')
+        return redirect(url_for('ordens.visualizar', id=id))
+    
     if request.method == 'POST':
         motivo_cancelamento = request.form.get('motivo_cancelamento', '')
         
@@ -189,7 +188,16 @@ def cancelar(id):
             if ordem.contrato:
                 ordem.contrato.status = 'cancelado'
             
+            # Devolver os materiais reservados ao disponível
+            material_ids = liberar_reservas(ordem.orcamento_id)
+            
+            registrar_ordem_cancelada(ordem)
             db.session.commit()
+            invalidar_estatisticas_dashboard()
+            invalidar_pdf('ordem', ordem.id)
+            atualizar_indice_materiais(material_ids)
+            if ordem.contrato:
+                invalidar_pdf('contrato', ordem.contrato.id)
             flash('Ordem de serviço cancelada.', 'success')
             return redirect(url_for('ordens.visualizar', id=id))
             
@@ -202,21 +210,21 @@ def cancelar(id):
 @ordens_bp.route('/contrato/pdf/<int:id>')
 @login_required
 def gerar_pdf_contrato(id):
-    ordem = OrdemServico.query.get_or_404(id)
+    ordem = carregar_ou_404(carregar_ordens, id)
     
     if not ordem.contrato:
         flash('Esta ordem de serviço não possui contrato.', 'error')
         return redirect(url_for('ordens.visualizar', id=id))
     
     try:
-        from src.utils.pdf_generator import gerar_pdf_contrato
-        pdf_content = gerar_pdf_contrato(ordem.contrato)
-        
-        response = make_response(pdf_content)
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'attachment; filename=contrato_{ordem.contrato.numero_contrato}.pdf'
+        from src.utils.pdf_generator import gerar_pdf_contrato, campos_pdf_contrato
+        from src.utils.cache_pdf import resposta_pdf_cache
         
-        return response
+        return resposta_pdf_cache(
+            'contrato', ordem.contrato.id, campos_pdf_contrato(ordem.contrato),
+            lambda: gerar_pdf_contrato(ordem.contrato),
+            f'contrato_{ordem.contrato.numero_contrato}.pdf'
+        )
     except Exception as e:
         flash('Erro ao gerar PDF do contrato.', 'error')
         return redirect(url_for('ordens.visualizar', id=id))
@@ -224,21 +232,58 @@ def gerar_pdf_contrato(id):
 @ordens_bp.route('/ordem/pdf/<int:id>')
 @login_required
 def gerar_pdf_ordem(id):
-    ordem = OrdemServico.query.get_or_404(id)
+    ordem = carregar_ou_404(carregar_ordens, id)
     
     try:
-        from src.utils.pdf_generator import gerar_pdf_ordem_servico
-        pdf_content = gerar_pdf_ordem_servico(ordem)
+        from src.utils.pdf_generator import gerar_pdf_ordem_servico, campos_pdf_ordem_servico
+        from src.utils.cache_pdf import resposta_pdf_cache
         
-        response = make_response(pdf_content)
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'attachment; filename=ordem_servico_{ordem.numero_ordem}.pdf'
-        
-        return response
+        return resposta_pdf_cache(
+            'ordem', ordem.id, campos_pdf_ordem_servico(ordem),
+            lambda: gerar_pdf_ordem_servico(ordem),
+            f'ordem_servico_{ordem.numero_ordem}.pdf'
+        )
     except Exception as e:
         flash('Erro ao gerar PDF da ordem de serviço.', 'error')
         return redirect(url_for('ordens.visualizar', id=id))
 
+@ordens_bp.route('/exportar-pdfs')
+@login_required
+@somente_leitura
+def exportar_pdfs():
+    """ZIP com os PDFs das ordens de serviço da listagem filtrada e do período"""
+    search = request.args.get('search', '', type=str)
+    status_filter = request.args.get('status', '', type=str)
+    
+    from src.utils.exportacao_pdf import filtrar_periodo, exportar_pdfs_zip
+    from src.utils.pdf_generator import gerar_pdf_ordem_servico, campos_pdf_ordem_servico, dados_pdf_ordem_servico
+    
+    query, erros = filtrar_periodo(
+        filtrar_ordens(search, status_filter), OrdemServico.data_inicio,
+        request.args.get('data_inicio'), request.args.get('data_fim')
+    )
+    if erros:
+        for erro in erros:
+            flash(erro, 'error')
+        return redirect(url_for('ordens.listar'))
+    
+    ids = [id for (id,) in query.with_entities(OrdemServico.id).order_by(OrdemServico.data_inicio)]
+    if not ids:
+        flash('Nenhuma ordem de serviço encontrada para exportar.', 'error')
+        return redirect(url_for('ordens.listar'))
+    
+    conteudo = exportar_pdfs_zip(
+        ids, carregar_ordens, 'ordem',
+        gerar_pdf_ordem_servico, campos_pdf_ordem_servico, dados_pdf_ordem_servico,
+        lambda ordem: f'ordem_servico_{ordem.numero_ordem}.pdf',
+        request.args.get('exportacao'), current_user.id
+    )
+    
+    response = Response(stream_with_context(conteudo), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename=ordens_servico_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
+    response.headers['X-Total-Documentos'] = str(len(ids))
+    return response
+
 def gerar_nota_fiscal_automatica(ordem_id):
     """Gerar nota fiscal automaticamente quando ordem é concluída"""
     try:
@@ -251,18 +296,7 @@ def gerar_nota_fiscal_automatica(ordem_id):
             return True
         
         # Gerar número da nota fiscal
-        ano = datetime.now().year
-        ultima_nf = NotaFiscal.query.filter(
-            NotaFiscal.numero_nf.like(f'NF{ano}%')
-        ).order_by(NotaFiscal.id.desc()).first()
-        
-        if ultima_nf:
-            ultimo_numero = int(ultima_nf.numero_nf[-4:])
-            novo_numero = ultimo_numero + 1
-        else:
-            novo_numero = 1
-        
-        numero_nf = f'NF{ano}{novo_numero:04d}'
+        numero_nf = proximo_numero('NF', NotaFiscal.numero_nf)
         
         # Criar nota fiscal
         nota_fiscal = NotaFiscal(
@@ -272,7 +306,10 @@ def gerar_nota_fiscal_automatica(ordem_id):
         )
         
         db.session.add(nota_fiscal)
+        db.session.flush()  # Para obter a data de emissão
+        registrar_nota_fiscal_emitida(nota_fiscal, ordem.orcamento.cliente_id)
         db.session.commit()
+        invalidar_estatisticas_dashboard()
         return True
         
     except Exception as e:
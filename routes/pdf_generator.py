@@ -2,52 +2,311 @@ from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from io import BytesIO
 from datetime import datetime
+from functools import lru_cache
+from types import SimpleNamespace
+from itertools import islice
+import threading
 
-def gerar_pdf_orcamento(orcamento):
-    """Gerar PDF do orçamento"""
+# Estilos de parágrafo compartilhados, criados na primeira geração de PDF
+_estilos = None
+_estilos_lock = threading.Lock()
+
+def obter_estilos():
+    """Retornar os estilos de parágrafo dos documentos (title, heading, normal, footer)"""
+    global _estilos
+    if _estilos is None:
+        with _estilos_lock:
+            if _estilos is None:
+                styles = getSampleStyleSheet()
+                normal_style = ParagraphStyle('CustomNormal', parent=styles['Normal'], fontSize=10)
+                _estilos = {
+                    'title': ParagraphStyle(
+                        'CustomTitle',
+                        parent=styles['Heading1'],
+                        fontSize=18,
+                        spaceAfter=30,
+                        alignment=TA_CENTER,
+                        textColor=colors.HexColor('#2c3e50')
+                    ),
+                    'heading': ParagraphStyle(
+                        'CustomHeading',
+                        parent=styles['Heading2'],
+                        fontSize=14,
+                        spaceAfter=12,
+                        textColor=colors.HexColor('#34495e')
+                    ),
+                    'normal': normal_style,
+                    'footer': ParagraphStyle('Footer', parent=normal_style, fontSize=8, alignment=TA_CENTER),
+                }
+    return _estilos
+
+# Estilos de tabela compartilhados
+INFO_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 0),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+    ('TOPPADDING', (0, 0), (-1, -1), 3),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+])
+
+RESUMO_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 11),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, -1), (-1, -1), 14),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('LINEBELOW', (0, -1), (-1, -1), 2, colors.black),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+])
+
+RESUMO_NF_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('LINEBELOW', (0, -1), (-1, -1), 2, colors.black),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+])
+
+ESTATISTICAS_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 0),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+    ('TOPPADDING', (0, 0), (-1, -1), 3),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+])
+
+# Linhas de subtotal e acumulado no fim de cada página do relatório de serviços
+SUBTOTAL_RELATORIO_STYLE = TableStyle([
+    ('FONTNAME', (0, -2), (-1, -1), 'Helvetica-Bold'),
+    ('BACKGROUND', (0, -2), (-1, -1), colors.HexColor('#ecf0f1')),
+    ('ALIGN', (0, -2), (-2, -1), 'RIGHT'),
+    ('SPAN', (0, -2), (-2, -2)),
+    ('SPAN', (0, -1), (-2, -1)),
+])
+
+# Linhas de serviços por página do relatório (cada página é uma tabela própria)
+LINHAS_POR_PAGINA_RELATORIO = 35
+
+ASSINATURAS_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('TOPPADDING', (0, 1), (-1, -1), 10),
+])
+
+@lru_cache(maxsize=None)
+def estilo_tabela_grade(coluna_texto, tamanho_fonte=9):
+    """Estilo das tabelas com cabeçalho escuro e grade; `coluna_texto` fica alinhada à esquerda"""
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#34495e')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('ALIGN', (coluna_texto, 1), (coluna_texto, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), tamanho_fonte),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ])
+
+def formatar_moeda(valor):
+    """Formatar valor como R$ 0,00"""
+    return f"R$ {valor:.2f}".replace('.', ',')
+
+# Componentes de layout
+
+def adicionar_cabecalho(story, titulo):
+    """Cabeçalho LANTERCAR seguido do título do documento"""
+    estilos = obter_estilos()
+    story.append(Paragraph("LANTERCAR", estilos['title']))
+    story.append(Paragraph("Oficina Mecânica", estilos['normal']))
+    story.append(Spacer(1, 20))
+    story.append(Paragraph(titulo, estilos['heading']))
+    story.append(Spacer(1, 20))
+
+def tabela_info(dados, col_widths=(2*inch, 4*inch), estilo=INFO_TABLE_STYLE):
+    """Tabela de rótulo/valor sem bordas"""
+    table = Table(dados, colWidths=list(col_widths))
+    table.setStyle(estilo)
+    return table
+
+def tabela_itens(itens):
+    """Tabela dos materiais de um orçamento"""
+    items_data = [['Item', 'Código', 'Descrição', 'Qtd', 'Unid', 'Valor Unit.', 'Subtotal']]
+
+    for i, item in enumerate(itens, 1):
+        items_data.append([
+            str(i),
+            item.material.codigo,
+            item.material.nome,
+            f"{item.quantidade:.2f}".replace('.', ','),
+            item.material.unidade_medida,
+            formatar_moeda(item.preco_unitario),
+            formatar_moeda(item.subtotal)
+        ])
+
+    items_table = Table(items_data, colWidths=[0.5*inch, 1*inch, 2.5*inch, 0.7*inch, 0.5*inch, 1*inch, 1*inch])
+    items_table.setStyle(estilo_tabela_grade(2))
+    return items_table
+
+def tabela_resumo(dados, estilo=RESUMO_TABLE_STYLE):
+    """Tabela de resumo financeiro, com a última linha em destaque"""
+    table = Table(dados, colWidths=[4*inch, 2*inch])
+    table.setStyle(estilo)
+    return table
+
+def resumo_orcamento(orcamento):
+    """Resumo financeiro de um orçamento: materiais, mão de obra e total"""
+    total_materiais = sum(item.subtotal for item in orcamento.itens)
+    return tabela_resumo([
+        ['Subtotal Materiais:', formatar_moeda(total_materiais)],
+        ['Mão de Obra:', formatar_moeda(orcamento.valor_mao_obra)],
+        ['TOTAL GERAL:', formatar_moeda(orcamento.valor_total)]
+    ])
+
+def adicionar_assinaturas(story, titulo, dados, col_widths):
+    """Bloco de assinaturas com título"""
+    story.append(Paragraph(titulo, obter_estilos()['heading']))
+    story.append(Spacer(1, 40))
+    table = Table(dados, colWidths=col_widths)
+    table.setStyle(ASSINATURAS_TABLE_STYLE)
+    story.append(table)
+
+def adicionar_rodape(story, texto="Documento gerado em"):
+    """Rodapé com a data de geração"""
+    rodape = f"{texto} {datetime.now().strftime('%d/%m/%Y às %H:%M')}"
+    story.append(Paragraph(rodape, obter_estilos()['footer']))
+
+def numerar_pagina(canvas, doc):
+    """Número da página no rodapé, desenhado em cada página"""
+    canvas.saveState()
+    canvas.setFont('Helvetica', 8)
+    canvas.drawRightString(doc.pagesize[0] - doc.rightMargin, doc.bottomMargin / 2, f"Página {doc.page}")
+    canvas.restoreState()
+
+def construir_pdf(story, ao_desenhar_pagina=None):
+    """Montar o PDF A4 a partir do story e retornar o conteúdo
+
+    `ao_desenhar_pagina` (ex.: numerar_pagina) é chamada em cada página.
+    """
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        textColor=colors.HexColor('#2c3e50')
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-        textColor=colors.HexColor('#34495e')
+    if ao_desenhar_pagina:
+        doc.build(story, onFirstPage=ao_desenhar_pagina, onLaterPages=ao_desenhar_pagina)
+    else:
+        doc.build(story)
+
+    pdf_content = buffer.getvalue()
+    buffer.close()
+
+    return pdf_content
+
+# Incrementar ao alterar o layout dos documentos, para descartar os PDFs em cache
+VERSAO_LAYOUT = 1
+
+def _campos_cliente(cliente):
+    return [cliente.nome, cliente.cpf_cnpj, cliente.telefone, cliente.email,
+            cliente.endereco, cliente.cidade, cliente.estado, cliente.cep]
+
+def _campos_orcamento(orcamento):
+    return [
+        orcamento.numero_orcamento, orcamento.data_orcamento, orcamento.validade,
+        orcamento.usuario.nome, orcamento.descricao_servico, orcamento.observacoes,
+        orcamento.valor_mao_obra, orcamento.valor_total,
+        [[item.material.codigo, item.material.nome, item.material.unidade_medida,
+          item.quantidade, item.preco_unitario, item.subtotal] for item in orcamento.itens],
+        _campos_cliente(orcamento.cliente)
+    ]
+
+# Campos que alimentam cada gerador, usados na chave do cache de PDFs.
+# Ao usar um campo novo em um gerador, incluí-lo aqui também.
+
+def campos_pdf_orcamento(orcamento):
+    return [VERSAO_LAYOUT, _campos_orcamento(orcamento)]
+
+def campos_pdf_contrato(contrato):
+    ordem = contrato.ordem_servico
+    return [VERSAO_LAYOUT, contrato.numero_contrato, contrato.data_contrato, contrato.status,
+            contrato.termos_condicoes, ordem.numero_ordem, _campos_orcamento(ordem.orcamento)]
+
+def campos_pdf_ordem_servico(ordem):
+    return [VERSAO_LAYOUT, ordem.numero_ordem, ordem.data_inicio, ordem.data_conclusao,
+            ordem.status, ordem.observacoes, _campos_orcamento(ordem.orcamento)]
+
+def campos_pdf_nota_fiscal(nota_fiscal):
+    return [VERSAO_LAYOUT, nota_fiscal.numero_nf, nota_fiscal.data_emissao, nota_fiscal.status,
+            nota_fiscal.valor_total, nota_fiscal.ordem_servico.numero_ordem,
+            _campos_orcamento(nota_fiscal.ordem_servico.orcamento)]
+
+# Cópias dos documentos em objetos simples (SimpleNamespace), com só os
+# atributos que os geradores usam, para enviar ao pool de processos sem
+# objetos do ORM. Manter em dia com os campos_pdf_* acima.
+
+def _copiar(objeto, atributos, **relacionados):
+    dados = {atributo: getattr(objeto, atributo) for atributo in atributos}
+    dados.update(relacionados)
+    return SimpleNamespace(**dados)
+
+def _dados_orcamento(orcamento):
+    return _copiar(
+        orcamento,
+        ('id', 'numero_orcamento', 'data_orcamento', 'validade', 'descricao_servico',
+         'observacoes', 'valor_mao_obra', 'valor_total'),
+        usuario=_copiar(orcamento.usuario, ('nome',)),
+        cliente=_copiar(orcamento.cliente, ('nome', 'cpf_cnpj', 'telefone', 'email',
+                                            'endereco', 'cidade', 'estado', 'cep')),
+        itens=[_copiar(item, ('quantidade', 'preco_unitario', 'subtotal'),
+                       material=_copiar(item.material, ('codigo', 'nome', 'unidade_medida')))
+               for item in orcamento.itens]
     )
-    
-    normal_style = styles['Normal']
-    normal_style.fontSize = 10
+
+def _dados_ordem(ordem):
+    return _copiar(ordem, ('id', 'numero_ordem', 'data_inicio', 'data_conclusao', 'status', 'observacoes'),
+                   orcamento=_dados_orcamento(ordem.orcamento))
+
+def dados_pdf_orcamento(orcamento):
+    return _dados_orcamento(orcamento)
+
+def dados_pdf_contrato(contrato):
+    return _copiar(contrato, ('id', 'numero_contrato', 'data_contrato', 'status', 'termos_condicoes'),
+                   ordem_servico=_dados_ordem(contrato.ordem_servico))
+
+def dados_pdf_ordem_servico(ordem):
+    return _dados_ordem(ordem)
+
+def dados_pdf_nota_fiscal(nota_fiscal):
+    return _copiar(nota_fiscal, ('id', 'numero_nf', 'data_emissao', 'status', 'valor_total'),
+                   ordem_servico=_dados_ordem(nota_fiscal.ordem_servico))
+
+def gerar_pdf_orcamento(orcamento):
+    """Gerar PDF do orçamento"""
+    estilos = obter_estilos()
+    heading_style = estilos['heading']
+    normal_style = estilos['normal']
     
     # Conteúdo do PDF
     story = []
     
     # Cabeçalho
-    story.append(Paragraph("LANTERCAR", title_style))
-    story.append(Paragraph("Oficina Mecânica", styles['Normal']))
-    story.append(Spacer(1, 20))
-    
-    # Título do documento
-    story.append(Paragraph(f"ORÇAMENTO Nº {orcamento.numero_orcamento}", heading_style))
-    story.append(Spacer(1, 20))
+    adicionar_cabecalho(story, f"ORÇAMENTO Nº {orcamento.numero_orcamento}")
     
     # Informações do cliente e orçamento
-    info_data = [
+    story.append(tabela_info([
         ['Cliente:', orcamento.cliente.nome],
         ['CPF/CNPJ:', format_cpf_cnpj(orcamento.cliente.cpf_cnpj)],
         ['Telefone:', orcamento.cliente.telefone or 'Não informado'],
@@ -56,21 +315,7 @@ def gerar_pdf_orcamento(orcamento):
         ['Data do Orçamento:', orcamento.data_orcamento.strftime('%d/%m/%Y')],
         ['Válido até:', orcamento.validade.strftime('%d/%m/%Y')],
         ['Responsável:', orcamento.usuario.nome],
-    ]
-    
-    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
-    info_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-        ('TOPPADDING', (0, 0), (-1, -1), 3),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
     ]))
-    
-    story.append(info_table)
     story.append(Spacer(1, 20))
     
     # Descrição do serviço
@@ -81,63 +326,12 @@ def gerar_pdf_orcamento(orcamento):
     # Itens do orçamento
     if orcamento.itens:
         story.append(Paragraph("MATERIAIS", heading_style))
-        
-        # Cabeçalho da tabela
-        items_data = [['Item', 'Código', 'Descrição', 'Qtd', 'Unid', 'Valor Unit.', 'Subtotal']]
-        
-        # Itens
-        for i, item in enumerate(orcamento.itens, 1):
-            items_data.append([
-                str(i),
-                item.material.codigo,
-                item.material.nome,
-                f"{item.quantidade:.2f}".replace('.', ','),
-                item.material.unidade_medida,
-                f"R$ {item.preco_unitario:.2f}".replace('.', ','),
-                f"R$ {item.subtotal:.2f}".replace('.', ',')
-            ])
-        
-        items_table = Table(items_data, colWidths=[0.5*inch, 1*inch, 2.5*inch, 0.7*inch, 0.5*inch, 1*inch, 1*inch])
-        items_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#34495e')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (2, 1), (2, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        
-        story.append(items_table)
+        story.append(tabela_itens(orcamento.itens))
         story.append(Spacer(1, 20))
     
     # Resumo financeiro
     story.append(Paragraph("RESUMO FINANCEIRO", heading_style))
-    
-    total_materiais = sum(item.subtotal for item in orcamento.itens)
-    
-    resumo_data = [
-        ['Subtotal Materiais:', f"R$ {total_materiais:.2f}".replace('.', ',')],
-        ['Mão de Obra:', f"R$ {orcamento.valor_mao_obra:.2f}".replace('.', ',')],
-        ['TOTAL GERAL:', f"R$ {orcamento.valor_total:.2f}".replace('.', ',')]
-    ]
-    
-    resumo_table = Table(resumo_data, colWidths=[4*inch, 2*inch])
-    resumo_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, -1), (-1, -1), 14),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('LINEBELOW', (0, -1), (-1, -1), 2, colors.black),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    
-    story.append(resumo_table)
+    story.append(resumo_orcamento(orcamento))
     story.append(Spacer(1, 30))
     
     # Observações
@@ -159,37 +353,18 @@ def gerar_pdf_orcamento(orcamento):
     story.append(Spacer(1, 30))
     
     # Assinaturas
-    story.append(Paragraph("ASSINATURAS", heading_style))
-    story.append(Spacer(1, 40))
-    
-    assinaturas_data = [
+    adicionar_assinaturas(story, "ASSINATURAS", [
         ['_' * 30, '_' * 30],
         ['Cliente', 'Lantercar'],
         [orcamento.cliente.nome, orcamento.usuario.nome]
-    ]
-    
-    assinaturas_table = Table(assinaturas_data, colWidths=[3*inch, 3*inch])
-    assinaturas_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('TOPPADDING', (0, 1), (-1, -1), 10),
-    ]))
-    
-    story.append(assinaturas_table)
+    ], [3*inch, 3*inch])
     
     # Rodapé
     story.append(Spacer(1, 30))
-    rodape = f"Documento gerado em {datetime.now().strftime('%d/%m/%Y às %H:%M')}"
-    story.append(Paragraph(rodape, ParagraphStyle('Footer', parent=normal_style, fontSize=8, alignment=TA_CENTER)))
+    adicionar_rodape(story)
     
     # Gerar PDF
-    doc.build(story)
-    
-    pdf_content = buffer.getvalue()
-    buffer.close()
-    
-    return pdf_content
+    return construir_pdf(story)
 
 def format_cpf_cnpj(cpf_cnpj):
     """Formatar CPF/CNPJ para exibição"""
@@ -209,42 +384,15 @@ def format_cpf_cnpj(cpf_cnpj):
 
 def gerar_pdf_contrato(contrato):
     """Gerar PDF do contrato"""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        textColor=colors.HexColor('#2c3e50')
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-        textColor=colors.HexColor('#34495e')
-    )
-    
-    normal_style = styles['Normal']
-    normal_style.fontSize = 10
+    estilos = obter_estilos()
+    heading_style = estilos['heading']
+    normal_style = estilos['normal']
     
     # Conteúdo do PDF
     story = []
     
     # Cabeçalho
-    story.append(Paragraph("LANTERCAR", title_style))
-    story.append(Paragraph("Oficina Mecânica", styles['Normal']))
-    story.append(Spacer(1, 20))
-    
-    # Título do documento
-    story.append(Paragraph(f"CONTRATO DE PRESTAÇÃO DE SERVIÇOS Nº {contrato.numero_contrato}", heading_style))
-    story.append(Spacer(1, 20))
+    adicionar_cabecalho(story, f"CONTRATO DE PRESTAÇÃO DE SERVIÇOS Nº {contrato.numero_contrato}")
     
     # Informações das partes
     ordem = contrato.ordem_servico
@@ -274,28 +422,14 @@ def gerar_pdf_contrato(contrato):
     
     # Dados do contrato
     story.append(Paragraph("DADOS DO CONTRATO", heading_style))
-    dados_contrato = [
+    story.append(tabela_info([
         ['Número do Contrato:', contrato.numero_contrato],
         ['Data do Contrato:', contrato.data_contrato.strftime('%d/%m/%Y')],
         ['Ordem de Serviço:', ordem.numero_ordem],
         ['Orçamento Base:', orcamento.numero_orcamento],
-        ['Valor Total:', f"R$ {orcamento.valor_total:.2f}".replace('.', ',')],
+        ['Valor Total:', formatar_moeda(orcamento.valor_total)],
         ['Status:', contrato.status.title()]
-    ]
-    
-    dados_table = Table(dados_contrato, colWidths=[2.5*inch, 3.5*inch])
-    dados_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-        ('TOPPADDING', (0, 0), (-1, -1), 3),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-    ]))
-    
-    story.append(dados_table)
+    ], col_widths=(2.5*inch, 3.5*inch)))
     story.append(Spacer(1, 20))
     
     # Objeto do contrato
@@ -309,82 +443,36 @@ def gerar_pdf_contrato(contrato):
     story.append(Spacer(1, 30))
     
     # Assinaturas
-    story.append(Paragraph("ASSINATURAS", heading_style))
-    story.append(Spacer(1, 40))
-    
-    assinaturas_data = [
+    adicionar_assinaturas(story, "ASSINATURAS", [
         ['_' * 30, '_' * 30],
         ['CONTRATANTE', 'CONTRATADA'],
         [cliente.nome, 'LANTERCAR - Oficina Mecânica']
-    ]
-    
-    assinaturas_table = Table(assinaturas_data, colWidths=[3*inch, 3*inch])
-    assinaturas_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('TOPPADDING', (0, 1), (-1, -1), 10),
-    ]))
-    
-    story.append(assinaturas_table)
+    ], [3*inch, 3*inch])
     
     # Rodapé
     story.append(Spacer(1, 30))
-    rodape = f"Documento gerado em {datetime.now().strftime('%d/%m/%Y às %H:%M')}"
-    story.append(Paragraph(rodape, ParagraphStyle('Footer', parent=normal_style, fontSize=8, alignment=TA_CENTER)))
+    adicionar_rodape(story)
     
     # Gerar PDF
-    doc.build(story)
-    
-    pdf_content = buffer.getvalue()
-    buffer.close()
-    
-    return pdf_content
+    return construir_pdf(story)
 
 def gerar_pdf_ordem_servico(ordem):
     """Gerar PDF da ordem de serviço"""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        textColor=colors.HexColor('#2c3e50')
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-        textColor=colors.HexColor('#34495e')
-    )
-    
-    normal_style = styles['Normal']
-    normal_style.fontSize = 10
+    estilos = obter_estilos()
+    heading_style = estilos['heading']
+    normal_style = estilos['normal']
     
     # Conteúdo do PDF
     story = []
     
     # Cabeçalho
-    story.append(Paragraph("LANTERCAR", title_style))
-    story.append(Paragraph("Oficina Mecânica", styles['Normal']))
-    story.append(Spacer(1, 20))
-    
-    # Título do documento
-    story.append(Paragraph(f"ORDEM DE SERVIÇO Nº {ordem.numero_ordem}", heading_style))
-    story.append(Spacer(1, 20))
+    adicionar_cabecalho(story, f"ORDEM DE SERVIÇO Nº {ordem.numero_ordem}")
     
     # Informações da ordem
     orcamento = ordem.orcamento
     cliente = orcamento.cliente
     
-    info_data = [
+    story.append(tabela_info([
         ['Cliente:', cliente.nome],
         ['CPF/CNPJ:', format_cpf_cnpj(cliente.cpf_cnpj)],
         ['Telefone:', cliente.telefone or 'Não informado'],
@@ -394,21 +482,7 @@ def gerar_pdf_ordem_servico(ordem):
         ['Data de Início:', ordem.data_inicio.strftime('%d/%m/%Y %H:%M')],
         ['Data de Conclusão:', ordem.data_conclusao.strftime('%d/%m/%Y %H:%M') if ordem.data_conclusao else 'Em andamento'],
         ['Status:', ordem.status.replace('_', ' ').title()],
-    ]
-    
-    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
-    info_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-        ('TOPPADDING', (0, 0), (-1, -1), 3),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
     ]))
-    
-    story.append(info_table)
     story.append(Spacer(1, 20))
     
     # Descrição do serviço
@@ -419,63 +493,12 @@ def gerar_pdf_ordem_servico(ordem):
     # Materiais utilizados
     if orcamento.itens:
         story.append(Paragraph("MATERIAIS UTILIZADOS", heading_style))
-        
-        # Cabeçalho da tabela
-        items_data = [['Item', 'Código', 'Descrição', 'Qtd', 'Unid', 'Valor Unit.', 'Subtotal']]
-        
-        # Itens
-        for i, item in enumerate(orcamento.itens, 1):
-            items_data.append([
-                str(i),
-                item.material.codigo,
-                item.material.nome,
-                f"{item.quantidade:.2f}".replace('.', ','),
-                item.material.unidade_medida,
-                f"R$ {item.preco_unitario:.2f}".replace('.', ','),
-                f"R$ {item.subtotal:.2f}".replace('.', ',')
-            ])
-        
-        items_table = Table(items_data, colWidths=[0.5*inch, 1*inch, 2.5*inch, 0.7*inch, 0.5*inch, 1*inch, 1*inch])
-        items_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#34495e')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (2, 1), (2, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        
-        story.append(items_table)
+        story.append(tabela_itens(orcamento.itens))
         story.append(Spacer(1, 20))
     
     # Resumo financeiro
     story.append(Paragraph("RESUMO FINANCEIRO", heading_style))
-    
-    total_materiais = sum(item.subtotal for item in orcamento.itens)
-    
-    resumo_data = [
-        ['Subtotal Materiais:', f"R$ {total_materiais:.2f}".replace('.', ',')],
-        ['Mão de Obra:', f"R$ {orcamento.valor_mao_obra:.2f}".replace('.', ',')],
-        ['TOTAL GERAL:', f"R$ {orcamento.valor_total:.2f}".replace('.', ',')]
-    ]
-    
-    resumo_table = Table(resumo_data, colWidths=[4*inch, 2*inch])
-    resumo_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, -1), (-1, -1), 14),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('LINEBELOW', (0, -1), (-1, -1), 2, colors.black),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    
-    story.append(resumo_table)
+    story.append(resumo_orcamento(orcamento))
     story.append(Spacer(1, 20))
     
     # Observações
@@ -485,77 +508,31 @@ def gerar_pdf_ordem_servico(ordem):
         story.append(Spacer(1, 20))
     
     # Assinatura do cliente
-    story.append(Paragraph("ASSINATURA DO CLIENTE", heading_style))
-    story.append(Spacer(1, 40))
-    
-    assinatura_data = [
+    adicionar_assinaturas(story, "ASSINATURA DO CLIENTE", [
         ['_' * 40],
         [cliente.nome],
         ['Cliente']
-    ]
-    
-    assinatura_table = Table(assinatura_data, colWidths=[4*inch])
-    assinatura_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('TOPPADDING', (0, 1), (-1, -1), 10),
-    ]))
-    
-    story.append(assinatura_table)
+    ], [4*inch])
     
     # Rodapé
     story.append(Spacer(1, 30))
-    rodape = f"Documento gerado em {datetime.now().strftime('%d/%m/%Y às %H:%M')}"
-    story.append(Paragraph(rodape, ParagraphStyle('Footer', parent=normal_style, fontSize=8, alignment=TA_CENTER)))
+    adicionar_rodape(story)
     
     # Gerar PDF
-    doc.build(story)
-    
-    pdf_content = buffer.getvalue()
-    buffer.close()
-    
-    return pdf_content
+    return construir_pdf(story)
 
 
 def gerar_pdf_nota_fiscal(nota_fiscal):
     """Gerar PDF da nota fiscal"""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        textColor=colors.HexColor('#2c3e50')
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-        textColor=colors.HexColor('#34495e')
-    )
-    
-    normal_style = styles['Normal']
-    normal_style.fontSize = 10
+    estilos = obter_estilos()
+    heading_style = estilos['heading']
+    normal_style = estilos['normal']
     
     # Conteúdo do PDF
     story = []
     
     # Cabeçalho
-    story.append(Paragraph("LANTERCAR", title_style))
-    story.append(Paragraph("Oficina Mecânica", styles['Normal']))
-    story.append(Spacer(1, 20))
-    
-    # Título do documento
-    story.append(Paragraph(f"NOTA FISCAL DE SERVIÇOS Nº {nota_fiscal.numero_nf}", heading_style))
-    story.append(Spacer(1, 20))
+    adicionar_cabecalho(story, f"NOTA FISCAL DE SERVIÇOS Nº {nota_fiscal.numero_nf}")
     
     # Informações da nota fiscal
     ordem = nota_fiscal.ordem_servico
@@ -590,27 +567,13 @@ def gerar_pdf_nota_fiscal(nota_fiscal):
     
     # Dados da nota fiscal
     story.append(Paragraph("DADOS DA NOTA FISCAL", heading_style))
-    dados_nf = [
+    story.append(tabela_info([
         ['Número da NF:', nota_fiscal.numero_nf],
         ['Data de Emissão:', nota_fiscal.data_emissao.strftime('%d/%m/%Y')],
         ['Ordem de Serviço:', ordem.numero_ordem],
         ['Orçamento Base:', orcamento.numero_orcamento],
         ['Status:', nota_fiscal.status.title()]
-    ]
-    
-    dados_table = Table(dados_nf, colWidths=[2.5*inch, 3.5*inch])
-    dados_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-        ('TOPPADDING', (0, 0), (-1, -1), 3),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-    ]))
-    
-    story.append(dados_table)
+    ], col_widths=(2.5*inch, 3.5*inch)))
     story.append(Spacer(1, 20))
     
     # Descrição dos serviços
@@ -625,8 +588,8 @@ def gerar_pdf_nota_fiscal(nota_fiscal):
             '1',
             orcamento.descricao_servico,
             '1',
-            f"R$ {orcamento.valor_mao_obra:.2f}".replace('.', ','),
-            f"R$ {orcamento.valor_mao_obra:.2f}".replace('.', ',')
+            formatar_moeda(orcamento.valor_mao_obra),
+            formatar_moeda(orcamento.valor_mao_obra)
         ])
     
     # Materiais (agrupados)
@@ -640,51 +603,26 @@ def gerar_pdf_nota_fiscal(nota_fiscal):
             str(item_num),
             materiais_desc,
             '1',
-            f"R$ {total_materiais:.2f}".replace('.', ','),
-            f"R$ {total_materiais:.2f}".replace('.', ',')
+            formatar_moeda(total_materiais),
+            formatar_moeda(total_materiais)
         ])
     
     servicos_table = Table(servicos_data, colWidths=[0.5*inch, 3.5*inch, 1*inch, 1.2*inch, 1.2*inch])
-    servicos_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#34495e')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('ALIGN', (1, 1), (1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
+    servicos_table.setStyle(estilo_tabela_grade(1))
     
     story.append(servicos_table)
     story.append(Spacer(1, 20))
     
     # Resumo dos valores
     story.append(Paragraph("RESUMO DOS VALORES", heading_style))
-    
-    resumo_valores = [
-        ['Valor Total dos Serviços:', f"R$ {nota_fiscal.valor_total:.2f}".replace('.', ',')],
+    story.append(tabela_resumo([
+        ['Valor Total dos Serviços:', formatar_moeda(nota_fiscal.valor_total)],
         ['(-) Deduções:', 'R$ 0,00'],
-        ['Base de Cálculo:', f"R$ {nota_fiscal.valor_total:.2f}".replace('.', ',')],
+        ['Base de Cálculo:', formatar_moeda(nota_fiscal.valor_total)],
         ['Alíquota ISS:', '5,00%'],
-        ['Valor do ISS:', f"R$ {(nota_fiscal.valor_total * 0.05):.2f}".replace('.', ',')],
-        ['Valor Líquido:', f"R$ {(nota_fiscal.valor_total - (nota_fiscal.valor_total * 0.05)):.2f}".replace('.', ',')]
-    ]
-    
-    resumo_table = Table(resumo_valores, colWidths=[4*inch, 2*inch])
-    resumo_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('LINEBELOW', (0, -1), (-1, -1), 2, colors.black),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    
-    story.append(resumo_table)
+        ['Valor do ISS:', formatar_moeda(nota_fiscal.valor_total * 0.05)],
+        ['Valor Líquido:', formatar_moeda(nota_fiscal.valor_total - (nota_fiscal.valor_total * 0.05))]
+    ], estilo=RESUMO_NF_TABLE_STYLE))
     story.append(Spacer(1, 30))
     
     # Informações adicionais
@@ -700,80 +638,62 @@ def gerar_pdf_nota_fiscal(nota_fiscal):
     story.append(Spacer(1, 20))
     
     # Rodapé
-    rodape = f"Nota Fiscal gerada em {datetime.now().strftime('%d/%m/%Y às %H:%M')}"
-    story.append(Paragraph(rodape, ParagraphStyle('Footer', parent=normal_style, fontSize=8, alignment=TA_CENTER)))
+    adicionar_rodape(story, "Nota Fiscal gerada em")
     
     # Gerar PDF
-    doc.build(story)
-    
-    pdf_content = buffer.getvalue()
-    buffer.close()
-    
-    return pdf_content
+    return construir_pdf(story)
 
 
-def gerar_pdf_relatorio_servicos(ordens, filtros):
-    """Gerar PDF do relatório de serviços"""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        textColor=colors.HexColor('#2c3e50')
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-        textColor=colors.HexColor('#34495e')
-    )
-    
-    normal_style = styles['Normal']
-    normal_style.fontSize = 10
-    
-    # Conteúdo do PDF
-    story = []
+class StoryPreguicoso(list):
+    """Story que puxa os flowables de um iterável conforme o doc.build os consome.
+
+    O build só olha o início da lista (e remove o que já desenhou), então
+    basta manter uns poucos flowables carregados: o relatório inteiro nunca
+    fica em memória, só a página que está sendo montada.
+    """
+
+    def __init__(self, flowables):
+        super().__init__()
+        self._flowables = iter(flowables)
+
+    def _carregar(self, minimo=2):
+        while list.__len__(self) < minimo:
+            try:
+                self.append(next(self._flowables))
+            except StopIteration:
+                break
+
+    def __len__(self):
+        self._carregar()
+        return list.__len__(self)
+
+    def __getitem__(self, indice):
+        self._carregar()
+        return list.__getitem__(self, indice)
+
+def gerar_pdf_relatorio_servicos(linhas, filtros_info, estatisticas):
+    """Gerar PDF do relatório de serviços
+
+    Linhas, descrição dos filtros e estatísticas vêm prontas de
+    consultas_relatorios; a função não acessa o banco e pode rodar em outro
+    processo (tarefas_pdf). As linhas são lidas conforme as páginas são
+    desenhadas, então podem vir de um gerador.
+    """
+    story = StoryPreguicoso(_story_relatorio_servicos(linhas, filtros_info, estatisticas))
+    return construir_pdf(story, numerar_pagina)
+
+def _story_relatorio_servicos(linhas, filtros_info, estatisticas):
+    """Flowables do relatório de serviços, uma página de serviços por vez"""
+    estilos = obter_estilos()
+    heading_style = estilos['heading']
+    normal_style = estilos['normal']
     
     # Cabeçalho
-    story.append(Paragraph("LANTERCAR", title_style))
-    story.append(Paragraph("Oficina Mecânica", styles['Normal']))
-    story.append(Spacer(1, 20))
-    
-    # Título do documento
-    story.append(Paragraph("RELATÓRIO DE SERVIÇOS", heading_style))
-    story.append(Spacer(1, 20))
+    story = []
+    adicionar_cabecalho(story, "RELATÓRIO DE SERVIÇOS")
     
     # Filtros aplicados
     story.append(Paragraph("FILTROS APLICADOS", heading_style))
-    filtros_info = []
-    
-    if filtros.get('data_inicio'):
-        filtros_info.append(f"Data Início: {datetime.strptime(filtros['data_inicio'], '%Y-%m-%d').strftime('%d/%m/%Y')}")
-    
-    if filtros.get('data_fim'):
-        filtros_info.append(f"Data Fim: {datetime.strptime(filtros['data_fim'], '%Y-%m-%d').strftime('%d/%m/%Y')}")
-    
-    if filtros.get('status'):
-        filtros_info.append(f"Status: {filtros['status'].replace('_', ' ').title()}")
-    
-    if filtros.get('cliente_id'):
-        # Buscar nome do cliente
-        from src.models import Cliente
-        cliente = Cliente.query.get(filtros['cliente_id'])
-        if cliente:
-            filtros_info.append(f"Cliente: {cliente.nome}")
-    
-    if not filtros_info:
-        filtros_info.append("Nenhum filtro aplicado")
-    
     for filtro in filtros_info:
         story.append(Paragraph(filtro, normal_style))
     
@@ -781,83 +701,60 @@ def gerar_pdf_relatorio_servicos(ordens, filtros):
     
     # Estatísticas
     story.append(Paragraph("RESUMO ESTATÍSTICO", heading_style))
-    
-    total_servicos = len(ordens)
-    valor_total = sum(ordem.orcamento.valor_total for ordem in ordens)
-    servicos_concluidos = len([o for o in ordens if o.status == 'concluido'])
-    servicos_em_andamento = len([o for o in ordens if o.status == 'em_andamento'])
-    servicos_cancelados = len([o for o in ordens if o.status == 'cancelado'])
-    
-    estatisticas_data = [
-        ['Total de Serviços:', str(total_servicos)],
-        ['Valor Total:', f"R$ {valor_total:.2f}".replace('.', ',')],
-        ['Serviços Concluídos:', str(servicos_concluidos)],
-        ['Serviços em Andamento:', str(servicos_em_andamento)],
-        ['Serviços Cancelados:', str(servicos_cancelados)]
-    ]
-    
-    estatisticas_table = Table(estatisticas_data, colWidths=[3*inch, 2*inch])
-    estatisticas_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-        ('TOPPADDING', (0, 0), (-1, -1), 3),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-    ]))
-    
-    story.append(estatisticas_table)
+    story.append(tabela_info([
+        ['Total de Serviços:', str(estatisticas['total_servicos'])],
+        ['Valor Total:', formatar_moeda(estatisticas['valor_total'])],
+        ['Serviços Concluídos:', str(estatisticas['servicos_concluidos'])],
+        ['Serviços em Andamento:', str(estatisticas['servicos_em_andamento'])],
+        ['Serviços Cancelados:', str(estatisticas['servicos_cancelados'])]
+    ], col_widths=(3*inch, 2*inch), estilo=ESTATISTICAS_TABLE_STYLE))
     story.append(Spacer(1, 20))
+    yield from story
     
-    # Lista de serviços
-    if ordens:
-        story.append(Paragraph("DETALHAMENTO DOS SERVIÇOS", heading_style))
-        
-        # Cabeçalho da tabela
-        servicos_data = [['OS', 'Cliente', 'Data Início', 'Status', 'Valor']]
-        
-        # Serviços
-        for ordem in ordens:
-            servicos_data.append([
-                ordem.numero_ordem,
-                ordem.orcamento.cliente.nome[:20] + '...' if len(ordem.orcamento.cliente.nome) > 20 else ordem.orcamento.cliente.nome,
-                ordem.data_inicio.strftime('%d/%m/%Y'),
-                ordem.status.replace('_', ' ').title(),
-                f"R$ {ordem.orcamento.valor_total:.2f}".replace('.', ',')
-            ])
-        
-        servicos_table = Table(servicos_data, colWidths=[1.2*inch, 2.5*inch, 1*inch, 1.3*inch, 1*inch])
-        servicos_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#34495e')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (1, 1), (1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
+    # Lista de serviços, uma tabela por página
+    linhas = iter(linhas)
+    pagina = list(islice(linhas, LINHAS_POR_PAGINA_RELATORIO))
+    
+    if pagina:
+        yield PageBreak()
+        yield Paragraph("DETALHAMENTO DOS SERVIÇOS", heading_style)
         
-        story.append(servicos_table)
+        acumulado = 0
+        while pagina:
+            acumulado += sum(linha[4] for linha in pagina)
+            yield tabela_pagina_servicos(pagina, acumulado)
+            
+            pagina = list(islice(linhas, LINHAS_POR_PAGINA_RELATORIO))
+            if pagina:
+                yield PageBreak()
     else:
-        story.append(Paragraph("Nenhum serviço encontrado com os filtros aplicados.", normal_style))
+        yield Paragraph("Nenhum serviço encontrado com os filtros aplicados.", normal_style)
     
-    story.append(Spacer(1, 30))
+    yield Spacer(1, 30)
     
     # Rodapé
-    rodape = f"Relatório gerado em {datetime.now().strftime('%d/%m/%Y às %H:%M')}"
-    story.append(Paragraph(rodape, ParagraphStyle('Footer', parent=normal_style, fontSize=8, alignment=TA_CENTER)))
+    rodape = []
+    adicionar_rodape(rodape, "Relatório gerado em")
+    yield from rodape
+
+def tabela_pagina_servicos(linhas, acumulado):
+    """Tabela de uma página do relatório: cabeçalho, serviços, subtotal da página e acumulado"""
+    servicos_data = [['OS', 'Cliente', 'Data Início', 'Status', 'Valor']]
     
-    # Gerar PDF
-    doc.build(story)
+    for numero_ordem, cliente_nome, data_inicio, status, valor_total in linhas:
+        servicos_data.append([
+            numero_ordem,
+            cliente_nome[:20] + '...' if len(cliente_nome) > 20 else cliente_nome,
+            data_inicio.strftime('%d/%m/%Y'),
+            status.replace('_', ' ').title(),
+            formatar_moeda(valor_total)
+        ])
     
-    pdf_content = buffer.getvalue()
-    buffer.close()
+    servicos_data.append(['Subtotal da página:', '', '', '', formatar_moeda(sum(linha[4] for linha in linhas))])
+    servicos_data.append(['Acumulado:', '', '', '', formatar_moeda(acumulado)])
     
-    return pdf_content
+    servicos_table = Table(servicos_data, colWidths=[1.2*inch, 2.5*inch, 1*inch, 1.3*inch, 1*inch], repeatRows=1)
+    servicos_table.setStyle(estilo_tabela_grade(1, 8))
+    servicos_table.setStyle(SUBTOTAL_RELATORIO_STYLE)
+    return servicos_table
 
@@ -0,0 +1,107 @@
+from sqlalchemy import update, select, func, cast, bindparam, Numeric
+from src.models import db, Material, Orcamento, OrcamentoItem
+from src.utils.importacao import em_lotes, numero_planilha, texto_planilha
+from src.utils.orcamento_itens import recalcular_valor_total
+
+_LOTE_IDS = 5000
+
+def _arredondar(expressao):
+    # round(double precision, int) não existe no PostgreSQL: arredondar como numeric
+    return func.round(cast(expressao, Numeric), 2)
+
+def reajustar_precos(percentual, prefixo_codigo=None):
+    """Reajustar em `percentual` % o preço dos materiais (de todos, ou dos códigos
+    que começam com `prefixo_codigo`) em um único UPDATE. Retorna os ids alterados;
+    o commit fica com quem chamou."""
+    tabela = Material.__table__
+    stmt = (
+        update(tabela)
+        .values(preco_unitario=_arredondar(tabela.c.preco_unitario * (1 + percentual / 100.0)))
+        .returning(tabela.c.id)
+    )
+    if prefixo_codigo:
+        stmt = stmt.where(tabela.c.codigo.startswith(prefixo_codigo, autoescape=True))
+    return db.session.execute(stmt).scalars().all()
+
+def aplicar_tabela_precos(linhas, tamanho_lote=2000):
+    """Gravar os preços de uma planilha (colunas codigo e preco_unitario, de ler_planilha).
+
+    Cada lote faz uma consulta pelos códigos e um UPDATE em executemany, com
+    commit. Retorna {'ids', 'erros'}: ids dos materiais alterados e (linha,
+    mensagem) das linhas com código desconhecido ou preço inválido.
+    """
+    tabela = Material.__table__
+    resultado = {'ids': [], 'erros': []}
+    stmt = (
+        update(tabela)
+        .where(tabela.c.id == bindparam('material_id'))
+        .values(preco_unitario=bindparam('preco'))
+    )
+
+    for lote in em_lotes(linhas, tamanho_lote):
+        precos = {}
+        for numero, linha in lote:
+            codigo = texto_planilha(linha.get('codigo'))
+            try:
+                preco = round(numero_planilha(linha.get('preco_unitario')), 2)
+            except ValueError:
+                resultado['erros'].append((numero, 'Preço unitário inválido.'))
+                continue
+            if not codigo or preco < 0:
+                resultado['erros'].append((numero, 'Informe o código e um preço não negativo.'))
+                continue
+            precos[codigo] = (numero, preco)
+
+        ids = dict(db.session.execute(
+            select(tabela.c.codigo, tabela.c.id).where(tabela.c.codigo.in_(list(precos)))
+        ).all()) if precos else {}
+        for codigo in precos.keys() - ids.keys():
+            resultado['erros'].append((precos[codigo][0], f'Código {codigo} não cadastrado.'))
+        if not ids:
+            continue
+
+        db.session.execute(stmt, [
+            {'material_id': material_id, 'preco': precos[codigo][1]} for codigo, material_id in ids.items()
+        ])
+        db.session.commit()
+        resultado['ids'].extend(ids.values())
+
+    return resultado
+
+def atualizar_orcamentos_pendentes(material_ids=None):
+    """Levar os preços atuais dos materiais aos itens dos orçamentos pendentes.
+
+    Um UPDATE regrava preço e subtotal dos itens com preço diferente do
+    cadastro (só dos `material_ids`, se informados) e outro recalcula o
+    valor_total (itens + mão de obra) dos orçamentos alterados, no lugar de
+    calcular_subtotal/calcular_total objeto a objeto. Retorna os ids dos
+    orçamentos alterados; o commit fica com quem chamou.
+    """
+    itens = OrcamentoItem.__table__
+    materiais = Material.__table__
+    orcamentos = Orcamento.__table__
+
+    preco_atual = select(materiais.c.preco_unitario).where(
+        materiais.c.id == itens.c.material_id
+    ).scalar_subquery()
+
+    stmt = (
+        update(itens)
+        .where(
+            itens.c.orcamento_id.in_(select(orcamentos.c.id).where(orcamentos.c.status == 'pendente')),
+            itens.c.preco_unitario != preco_atual
+        )
+        .values(preco_unitario=preco_atual, subtotal=itens.c.quantidade * preco_atual)
+        .returning(itens.c.orcamento_id)
+    )
+
+    orcamento_ids = set()
+    if material_ids is None:
+        orcamento_ids.update(db.session.execute(stmt).scalars())
+    else:
+        # Em partes, para não passar do limite de parâmetros do banco
+        for lote in em_lotes(material_ids, _LOTE_IDS):
+            orcamento_ids.update(db.session.execute(stmt.where(itens.c.material_id.in_(lote))).scalars())
+
+    recalcular_valor_total(orcamento_ids)
+    return orcamento_ids
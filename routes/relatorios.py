@@ -1,15 +1,22 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, make_response, jsonify
-from flask_login import login_required
-from src.models import db, OrdemServico, Orcamento, Cliente, Material, NotaFiscal
+from flask import Blueprint, render_template, request, redirect, url_for, flash, make_response, jsonify, Response, send_file
+from flask_login import login_required, current_user
+from src.models import db, Cliente
+from src.utils.estatisticas import obter_estatisticas_dashboard, invalidar_estatisticas_dashboard
+from src.utils.resumos import reconstruir_resumos, resumo_por_dia
+from src.utils.replica import marcar_somente_leitura
+from src.utils.consultas_relatorios import (obter_filtros_servicos, query_servicos, pagina_servicos, estatisticas_servicos,
+                                           linhas_relatorio_servicos, descricao_filtros_servicos)
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_
-import pandas as pd
-from io import BytesIO
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
+import click
 
 relatorios_bp = Blueprint('relatorios', __name__)
 
+# Relatórios só consultam: ler da réplica, quando configurada
+relatorios_bp.before_request(marcar_somente_leitura)
+
+# Quantidade de ordens buscadas por vez na exportação para Excel
+EXCEL_LOTE_LINHAS = 1000
+
 @relatorios_bp.route('/')
 @login_required
 def index():
@@ -19,158 +26,78 @@ def index():
 @login_required
 def servicos():
     # Parâmetros de filtro
-    data_inicio = request.args.get('data_inicio')
-    data_fim = request.args.get('data_fim')
-    cliente_id = request.args.get('cliente_id')
-    status = request.args.get('status')
-    
-    # Query base
-    query = OrdemServico.query.join(Orcamento).join(Cliente)
-    
-    # Aplicar filtros
-    if data_inicio:
-        try:
-            data_inicio_obj = datetime.strptime(data_inicio, '%Y-%m-%d')
-            query = query.filter(OrdemServico.data_inicio >= data_inicio_obj)
-        except ValueError:
-            flash('Data de início inválida.', 'error')
+    filtros = obter_filtros_servicos(request.args)
     
-    if data_fim:
-        try:
-            data_fim_obj = datetime.strptime(data_fim, '%Y-%m-%d')
-            # Adicionar 23:59:59 para incluir todo o dia
-            data_fim_obj = data_fim_obj.replace(hour=23, minute=59, second=59)
-            query = query.filter(OrdemServico.data_inicio <= data_fim_obj)
-        except ValueError:
-            flash('Data de fim inválida.', 'error')
+    # Query com orçamento, cliente e nota fiscal carregados no mesmo SELECT
+    query, erros = query_servicos(filtros, incluir_nota_fiscal=True)
+    for erro in erros:
+        flash(erro, 'error')
     
-    if cliente_id:
-        query = query.filter(Orcamento.cliente_id == cliente_id)
+    # Primeira página; as demais são carregadas por servicos_pagina
+    ordens, proximo_cursor = pagina_servicos(query)
     
-    if status:
-        query = query.filter(OrdemServico.status == status)
-    
-    # Executar query
-    ordens = query.order_by(OrdemServico.data_inicio.desc()).all()
-    
-    # Calcular estatísticas
-    total_servicos = len(ordens)
-    valor_total = sum(ordem.orcamento.valor_total for ordem in ordens)
-    servicos_concluidos = len([o for o in ordens if o.status == 'concluido'])
-    servicos_em_andamento = len([o for o in ordens if o.status == 'em_andamento'])
-    servicos_cancelados = len([o for o in ordens if o.status == 'cancelado'])
+    # Calcular estatísticas no banco sobre todo o filtro
+    estatisticas = estatisticas_servicos(filtros)
     
     # Clientes para filtro
     clientes = Cliente.query.order_by(Cliente.nome).all()
     
     return render_template('relatorios/servicos.html',
                          ordens=ordens,
+                         proximo_cursor=proximo_cursor,
                          clientes=clientes,
-                         filtros={
-                             'data_inicio': data_inicio,
-                             'data_fim': data_fim,
-                             'cliente_id': cliente_id,
-                             'status': status
-                         },
-                         estatisticas={
-                             'total_servicos': total_servicos,
-                             'valor_total': valor_total,
-                             'servicos_concluidos': servicos_concluidos,
-                             'servicos_em_andamento': servicos_em_andamento,
-                             'servicos_cancelados': servicos_cancelados
-                         })
+                         filtros=filtros,
+                         estatisticas=estatisticas)
+
+@relatorios_bp.route('/servicos/api/pagina')
+@login_required
+def servicos_pagina():
+    """API para carregar as próximas páginas do relatório de serviços"""
+    filtros = obter_filtros_servicos(request.args)
+    query, _ = query_servicos(filtros, incluir_nota_fiscal=True)
+    
+    try:
+        ordens, proximo_cursor = pagina_servicos(query, request.args.get('cursor'))
+    except ValueError:
+        return jsonify({'erro': 'Cursor inválido.'}), 400
+    
+    result = []
+    for ordem in ordens:
+        result.append({
+            'id': ordem.id,
+            'numero_ordem': ordem.numero_ordem,
+            'cliente': ordem.orcamento.cliente.nome,
+            'cliente_url': url_for('clientes.visualizar', id=ordem.orcamento.cliente.id),
+            'numero_orcamento': ordem.orcamento.numero_orcamento,
+            'orcamento_url': url_for('orcamentos.visualizar', id=ordem.orcamento.id),
+            'data_inicio': ordem.data_inicio.strftime('%d/%m/%Y'),
+            'data_conclusao': ordem.data_conclusao.strftime('%d/%m/%Y') if ordem.data_conclusao else None,
+            'status': ordem.status,
+            'valor_total': float(ordem.orcamento.valor_total),
+            'ordem_url': url_for('ordens.visualizar', id=ordem.id),
+            'ordem_pdf_url': url_for('ordens.gerar_pdf_ordem', id=ordem.id),
+            'nota_fiscal_pdf_url': url_for('notas_fiscais.gerar_pdf', id=ordem.nota_fiscal.id) if ordem.nota_fiscal else None
+        })
+    
+    return jsonify({'ordens': result, 'proximo_cursor': proximo_cursor})
 
 @relatorios_bp.route('/servicos/excel')
 @login_required
 def servicos_excel():
     # Obter os mesmos filtros da página de relatórios
-    data_inicio = request.args.get('data_inicio')
-    data_fim = request.args.get('data_fim')
-    cliente_id = request.args.get('cliente_id')
-    status = request.args.get('status')
-    
-    # Query base
-    query = OrdemServico.query.join(Orcamento).join(Cliente)
-    
-    # Aplicar filtros
-    if data_inicio:
-        try:
-            data_inicio_obj = datetime.strptime(data_inicio, '%Y-%m-%d')
-            query = query.filter(OrdemServico.data_inicio >= data_inicio_obj)
-        except ValueError:
-            pass
+    filtros = obter_filtros_servicos(request.args)
+    query, _ = query_servicos(filtros)
     
-    if data_fim:
-        try:
-            data_fim_obj = datetime.strptime(data_fim, '%Y-%m-%d')
-            data_fim_obj = data_fim_obj.replace(hour=23, minute=59, second=59)
-            query = query.filter(OrdemServico.data_inicio <= data_fim_obj)
-        except ValueError:
-            pass
+    # Executar query em lotes para não carregar todas as ordens em memória
+    ordens = query.yield_per(EXCEL_LOTE_LINHAS)
     
-    if cliente_id:
-        query = query.filter(Orcamento.cliente_id == cliente_id)
+    from src.utils.excel_generator import gerar_excel_relatorio_servicos, stream_arquivo, tamanho_arquivo
+    arquivo = gerar_excel_relatorio_servicos(ordens)
     
-    if status:
-        query = query.filter(OrdemServico.status == status)
-    
-    # Executar query
-    ordens = query.order_by(OrdemServico.data_inicio.desc()).all()
-    
-    # Criar workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Relatório de Serviços"
-    
-    # Estilos
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Cabeçalho
-    headers = [
-        "Ordem de Serviço", "Cliente", "Orçamento", "Data Início", 
-        "Data Conclusão", "Status", "Descrição", "Valor Total"
-    ]
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    # Dados
-    for row, ordem in enumerate(ordens, 2):
-        ws.cell(row=row, column=1, value=ordem.numero_ordem)
-        ws.cell(row=row, column=2, value=ordem.orcamento.cliente.nome)
-        ws.cell(row=row, column=3, value=ordem.orcamento.numero_orcamento)
-        ws.cell(row=row, column=4, value=ordem.data_inicio.strftime('%d/%m/%Y'))
-        ws.cell(row=row, column=5, value=ordem.data_conclusao.strftime('%d/%m/%Y') if ordem.data_conclusao else 'Em andamento')
-        ws.cell(row=row, column=6, value=ordem.status.replace('_', ' ').title())
-        ws.cell(row=row, column=7, value=ordem.orcamento.descricao_servico)
-        ws.cell(row=row, column=8, value=f"R$ {ordem.orcamento.valor_total:.2f}")
-    
-    # Ajustar largura das colunas
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Salvar em buffer
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    
-    # Criar resposta
-    response = make_response(buffer.getvalue())
+    # Criar resposta em streaming a partir do arquivo temporário
+    response = Response(stream_arquivo(arquivo), direct_passthrough=True)
     response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    response.headers['Content-Length'] = str(tamanho_arquivo(arquivo))
     response.headers['Content-Disposition'] = f'attachment; filename=relatorio_servicos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
     
     return response
@@ -179,47 +106,15 @@ def servicos_excel():
 @login_required
 def servicos_pdf():
     # Obter os mesmos filtros da página de relatórios
-    data_inicio = request.args.get('data_inicio')
-    data_fim = request.args.get('data_fim')
-    cliente_id = request.args.get('cliente_id')
-    status = request.args.get('status')
-    
-    # Query base
-    query = OrdemServico.query.join(Orcamento).join(Cliente)
-    
-    # Aplicar filtros
-    if data_inicio:
-        try:
-            data_inicio_obj = datetime.strptime(data_inicio, '%Y-%m-%d')
-            query = query.filter(OrdemServico.data_inicio >= data_inicio_obj)
-        except ValueError:
-            pass
-    
-    if data_fim:
-        try:
-            data_fim_obj = datetime.strptime(data_fim, '%Y-%m-%d')
-            data_fim_obj = data_fim_obj.replace(hour=23, minute=59, second=59)
-            query = query.filter(OrdemServico.data_inicio <= data_fim_obj)
-        except ValueError:
-            pass
-    
-    if cliente_id:
-        query = query.filter(Orcamento.cliente_id == cliente_id)
-    
-    if status:
-        query = query.filter(OrdemServico.status == status)
-    
-    # Executar query
-    ordens = query.order_by(OrdemServico.data_inicio.desc()).all()
+    filtros = obter_filtros_servicos(request.args)
     
     try:
         from src.utils.pdf_generator import gerar_pdf_relatorio_servicos
-        pdf_content = gerar_pdf_relatorio_servicos(ordens, {
-            'data_inicio': data_inicio,
-            'data_fim': data_fim,
-            'cliente_id': cliente_id,
-            'status': status
-        })
+        pdf_content = gerar_pdf_relatorio_servicos(
+            linhas_relatorio_servicos(filtros),
+            descricao_filtros_servicos(filtros),
+            estatisticas_servicos(filtros)
+        )
         
         response = make_response(pdf_content)
         response.headers['Content-Type'] = 'application/pdf'
@@ -230,50 +125,113 @@ def servicos_pdf():
         flash('Erro ao gerar PDF do relatório.', 'error')
         return redirect(url_for('relatorios.servicos'))
 
-@relatorios_bp.route('/dashboard')
+@relatorios_bp.route('/servicos/pdf/tarefa', methods=['POST'])
 @login_required
-def dashboard():
-    # Período padrão: últimos 30 dias
-    data_fim = datetime.now()
-    data_inicio = data_fim - timedelta(days=30)
+def servicos_pdf_tarefa():
+    """Enviar o PDF do relatório para geração em segundo plano"""
+    filtros = obter_filtros_servicos(request.args)
+    
+    from src.utils.pdf_generator import gerar_pdf_relatorio_servicos
+    from src.utils.tarefas_pdf import enviar_tarefa_pdf, LinhasEmArquivo
+    
+    # As consultas rodam aqui e as linhas vão para disco em lotes; o processo
+    # do pool só monta o PDF, lendo as linhas conforme desenha as páginas
+    tarefa_id = enviar_tarefa_pdf(
+        gerar_pdf_relatorio_servicos,
+        (LinhasEmArquivo.gravar(linhas_relatorio_servicos(filtros)), descricao_filtros_servicos(filtros),
+         estatisticas_servicos(filtros)),
+        f'relatorio_servicos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf',
+        current_user.id
+    )
+    
+    return jsonify({
+        'id': tarefa_id,
+        'status_url': url_for('relatorios.tarefa_status', tarefa_id=tarefa_id),
+        'download_url': url_for('relatorios.tarefa_download', tarefa_id=tarefa_id)
+    }), 202
+
+@relatorios_bp.route('/tarefas/<tarefa_id>')
+@login_required
+def tarefa_status(tarefa_id):
+    from src.utils.tarefas_pdf import status_tarefa
+    tarefa = status_tarefa(tarefa_id, current_user.id)
     
-    # Estatísticas gerais
-    total_clientes = Cliente.query.count()
-    total_orcamentos = Orcamento.query.count()
-    total_ordens = OrdemServico.query.count()
-    total_notas_fiscais = NotaFiscal.query.count()
+    if tarefa is None:
+        return jsonify({'erro': 'Tarefa não encontrada.'}), 404
     
-    # Ordens por status
-    ordens_em_andamento = OrdemServico.query.filter_by(status='em_andamento').count()
-    ordens_concluidas = OrdemServico.query.filter_by(status='concluido').count()
-    ordens_canceladas = OrdemServico.query.filter_by(status='cancelado').count()
+    resposta = {'id': tarefa_id, 'status': tarefa['status']}
+    if tarefa['status'] == 'concluida':
+        resposta['download_url'] = url_for('relatorios.tarefa_download', tarefa_id=tarefa_id)
+    elif tarefa['status'] == 'erro':
+        resposta['erro'] = 'Erro ao gerar PDF.'
     
-    # Faturamento do mês
-    faturamento_mes = db.session.query(func.sum(Orcamento.valor_total)).join(OrdemServico).filter(
-        and_(
-            OrdemServico.status == 'concluido',
-            OrdemServico.data_conclusao >= data_inicio,
-            OrdemServico.data_conclusao <= data_fim
-        )
-    ).scalar() or 0
+    return jsonify(resposta)
+
+@relatorios_bp.route('/exportacoes/<exportacao_id>')
+@login_required
+def exportacao_progresso(exportacao_id):
+    """Progresso de uma exportação de PDFs em ZIP (parâmetro exportacao)"""
+    from src.utils.tarefas_pdf import progresso_exportacao
+    progresso = progresso_exportacao(exportacao_id, current_user.id)
+    
+    if progresso is None:
+        return jsonify({'erro': 'Exportação não encontrada.'}), 404
+    
+    return jsonify(progresso)
+
+@relatorios_bp.route('/tarefas/<tarefa_id>/download')
+@login_required
+def tarefa_download(tarefa_id):
+    from src.utils.tarefas_pdf import status_tarefa, caminho_pdf_tarefa
+    tarefa = status_tarefa(tarefa_id, current_user.id)
     
-    # Orçamentos pendentes
-    orcamentos_pendentes = Orcamento.query.filter_by(status='pendente').count()
+    if tarefa is None or tarefa['status'] != 'concluida':
+        flash('PDF não encontrado ou ainda em geração.', 'error')
+        return redirect(url_for('relatorios.servicos'))
     
-    # Materiais com estoque baixo
-    materiais_estoque_baixo = Material.query.filter(Material.estoque <= Material.estoque_minimo).count()
+    return send_file(caminho_pdf_tarefa(tarefa_id), mimetype='application/pdf',
+                     as_attachment=True, download_name=tarefa['nome_arquivo'])
+
+@relatorios_bp.route('/dashboard')
+@login_required
+def dashboard():
+    # Estatísticas gerais (um único SELECT, em cache por DASHBOARD_CACHE_TTL segundos)
+    estatisticas = obter_estatisticas_dashboard()
     
-    return render_template('relatorios/dashboard.html',
-                         estatisticas={
-                             'total_clientes': total_clientes,
-                             'total_orcamentos': total_orcamentos,
-                             'total_ordens': total_ordens,
-                             'total_notas_fiscais': total_notas_fiscais,
-                             'ordens_em_andamento': ordens_em_andamento,
-                             'ordens_concluidas': ordens_concluidas,
-                             'ordens_canceladas': ordens_canceladas,
-                             'faturamento_mes': faturamento_mes,
-                             'orcamentos_pendentes': orcamentos_pendentes,
-                             'materiais_estoque_baixo': materiais_estoque_baixo
-                         })
+    return render_template('relatorios/dashboard.html', estatisticas=estatisticas)
 
+@relatorios_bp.route('/api/faturamento')
+@login_required
+def api_faturamento():
+    """API com os totais diários do período, lidos da tabela de resumo"""
+    try:
+        data_fim = datetime.strptime(request.args['data_fim'], '%Y-%m-%d').date() if request.args.get('data_fim') else datetime.now().date()
+        data_inicio = datetime.strptime(request.args['data_inicio'], '%Y-%m-%d').date() if request.args.get('data_inicio') else data_fim - timedelta(days=30)
+    except ValueError:
+        return jsonify({'erro': 'Data inválida.'}), 400
+    
+    result = []
+    for linha in resumo_por_dia(data_inicio, data_fim, request.args.get('cliente_id')):
+        resumo = linha._asdict()
+        resumo['data'] = linha.data.strftime('%Y-%m-%d')
+        result.append(resumo)
+    
+    return jsonify(result)
+
+@relatorios_bp.cli.command('reconstruir-resumos')
+@click.option('--data-inicio', type=click.DateTime(formats=['%Y-%m-%d']), help='Primeiro dia a recalcular')
+@click.option('--data-fim', type=click.DateTime(formats=['%Y-%m-%d']), help='Último dia a recalcular')
+def reconstruir_resumos_command(data_inicio, data_fim):
+    """Recalcular a tabela de resumo diário a partir do histórico (rodar com DB_PERFIL=batch)"""
+    try:
+        linhas = reconstruir_resumos(
+            data_inicio.date() if data_inicio else None,
+            data_fim.date() if data_fim else None
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    invalidar_estatisticas_dashboard()
+    click.echo(f'{linhas} linhas de resumo gravadas.')
@@ -0,0 +1,47 @@
+from flask import current_app, g
+from sqlalchemy import exc, text
+from src.models import db
+from functools import wraps
+
+# Requisições marcadas aqui leem da réplica (bind 'replica'), quando
+# configurada; o roteamento e a aderência ao principal depois de gravações
+# ficam na SessaoRoteada (extensions).
+
+def marcar_somente_leitura():
+    """Ler da réplica no restante da requisição (para before_request de blueprints só de consulta)"""
+    g.somente_leitura = True
+
+def somente_leitura(view):
+    """Decorator das views de consulta (dashboard, exportações) que podem ler da réplica"""
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        marcar_somente_leitura()
+        return view(*args, **kwargs)
+    return decorated
+
+# Atraso da réplica em segundos (0 quando já aplicou todo o WAL recebido, para
+# um principal sem gravações não parecer atrasado)
+_ATRASO_REPLICA = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+def engine_leitura_em_dia():
+    """Engine para leituras que vão para um cache compartilhado entre usuários.
+
+    A réplica, quando a requisição pode ler dela e o atraso de replicação não
+    passa de REPLICA_ATRASO_MAX segundos; senão o principal, para o cache não
+    guardar dados velhos.
+    """
+    engine = db.session().engine_leitura()
+    if engine is None:
+        return db.engine
+    if engine.dialect.name == 'postgresql':
+        try:
+            with engine.connect() as conexao:
+                atraso = conexao.execute(_ATRASO_REPLICA).scalar()
+        except exc.DBAPIError:
+            return db.engine
+        if atraso is not None and atraso > current_app.config.get('REPLICA_ATRASO_MAX', 5):
+            return db.engine
+    return engine
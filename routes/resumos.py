@@ -0,0 +1,144 @@
+from sqlalchemy import func
+from src.models import db, ResumoDiario, OrdemServico, Orcamento, NotaFiscal
+from src.utils.upsert import insert_upsert
+from datetime import date, datetime
+
+# Colunas de métricas da tabela de resumo
+METRICAS = [
+    'ordens_concluidas', 'faturamento', 'ordens_canceladas',
+    'notas_fiscais_emitidas', 'valor_notas_fiscais_emitidas',
+    'notas_fiscais_canceladas', 'valor_notas_fiscais_canceladas'
+]
+
+def incrementar_resumo(data, cliente_id, **valores):
+    """Somar valores ao resumo do dia/cliente na transação atual.
+
+    Usa INSERT ... ON CONFLICT DO UPDATE com SET coluna = coluna + valor, então
+    workers concorrentes não perdem incrementos. O commit fica com quem chamou.
+    """
+    tabela = ResumoDiario.__table__
+    stmt = insert_upsert(tabela).values(data=data, cliente_id=cliente_id, **valores)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['data', 'cliente_id'],
+        set_={coluna: tabela.c[coluna] + stmt.excluded[coluna] for coluna in valores}
+    )
+    db.session.execute(stmt)
+
+def registrar_ordem_concluida(ordem):
+    """Registrar no resumo a conclusão da ordem de serviço"""
+    incrementar_resumo(
+        ordem.data_conclusao.date(),
+        ordem.orcamento.cliente_id,
+        ordens_concluidas=1,
+        faturamento=ordem.orcamento.valor_total
+    )
+
+def registrar_ordem_cancelada(ordem):
+    """Registrar no resumo o cancelamento da ordem de serviço"""
+    incrementar_resumo(date.today(), ordem.orcamento.cliente_id, ordens_canceladas=1)
+
+def registrar_nota_fiscal_emitida(nota_fiscal, cliente_id):
+    """Registrar no resumo a emissão da nota fiscal"""
+    incrementar_resumo(
+        (nota_fiscal.data_emissao or datetime.now()).date(),
+        cliente_id,
+        notas_fiscais_emitidas=1,
+        valor_notas_fiscais_emitidas=nota_fiscal.valor_total
+    )
+
+def registrar_nota_fiscal_cancelada(nota_fiscal):
+    """Registrar no resumo o cancelamento da nota fiscal"""
+    incrementar_resumo(
+        date.today(),
+        nota_fiscal.ordem_servico.orcamento.cliente_id,
+        notas_fiscais_canceladas=1,
+        valor_notas_fiscais_canceladas=nota_fiscal.valor_total
+    )
+
+def _como_data(valor):
+    # O SQLite devolve date() como texto
+    if isinstance(valor, str):
+        return date.fromisoformat(valor)
+    return valor
+
+def reconstruir_resumos(data_inicio=None, data_fim=None):
+    """Recalcular a tabela de resumo a partir do histórico.
+
+    Sem período, reconstrói tudo. Como ordens e notas fiscais não guardam a data
+    do cancelamento, os cancelamentos do histórico são contados na data de
+    início da ordem e na data de emissão da nota. Retorna a quantidade de
+    linhas gravadas; o commit fica com quem chamou.
+    """
+    resumos = {}
+
+    def acumular(linhas, *metricas):
+        for data, cliente_id, *valores in linhas:
+            resumo = resumos.setdefault((_como_data(data), cliente_id), dict.fromkeys(METRICAS, 0))
+            for metrica, valor in zip(metricas, valores):
+                resumo[metrica] += valor or 0
+
+    def agrupar(coluna_data, *colunas, filtros=()):
+        dia = func.date(coluna_data)
+        query = db.session.query(dia, Orcamento.cliente_id, *colunas).filter(*filtros)
+        if data_inicio:
+            query = query.filter(coluna_data >= datetime.combine(data_inicio, datetime.min.time()))
+        if data_fim:
+            query = query.filter(coluna_data <= datetime.combine(data_fim, datetime.max.time()))
+        return query, dia
+
+    query, dia = agrupar(
+        OrdemServico.data_conclusao,
+        func.count(OrdemServico.id), func.sum(Orcamento.valor_total),
+        filtros=[OrdemServico.status == 'concluido']
+    )
+    acumular(query.join(OrdemServico.orcamento).group_by(dia, Orcamento.cliente_id),
+             'ordens_concluidas', 'faturamento')
+
+    query, dia = agrupar(
+        OrdemServico.data_inicio,
+        func.count(OrdemServico.id),
+        filtros=[OrdemServico.status == 'cancelado']
+    )
+    acumular(query.join(OrdemServico.orcamento).group_by(dia, Orcamento.cliente_id),
+             'ordens_canceladas')
+
+    query, dia = agrupar(
+        NotaFiscal.data_emissao,
+        func.count(NotaFiscal.id), func.sum(NotaFiscal.valor_total),
+        func.count(NotaFiscal.id).filter(NotaFiscal.status == 'cancelada'),
+        func.sum(NotaFiscal.valor_total).filter(NotaFiscal.status == 'cancelada')
+    )
+    acumular(query.join(NotaFiscal.ordem_servico).join(OrdemServico.orcamento).group_by(dia, Orcamento.cliente_id),
+             'notas_fiscais_emitidas', 'valor_notas_fiscais_emitidas',
+             'notas_fiscais_canceladas', 'valor_notas_fiscais_canceladas')
+
+    # Substituir o período inteiro
+    delete = ResumoDiario.query
+    if data_inicio:
+        delete = delete.filter(ResumoDiario.data >= data_inicio)
+    if data_fim:
+        delete = delete.filter(ResumoDiario.data <= data_fim)
+    delete.delete(synchronize_session=False)
+
+    if resumos:
+        db.session.execute(ResumoDiario.__table__.insert(), [
+            dict(data=data, cliente_id=cliente_id, **valores)
+            for (data, cliente_id), valores in resumos.items()
+        ])
+
+    return len(resumos)
+
+def resumo_por_dia(data_inicio, data_fim, cliente_id=None):
+    """Totais por dia do período, lidos da tabela de resumo"""
+    query = db.session.query(
+        ResumoDiario.data,
+        *[func.sum(getattr(ResumoDiario, metrica)).label(metrica) for metrica in METRICAS]
+    ).filter(
+        ResumoDiario.data >= data_inicio,
+        ResumoDiario.data <= data_fim
+    )
+
+    if cliente_id:
+        query = query.filter(ResumoDiario.cliente_id == cliente_id)
+
+    return query.group_by(ResumoDiario.data).order_by(ResumoDiario.data).all()
@@ -0,0 +1,73 @@
+from flask import current_app
+from sqlalchemy import select, update, func, cast, Integer
+from src.models import db, SequenciaDocumento
+from src.utils.upsert import insert_upsert
+from datetime import datetime
+import threading
+
+# Blocos reservados por este processo: (prefixo, ano) -> [próximo número, último número]
+_blocos = {}
+_blocos_lock = threading.Lock()
+
+def proximo_numero(prefixo, coluna, ano=None):
+    """Gerar o próximo número de documento no formato {prefixo}{ano}{numero:04d}.
+
+    `coluna` é a coluna do modelo onde o número é gravado (ex.:
+    Orcamento.numero_orcamento); ela só é lida na primeira emissão do ano,
+    para continuar a numeração já existente.
+
+    Com SEQUENCIA_BLOCO = 1 (padrão) o contador é incrementado na transação de
+    quem chamou: a linha fica travada até o commit e um rollback devolve o
+    número, então não há buracos. Com blocos maiores, cada processo reserva
+    vários números de uma vez em transação própria; números não usados de um
+    bloco são perdidos quando o processo termina.
+
+    Acima de 9999 o número simplesmente ganha mais dígitos.
+    """
+    ano = ano or datetime.now().year
+    bloco = current_app.config.get('SEQUENCIA_BLOCO', 1)
+
+    if bloco <= 1:
+        numero = _reservar(db.session, prefixo, ano, 1, coluna)
+    else:
+        with _blocos_lock:
+            reservado = _blocos.get((prefixo, ano))
+            if not reservado or reservado[0] > reservado[1]:
+                with db.engine.begin() as conn:
+                    ultimo = _reservar(conn, prefixo, ano, bloco, coluna)
+                reservado = _blocos[(prefixo, ano)] = [ultimo - bloco + 1, ultimo]
+            numero = reservado[0]
+            reservado[0] += 1
+
+    return f'{prefixo}{ano}{numero:04d}'
+
+def _reservar(conn, prefixo, ano, quantidade, coluna):
+    """Incrementar o contador em `quantidade` e retornar o último número reservado"""
+    tabela = SequenciaDocumento.__table__
+
+    ultimo = conn.execute(
+        update(tabela)
+        .where(tabela.c.prefixo == prefixo, tabela.c.ano == ano)
+        .values(ultimo_numero=tabela.c.ultimo_numero + quantidade)
+        .returning(tabela.c.ultimo_numero)
+    ).scalar()
+
+    if ultimo is None:
+        # Primeira emissão do ano: partir do maior número já gravado
+        inicial = _maior_numero_existente(conn, prefixo, ano, coluna)
+        stmt = insert_upsert(tabela).values(prefixo=prefixo, ano=ano, ultimo_numero=inicial + quantidade)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['prefixo', 'ano'],
+            set_={'ultimo_numero': tabela.c.ultimo_numero + quantidade}
+        ).returning(tabela.c.ultimo_numero)
+        ultimo = conn.execute(stmt).scalar()
+
+    return ultimo
+
+def _maior_numero_existente(conn, prefixo, ano, coluna):
+    """Maior número já emitido para o prefixo/ano, lido da tabela do documento"""
+    inicio_numero = len(prefixo) + len(str(ano)) + 1
+    return conn.execute(
+        select(func.max(cast(func.substr(coluna, inicio_numero), Integer)))
+        .where(coluna.like(f'{prefixo}{ano}%'))
+    ).scalar() or 0
@@ -0,0 +1,241 @@
+from flask import current_app
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import json
+import multiprocessing
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+
+# Pool de processos para gerar PDFs fora das threads que atendem requisições
+_executor = None
+_executor_lock = threading.Lock()
+
+_ID_TAREFA = re.compile(r'[0-9a-f]{32}')
+
+def obter_executor_pdf(quebrado=None):
+    """Pool de processos de geração de PDFs, criado no primeiro uso.
+
+    Com `quebrado`, um pool que falhou com BrokenProcessPool, cria um novo no
+    lugar dele (se outra thread ainda não o recriou).
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None or _executor is quebrado:
+            # spawn: os processos do pool não herdam conexões do banco nem locks
+            # das threads do servidor
+            _executor = ProcessPoolExecutor(
+                max_workers=current_app.config.get('PDF_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+def submeter_pdf(funcao, *args):
+    """Enviar `funcao(*args)` ao pool, recriando-o se um processo dele tiver morrido"""
+    executor = obter_executor_pdf()
+    try:
+        return executor.submit(funcao, *args)
+    except BrokenProcessPool:
+        return obter_executor_pdf(quebrado=executor).submit(funcao, *args)
+
+def diretorio_tarefas_pdf():
+    """Pasta dos resultados das tarefas, compartilhada entre os workers do servidor"""
+    diretorio = current_app.config.get('PDF_TAREFAS_DIR') or os.path.join(tempfile.gettempdir(), 'lantercar_pdf_tarefas')
+    os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+def _gravar(caminho, conteudo):
+    """Gravar o arquivo de forma atômica (outros workers podem estar lendo o diretório)"""
+    fd, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as arquivo:
+        arquivo.write(conteudo)
+    os.replace(temporario, caminho)
+
+def _renderizar(caminho_base, gerar, args):
+    """Executado no processo do pool: gerar o PDF e gravar o resultado em disco"""
+    try:
+        conteudo = gerar(*args)
+    except Exception:
+        _gravar(caminho_base + '.erro', traceback.format_exc().encode('utf-8'))
+        return
+    _gravar(caminho_base + '.pdf', conteudo)
+
+def _registrar_falha(caminho_base, futuro):
+    # O processo do pool morreu (ou a tarefa foi cancelada) sem gravar resultado
+    if futuro.cancelled():
+        erro = 'Tarefa cancelada.'
+    elif futuro.exception() is not None:
+        erro = repr(futuro.exception())
+    else:
+        return
+    if not os.path.exists(caminho_base + '.pdf') and not os.path.exists(caminho_base + '.erro'):
+        _gravar(caminho_base + '.erro', erro.encode('utf-8'))
+
+def _limpar_antigas(diretorio):
+    """Remover as tarefas concluídas há mais de PDF_TAREFAS_RETENCAO segundos.
+
+    A idade de uma tarefa conta a partir do resultado (.pdf ou .erro); tarefas
+    pendentes ficam, com os arquivos de linhas que ainda vão ler. Os demais
+    arquivos (progresso de exportações, temporários, linhas de envios que
+    falharam) contam pela data de modificação.
+    """
+    limite = time.time() - current_app.config.get('PDF_TAREFAS_RETENCAO', 3600)
+    entradas = {entrada.name: entrada for entrada in os.scandir(diretorio)}
+
+    resultados = {}
+    em_uso = set()
+    for nome, entrada in entradas.items():
+        tarefa_id, extensao = os.path.splitext(nome)
+        if extensao != '.json':
+            continue
+        resultado = entradas.get(tarefa_id + '.pdf') or entradas.get(tarefa_id + '.erro')
+        if resultado is not None:
+            resultados[tarefa_id] = resultado
+            continue
+        # Pendente: manter a tarefa e os arquivos que ela usa
+        em_uso.add(tarefa_id)
+        try:
+            with open(entrada.path, 'rb') as arquivo:
+                em_uso.update(json.load(arquivo).get('arquivos', []))
+        except (FileNotFoundError, ValueError):
+            pass
+
+    for nome, entrada in entradas.items():
+        tarefa_id, extensao = os.path.splitext(nome)
+        try:
+            if extensao in ('.json', '.pdf', '.erro'):
+                if tarefa_id in em_uso:
+                    continue
+                concluida_em = (resultados.get(tarefa_id) or entrada).stat().st_mtime
+            elif nome in em_uso:
+                continue
+            else:
+                concluida_em = entrada.stat().st_mtime
+            if concluida_em < limite:
+                os.remove(entrada.path)
+        except FileNotFoundError:
+            pass
+
+class LinhasEmArquivo:
+    """Linhas gravadas em disco para uma tarefa, lidas uma a uma no processo do pool.
+
+    Só o caminho do arquivo é serializado para o outro processo, então nem o
+    worker do servidor nem o processo do pool precisam ter todas as linhas em
+    memória. O arquivo é removido depois de lido (e, se a tarefa falhar, pela
+    limpeza de PDF_TAREFAS_RETENCAO depois que ela terminar).
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+
+    @classmethod
+    def gravar(cls, linhas, lote=1000):
+        """Gravar as linhas (tuplas de dados simples) de um iterável, em lotes"""
+        fd, caminho = tempfile.mkstemp(dir=diretorio_tarefas_pdf(), suffix='.linhas')
+        with os.fdopen(fd, 'wb') as arquivo:
+            lote_atual = []
+            for linha in linhas:
+                lote_atual.append(linha)
+                if len(lote_atual) >= lote:
+                    pickle.dump(lote_atual, arquivo)
+                    lote_atual = []
+            if lote_atual:
+                pickle.dump(lote_atual, arquivo)
+        return cls(caminho)
+
+    def __iter__(self):
+        try:
+            with open(self.caminho, 'rb') as arquivo:
+                while True:
+                    try:
+                        lote = pickle.load(arquivo)
+                    except EOFError:
+                        break
+                    yield from lote
+        finally:
+            os.remove(self.caminho)
+
+def enviar_tarefa_pdf(gerar, args, nome_arquivo, usuario_id):
+    """Enviar a geração de um PDF ao pool de processos e retornar o id da tarefa.
+
+    `gerar` deve ser uma função de módulo e `args` dados simples (tuplas,
+    dicts, datas, números), sem objetos do ORM: tudo é serializado para o
+    outro processo. O resultado fica em PDF_TAREFAS_DIR, então qualquer worker
+    do servidor consegue responder status e download da tarefa.
+    """
+    diretorio = diretorio_tarefas_pdf()
+    _limpar_antigas(diretorio)
+
+    tarefa_id = uuid.uuid4().hex
+    caminho_base = os.path.join(diretorio, tarefa_id)
+    _gravar(caminho_base + '.json', json.dumps({
+        'usuario_id': usuario_id,
+        'nome_arquivo': nome_arquivo,
+        'criada_em': time.time(),
+        # Arquivos de linhas que a tarefa vai ler, mantidos pela limpeza enquanto ela estiver pendente
+        'arquivos': [os.path.basename(arg.caminho) for arg in args if isinstance(arg, LinhasEmArquivo)]
+    }).encode('utf-8'))
+
+    futuro = submeter_pdf(_renderizar, caminho_base, gerar, args)
+    futuro.add_done_callback(lambda f: _registrar_falha(caminho_base, f))
+
+    return tarefa_id
+
+def status_tarefa(tarefa_id, usuario_id):
+    """Status da tarefa: dict com 'status' ('pendente', 'concluida' ou 'erro') e
+    'nome_arquivo', ou None se a tarefa não existir ou for de outro usuário"""
+    if not _ID_TAREFA.fullmatch(tarefa_id):
+        return None
+
+    caminho_base = os.path.join(diretorio_tarefas_pdf(), tarefa_id)
+    try:
+        with open(caminho_base + '.json', 'rb') as arquivo:
+            dados = json.load(arquivo)
+    except FileNotFoundError:
+        return None
+
+    if dados['usuario_id'] != usuario_id:
+        return None
+
+    if os.path.exists(caminho_base + '.pdf'):
+        status = 'concluida'
+    elif os.path.exists(caminho_base + '.erro'):
+        status = 'erro'
+    else:
+        status = 'pendente'
+
+    return {'status': status, 'nome_arquivo': dados['nome_arquivo']}
+
+def caminho_pdf_tarefa(tarefa_id):
+    """Caminho do PDF gerado pela tarefa (validar antes com status_tarefa)"""
+    return os.path.join(diretorio_tarefas_pdf(), f'{tarefa_id}.pdf')
+
+def registrar_progresso(exportacao_id, usuario_id, concluidos, total):
+    """Gravar o progresso de uma exportação, consultado por progresso_exportacao"""
+    if not _ID_TAREFA.fullmatch(exportacao_id):
+        return
+    caminho = os.path.join(diretorio_tarefas_pdf(), f'{exportacao_id}.progresso')
+    _gravar(caminho, json.dumps({
+        'usuario_id': usuario_id,
+        'concluidos': concluidos,
+        'total': total
+    }).encode('utf-8'))
+
+def progresso_exportacao(exportacao_id, usuario_id):
+    """Progresso da exportação ({'concluidos', 'total'}) ou None se não existir"""
+    if not _ID_TAREFA.fullmatch(exportacao_id):
+        return None
+    try:
+        with open(os.path.join(diretorio_tarefas_pdf(), f'{exportacao_id}.progresso'), 'rb') as arquivo:
+            dados = json.load(arquivo)
+    except FileNotFoundError:
+        return None
+
+    if dados.pop('usuario_id') != usuario_id:
+        return None
+    return dados
@@ -0,0 +1,9 @@
+from src.models import db
+
+def insert_upsert(tabela):
+    """Criar um INSERT do dialeto em uso, com suporte a ON CONFLICT (PostgreSQL ou SQLite)"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(tabela)
@@ -0,0 +1,88 @@
+"""Micro-benchmark dos geradores de PDF (não é coletado pelo pytest).
+
+Mede o tempo médio de geração de cada tipo de documento, a partir de dados
+fixos em objetos simples (como os dados_pdf_* enviados ao pool), e o custo
+de montar os estilos. Para comparar com outra versão do gerador:
+
+    git show <commit>:routes/pdf_generator.py > /tmp/pdf_generator_antes.py
+    python tests/benchmark_pdf.py --modulo /tmp/pdf_generator_antes.py
+    python tests/benchmark_pdf.py
+"""
+import argparse
+import importlib.util
+import inspect
+import os
+import timeit
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def carregar_modulo(caminho):
+    spec = importlib.util.spec_from_file_location('pdf_generator_benchmark', caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+def documentos(quantidade_itens=8):
+    """Orçamento, ordem, contrato e nota fiscal com os atributos que os geradores usam"""
+    agora = datetime(2026, 3, 10, 14, 30)
+    material = SimpleNamespace(codigo='P1', nome='Parafuso sextavado', unidade_medida='UN')
+    orcamento = SimpleNamespace(
+        id=1, numero_orcamento='ORC20260001', data_orcamento=agora, validade=agora.date() + timedelta(days=15),
+        descricao_servico='Troca de pastilhas e discos de freio dianteiros', observacoes='Cliente aguarda no local',
+        valor_mao_obra=150.0, valor_total=150.0 + 6.0 * quantidade_itens,
+        usuario=SimpleNamespace(nome='Administrador'),
+        cliente=SimpleNamespace(nome='Cliente Teste', cpf_cnpj='12345678901', telefone='(11) 99999-0000',
+                                email='cliente@exemplo.com', endereco='Rua A, 100', cidade='São Paulo',
+                                estado='SP', cep='01000-000'),
+        itens=[SimpleNamespace(quantidade=2, preco_unitario=3.0, subtotal=6.0, material=material)
+               for _ in range(quantidade_itens)]
+    )
+    ordem = SimpleNamespace(id=1, numero_ordem='OS20260001', data_inicio=agora, data_conclusao=agora + timedelta(days=2),
+                            status='concluido', observacoes='Sem observações', orcamento=orcamento)
+    contrato = SimpleNamespace(id=1, numero_contrato='CT20260001', data_contrato=agora, status='ativo',
+                               termos_condicoes='Termos e condições do contrato.\n' * 10, ordem_servico=ordem)
+    nota_fiscal = SimpleNamespace(id=1, numero_nf='NF20260001', data_emissao=agora, status='emitida',
+                                  valor_total=orcamento.valor_total, ordem_servico=ordem)
+    return orcamento, ordem, contrato, nota_fiscal
+
+def tarefas(modulo):
+    orcamento, ordem, contrato, nota_fiscal = documentos()
+    tarefas = {
+        'orcamento': lambda: modulo.gerar_pdf_orcamento(orcamento),
+        'contrato': lambda: modulo.gerar_pdf_contrato(contrato),
+        'ordem': lambda: modulo.gerar_pdf_ordem_servico(ordem),
+        'nota_fiscal': lambda: modulo.gerar_pdf_nota_fiscal(nota_fiscal),
+    }
+    # O relatório recebe linhas prontas desde a versão com tarefas_pdf
+    if next(iter(inspect.signature(modulo.gerar_pdf_relatorio_servicos).parameters)) == 'linhas':
+        linhas = [(f'OS2026{i:04d}', f'Cliente {i}', ordem.data_inicio, 'concluido', 100.0) for i in range(120)]
+        estatisticas = {'total_servicos': len(linhas), 'valor_total': 100.0 * len(linhas), 'servicos_concluidos': len(linhas),
+                        'servicos_em_andamento': 0, 'servicos_cancelados': 0}
+        tarefas['relatorio'] = lambda: modulo.gerar_pdf_relatorio_servicos(linhas, ['Status: Concluído'], estatisticas)
+    return tarefas
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modulo', default=os.path.join(RAIZ, 'routes', 'pdf_generator.py'),
+                        help='pdf_generator.py a medir (padrão: o da árvore)')
+    parser.add_argument('-n', type=int, default=150, help='gerações por tipo de documento')
+    args = parser.parse_args()
+
+    modulo = carregar_modulo(args.modulo)
+    for nome, gerar in tarefas(modulo).items():
+        tamanho = len(gerar())  # aquecimento (fontes, estilos)
+        segundos = timeit.timeit(gerar, number=args.n) / args.n
+        print(f'{nome:12} {segundos * 1000:7.2f} ms/PDF  {tamanho} bytes')
+
+    if hasattr(modulo, 'obter_estilos'):
+        segundos = timeit.timeit(modulo.obter_estilos, number=10000) / 10000
+        print(f'{"estilos":12} {segundos * 1e6:7.2f} us (obter_estilos, em cache)')
+    else:
+        from reportlab.lib.styles import getSampleStyleSheet
+        segundos = timeit.timeit(getSampleStyleSheet, number=1000) / 1000
+        print(f'{"estilos":12} {segundos * 1e6:7.2f} us (getSampleStyleSheet por documento)')
+
+if __name__ == '__main__':
+    main()
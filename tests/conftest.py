@@ -0,0 +1,37 @@
+"""Importar o código do repositório pelos caminhos usados na aplicação
+(src.models, src.utils, src.routes).
+
+Na implantação o projeto fica no pacote src; neste repositório os modelos
+estão em models/ (um arquivo por classe) e os utilitários e blueprints em
+routes/. Sem um pacote src no caminho, ele é montado a partir dessas pastas.
+"""
+import importlib
+import importlib.util
+import os
+import sys
+import types
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+if importlib.util.find_spec('src') is None:
+    from extensions import db
+    import routes
+
+    def _carregar_modelo(nome):
+        # Só os modelos pedidos são mapeados: nem todos os relacionamentos
+        # (ex.: AlertaEstoque -> Material) têm o modelo do outro lado aqui
+        if not os.path.exists(os.path.join(RAIZ, 'models', f'{nome}.py')):
+            raise AttributeError(nome)
+        return getattr(importlib.import_module(f'models.{nome}'), nome)
+
+    modelos = types.ModuleType('src.models')
+    modelos.db = db
+    modelos.__getattr__ = _carregar_modelo
+
+    src = types.ModuleType('src')
+    src.__path__ = []
+    src.models = modelos
+    src.utils = src.routes = routes
+    sys.modules.update({'src': src, 'src.models': modelos, 'src.utils': routes, 'src.routes': routes})
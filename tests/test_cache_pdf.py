@@ -0,0 +1,67 @@
+from flask import Flask
+import os
+import pytest
+
+from src.utils.cache_pdf import CacheDiscoPDF, resposta_pdf_cache
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['PDF_CACHE_DIR'] = str(tmp_path / 'cache')
+    gerados = []
+
+    def gerar():
+        gerados.append(1)
+        return b'%PDF-teste'
+
+    @app.route('/pdf/<int:id>/<versao>')
+    def pdf(id, versao):
+        return resposta_pdf_cache('orcamento', id, {'versao': versao}, gerar, f'orcamento_{id}.pdf')
+
+    app.gerados = gerados
+    return app
+
+def test_pdf_gerado_uma_vez_e_servido_do_cache(app):
+    cliente = app.test_client()
+    primeira = cliente.get('/pdf/1/a')
+    segunda = cliente.get('/pdf/1/a')
+
+    assert primeira.status_code == segunda.status_code == 200
+    assert primeira.data == segunda.data == b'%PDF-teste'
+    assert primeira.headers['ETag'] == segunda.headers['ETag']
+    assert len(app.gerados) == 1
+
+def test_if_none_match_responde_304_sem_gerar(app):
+    cliente = app.test_client()
+    etag = cliente.get('/pdf/1/a').headers['ETag']
+
+    resposta = cliente.get('/pdf/1/a', headers={'If-None-Match': etag})
+
+    assert resposta.status_code == 304
+    assert resposta.data == b''
+    assert resposta.headers['ETag'] == etag
+    assert len(app.gerados) == 1
+
+def test_alteracao_dos_dados_muda_etag(app):
+    cliente = app.test_client()
+    etag = cliente.get('/pdf/1/a').headers['ETag']
+
+    resposta = cliente.get('/pdf/1/b', headers={'If-None-Match': etag})
+
+    assert resposta.status_code == 200
+    assert resposta.headers['ETag'] != etag
+    assert len(app.gerados) == 2
+
+def test_cache_descarta_os_menos_usados(tmp_path):
+    cache = CacheDiscoPDF(str(tmp_path), tamanho_maximo=25)
+    cache.set('orcamento-1-a', b'x' * 10)
+    cache.set('orcamento-2-a', b'x' * 10)
+    # Datas de uso explícitas: gravações seguidas podem cair no mesmo instante
+    os.utime(tmp_path / 'orcamento-1-a.pdf', (1000, 1000))
+    os.utime(tmp_path / 'orcamento-2-a.pdf', (2000, 2000))
+    cache.get('orcamento-1-a')
+    cache.set('orcamento-3-a', b'x' * 10)
+
+    assert cache.get('orcamento-1-a') is not None
+    assert cache.get('orcamento-2-a') is None
+    assert cache.get('orcamento-3-a') is not None
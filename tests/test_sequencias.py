@@ -0,0 +1,70 @@
+from flask import Flask
+from sqlalchemy import Column, MetaData, String, Table, insert, select
+import pytest
+
+from src.models import db, SequenciaDocumento
+from src.utils import sequencias
+from src.utils.sequencias import proximo_numero
+from src.utils.upsert import insert_upsert
+
+# Tabela de documentos já emitidos, de onde a numeração continua
+documentos = Table('documento', MetaData(), Column('numero', String(20), primary_key=True))
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    # Arquivo, não memória: com blocos a reserva usa outra conexão
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path}/teste.db'
+    db.init_app(app)
+    sequencias._blocos.clear()
+    with app.app_context():
+        SequenciaDocumento.__table__.create(db.engine)
+        documentos.create(db.engine)
+        yield app
+        db.session.remove()
+
+def _ultimo_numero(prefixo, ano):
+    tabela = SequenciaDocumento.__table__
+    return db.session.execute(
+        select(tabela.c.ultimo_numero).where(tabela.c.prefixo == prefixo, tabela.c.ano == ano)
+    ).scalar()
+
+def test_primeira_emissao_continua_numeracao_existente(app):
+    db.session.execute(insert(documentos), [{'numero': n} for n in ('OS20260007', 'OS20260012', 'CT20260099')])
+    db.session.commit()
+
+    assert proximo_numero('OS', documentos.c.numero, 2026) == 'OS20260013'
+    assert proximo_numero('OS', documentos.c.numero, 2026) == 'OS20260014'
+    assert proximo_numero('OS', documentos.c.numero, 2027) == 'OS20270001'
+    assert proximo_numero('CT', documentos.c.numero, 2026) == 'CT20260100'
+
+def test_rollback_devolve_numero(app):
+    assert proximo_numero('ORC', documentos.c.numero, 2026) == 'ORC20260001'
+    db.session.commit()
+
+    assert proximo_numero('ORC', documentos.c.numero, 2026) == 'ORC20260002'
+    db.session.rollback()
+    assert proximo_numero('ORC', documentos.c.numero, 2026) == 'ORC20260002'
+
+def test_blocos_reservam_varios_numeros_por_vez(app):
+    app.config['SEQUENCIA_BLOCO'] = 5
+
+    numeros = [proximo_numero('NF', documentos.c.numero, 2026) for _ in range(6)]
+
+    assert numeros == [f'NF2026{i:04d}' for i in range(1, 7)]
+    # Dois blocos reservados, em transação própria: sobrevivem ao rollback de quem chamou
+    db.session.rollback()
+    assert _ultimo_numero('NF', 2026) == 10
+
+def test_upsert_atualiza_linha_existente(app):
+    tabela = SequenciaDocumento.__table__
+    for quantidade in (3, 4):
+        stmt = insert_upsert(tabela).values(prefixo='OS', ano=2026, ultimo_numero=quantidade)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['prefixo', 'ano'],
+            set_={'ultimo_numero': tabela.c.ultimo_numero + stmt.excluded.ultimo_numero}
+        ))
+    db.session.commit()
+
+    assert db.session.query(SequenciaDocumento).count() == 1
+    assert _ultimo_numero('OS', 2026) == 7